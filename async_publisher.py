@@ -0,0 +1,332 @@
+﻿#!/usr/bin/env python
+"""
+Asynchronous, batching STOMP publisher.
+
+AsyncPublisher puts messages on a bounded in-memory queue and sends them from a
+background thread, so a slow broker no longer stalls the caller. It has the
+same ``send(destination, body, headers=...)`` signature as stomp.Connection and
+can be passed anywhere a connection is used for sending.
+
+Several queued messages for the same destination and with the same headers can
+be packed into one STOMP frame (see pack_batch/unpack_batch). A batched frame
+has a 'batch-count' header, the content type application/x-sdr-text-batch (all
+bodies text) or application/x-sdr-batch, and the messages' own content type in
+'batch-content-type'. Its body is each message body (text as UTF-8) prefixed
+with its length as a 4-byte little-endian integer.
+
+When the queue is full the configured policy decides what happens:
+    block        wait for space (optionally with a timeout, then drop)
+    drop-oldest  discard the oldest queued message
+    drop-newest  discard the message being published
+"""
+
+import struct
+import threading
+import time
+from collections import deque
+
+from connection import BUFFERED, body_size
+
+POLICIES = ('block', 'drop-oldest', 'drop-newest')
+
+# Returned by AsyncPublisher.send for a message queued for the sender thread
+QUEUED = 'queued'
+
+# Header carrying the number of messages packed into one frame
+BATCH_HEADER = 'batch-count'
+# Content types of batched frames; the members' own content type moves to BATCH_TYPE_HEADER
+TEXT_BATCH_CONTENT_TYPE = 'application/x-sdr-text-batch'
+BINARY_BATCH_CONTENT_TYPE = 'application/x-sdr-batch'
+BATCH_TYPE_HEADER = 'batch-content-type'
+
+_LENGTH = struct.Struct('<I')
+
+
+def pack_batch(bodies):
+    """
+    Pack several message bodies into one frame body.
+
+    Every body is prefixed with its length as a 4-byte little-endian integer;
+    text bodies are encoded as UTF-8 first. Send the result with
+    batch_content_type() as content type.
+
+    Args:
+        bodies (list): Message bodies, str or bytes
+
+    Returns:
+        bytes: Packed body
+    """
+    parts = (body.encode('utf-8') if isinstance(body, str) else bytes(body) for body in bodies)
+    return b''.join(_LENGTH.pack(len(part)) + part for part in parts)
+
+
+def batch_content_type(bodies):
+    """
+    Return the content type of a frame packed from bodies by pack_batch.
+
+    Args:
+        bodies (list): Message bodies, str or bytes
+
+    Returns:
+        str: TEXT_BATCH_CONTENT_TYPE if all bodies are text, else BINARY_BATCH_CONTENT_TYPE
+    """
+    if all(isinstance(body, str) for body in bodies):
+        return TEXT_BATCH_CONTENT_TYPE
+    return BINARY_BATCH_CONTENT_TYPE
+
+
+def unpack_batch(body, headers):
+    """
+    Split a frame body packed by pack_batch.
+
+    Args:
+        body (bytes): Frame body, as received with auto_decode=False
+        headers (dict): Frame headers
+
+    Returns:
+        list: Message bodies (a single-item list if the frame is not a batch);
+        str for a text batch, memoryview slices of body otherwise
+    """
+    if BATCH_HEADER not in headers:
+        return [body]
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    view = memoryview(body)
+    bodies = []
+    position = 0
+    while position < len(view):
+        (length,) = _LENGTH.unpack_from(view, position)
+        position += _LENGTH.size
+        bodies.append(view[position:position + length])
+        position += length
+    if headers.get('content-type') == TEXT_BATCH_CONTENT_TYPE:
+        return [str(part, 'utf-8') for part in bodies]
+    return bodies
+
+
+def _group_key(item):
+    # Destination and headers of a queued message, apart from its own length
+    _, destination, _, headers = item
+    return destination, {name: value for name, value in headers.items()
+                         if name != 'content-length'}
+
+
+class AsyncPublisher:
+    """
+    Bounded queue plus background sender thread in front of a STOMP connection.
+
+    Call close() to flush and stop the sender thread. The sender thread records
+    the frames it sends in ``metrics`` (set by PipelineMetrics.watch_publisher).
+    """
+
+    def __init__(self, conn, max_queue=1000, policy='block', batch_size=1,
+                 batch_interval=0.05, block_timeout=None, latency_window=1000, metrics=None):
+        """
+        Args:
+            conn (stomp.Connection): Connection used by the sender thread
+            max_queue (int): Maximum number of queued messages
+            policy (str): Full-queue policy: 'block', 'drop-oldest' or 'drop-newest'
+            batch_size (int): Maximum messages packed into one STOMP frame
+            batch_interval (float): Maximum seconds to wait while filling a batch
+            block_timeout (float, optional): Seconds 'block' waits before dropping
+            latency_window (int): Number of recent sends kept for latency percentiles
+            metrics (metrics.PipelineMetrics, optional): Metrics recording the sends
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.conn = conn
+        self.max_queue = max_queue
+        self.policy = policy
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self.block_timeout = block_timeout
+        self.metrics = metrics
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._send_latencies = deque(maxlen=latency_window)
+        self._queue_latencies = deque(maxlen=latency_window)
+
+        self.messages_queued = 0
+        self.messages_sent = 0
+        self.frames_sent = 0
+        self.messages_buffered = 0
+        self.send_failures = 0
+        self.dropped = 0
+        self.bytes_sent = 0
+
+        self._thread = threading.Thread(target=self._run, name="stomp-publisher", daemon=True)
+        self._thread.start()
+
+    def send(self, destination, body, headers=None, **keyword_headers):
+        """
+        Queue a message for sending.
+
+        Args:
+            destination (str): STOMP destination
+            body (str or bytes): Message body
+            headers (dict, optional): STOMP headers
+            **keyword_headers: Additional headers, as accepted by stomp.Connection.send
+
+        Returns:
+            str or bool: QUEUED if the message was queued, False if it was dropped
+        """
+        headers = dict(headers or {}, **keyword_headers)
+        item = (time.monotonic(), destination, body, headers)
+        with self._cond:
+            if self._closed:
+                self.dropped += 1
+                return False
+            if len(self._queue) >= self.max_queue:
+                if self.policy == 'drop-newest':
+                    self.dropped += 1
+                    return False
+                if self.policy == 'drop-oldest':
+                    self._queue.popleft()
+                    self.dropped += 1
+                elif not self._cond.wait_for(
+                        lambda: len(self._queue) < self.max_queue or self._closed,
+                        self.block_timeout) or self._closed:
+                    self.dropped += 1
+                    return False
+            self._queue.append(item)
+            self.messages_queued += 1
+            self._cond.notify_all()
+        return QUEUED
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._closed)
+            if not self._queue:
+                return []
+            deadline = self._queue[0][0] + self.batch_interval
+            while len(self._queue) < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    break
+            count = min(self.batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(count)]
+            self._cond.notify_all()
+        return batch
+
+    def _send_group(self, group):
+        _, destination, body, headers = group[0]
+        if len(group) > 1:
+            bodies = [item[2] for item in group]
+            body = pack_batch(bodies)
+            headers = dict(headers)
+            headers[BATCH_HEADER] = str(len(group))
+            if 'content-type' in headers:
+                headers[BATCH_TYPE_HEADER] = headers['content-type']
+            headers['content-type'] = batch_content_type(bodies)
+            if 'content-length' in headers:
+                headers['content-length'] = str(len(body))
+        start = time.monotonic()
+        try:
+            result = self.conn.send(destination=destination, body=body, headers=headers)
+        except Exception as e:
+            self.send_failures += 1
+            if self.metrics is not None:
+                self.metrics.send_failures.inc(len(group))
+            print(f"Error sending to ActiveMQ: {e}")
+            return
+        now = time.monotonic()
+        if self.metrics is not None:
+            self.metrics.record_send(result, body, now - start, len(group))
+        if result is BUFFERED:
+            # A ConnectionManager keeps the frame until the broker is back
+            self.messages_buffered += len(group)
+            return
+        with self._stats_lock:
+            self._send_latencies.append(now - start)
+            self._queue_latencies.extend(now - item[0] for item in group)
+        self.frames_sent += 1
+        self.messages_sent += len(group)
+        self.bytes_sent += body_size(body)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            # Only messages for the same destination and with the same headers share
+            # a frame, since the frame carries one set of headers for all of them
+            group = [batch[0]]
+            for item in batch[1:]:
+                if _group_key(item) == _group_key(group[-1]):
+                    group.append(item)
+                else:
+                    self._send_group(group)
+                    group = [item]
+            self._send_group(group)
+
+    def queue_depth(self):
+        """Return the number of messages waiting to be sent."""
+        with self._cond:
+            return len(self._queue)
+
+    def stats(self):
+        """
+        Return publisher counters and latencies.
+
+        Returns:
+            dict: Queue depth, message/frame/byte counts, drops, failures, and
+            p50/p99/max send latency and queue-to-send latency in seconds over
+            the recent window
+        """
+        import numpy as np
+
+        with self._stats_lock:
+            send_latencies = np.array(self._send_latencies)
+            queue_latencies = np.array(self._queue_latencies)
+
+        def percentiles(values):
+            if len(values) == 0:
+                return {'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+            p50, p99 = np.percentile(values, [50, 99])
+            return {'p50': float(p50), 'p99': float(p99), 'max': float(values.max())}
+
+        return {
+            'queue_depth': self.queue_depth(),
+            'max_queue': self.max_queue,
+            'messages_queued': self.messages_queued,
+            'messages_sent': self.messages_sent,
+            'frames_sent': self.frames_sent,
+            'bytes_sent': self.bytes_sent,
+            'messages_buffered': self.messages_buffered,
+            'dropped': self.dropped,
+            'send_failures': self.send_failures,
+            'send_latency': percentiles(send_latencies),
+            'queue_latency': percentiles(queue_latencies),
+        }
+
+    def close(self, timeout=5.0):
+        """
+        Stop accepting messages, flush the queue and stop the sender thread.
+
+        Args:
+            timeout (float): Seconds to wait for queued messages to be sent
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+
+def print_publisher_stats(stats):
+    """
+    Print AsyncPublisher counters.
+
+    Args:
+        stats (dict): Counters returned by AsyncPublisher.stats()
+    """
+    send_latency = stats['send_latency']
+    print("\n=== Publisher Status ===")
+    print(f"Queue depth: {stats['queue_depth']}/{stats['max_queue']}")
+    print(f"Messages sent: {stats['messages_sent']} in {stats['frames_sent']} frames")
+    print(f"Dropped: {stats['dropped']}, send failures: {stats['send_failures']}, "
+          f"buffered during outages: {stats['messages_buffered']}")
+    print(f"Send latency p50/p99/max: {send_latency['p50'] * 1e3:.2f}/"
+          f"{send_latency['p99'] * 1e3:.2f}/{send_latency['max'] * 1e3:.2f} ms")
@@ -0,0 +1,364 @@
+﻿#!/usr/bin/env python
+"""
+Per-stage benchmarks for the SDR pipeline.
+
+Measures throughput and latency percentiles separately for each stage of
+sdr.py at several frame sizes:
+    generate     simulated sample generation (simulator.default_simulator)
+    compute_fft  sdr.compute_fft
+    time_stats   power and sdr.compute_time_domain_stats
+    serialize    message build and serialization in sdr.send_to_activemq
+    send         stomp.Connection.send to an in-process STOMP stand-in
+
+It also times the import of the entry point modules, each in a fresh
+interpreter, and lists which heavy dependencies the import loaded.
+
+Results are written as JSON so runs can be compared; --compare reports the
+change against an earlier run and exits with status 1 if any stage got slower
+than the threshold.
+
+Usage:
+    python benchmark.py --output results.json
+    python benchmark.py --sizes 1024 4096 --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import stomp
+
+import sdr
+from simulator import default_simulator
+from spectrum import SCIPY_FFT_AVAILABLE
+from stomp_server import StompServer
+
+DEFAULT_SIZES = (256, 1024, 4096, 16384, 65536)
+STAGES = ('generate', 'compute_fft', 'time_stats', 'serialize', 'send')
+SAMPLE_RATE = 2.048e6
+DESTINATION = '/queue/benchmark'
+IMPORT_MODULES = ('sdr', 'publisher', 'consumer_analyzer', 'config')
+HEAVY_MODULES = ('numpy', 'scipy', 'stomp', 'rtlsdr', 'dotenv', 'multiprocessing', 'cProfile',
+                 'tracemalloc', 'http.server')
+
+# Run in a fresh interpreter: time one import, report the time and heavy modules loaded
+_IMPORT_SCRIPT = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed,
+                  'loaded': [name for name in sys.argv[2:] if name in sys.modules]}))
+"""
+
+
+class _NullConnection:
+    """Connection stand-in that only records the size of the last body."""
+
+    def __init__(self):
+        self.last_body = None
+
+    def send(self, destination, body, headers=None, **keyword_headers):
+        self.last_body = body
+
+
+def measure(fn, min_time=0.5, min_iterations=10, max_iterations=100000):
+    """
+    Call fn repeatedly and time each call.
+
+    Args:
+        fn (callable): Function to benchmark, called without arguments
+        min_time (float): Keep calling for at least this many seconds
+        min_iterations (int): Minimum number of calls
+        max_iterations (int): Maximum number of calls
+
+    Returns:
+        tuple: (latencies in seconds as a numpy array, wall time in seconds)
+    """
+    fn()  # Warm-up: plan caches, buffers, connections
+    latencies = []
+    clock = time.perf_counter
+    start = clock()
+    while len(latencies) < max_iterations:
+        begin = clock()
+        fn()
+        end = clock()
+        latencies.append(end - begin)
+        if len(latencies) >= min_iterations and end - start >= min_time:
+            break
+    return np.array(latencies), clock() - start
+
+
+def summarize(stage, frame_size, latencies, wall_time):
+    """
+    Build the result record of one stage at one frame size.
+
+    Args:
+        stage (str): Stage name
+        frame_size (int): Samples per frame
+        latencies (numpy.ndarray): Per-call latencies in seconds
+        wall_time (float): Total seconds, including any flush after the last call
+
+    Returns:
+        dict: Iterations, frames/s, Msamples/s and latency percentiles in microseconds
+    """
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1e6
+    frames_per_second = len(latencies) / wall_time
+    return {
+        'stage': stage,
+        'frame_size': frame_size,
+        'iterations': len(latencies),
+        'frames_per_s': frames_per_second,
+        'msamples_per_s': frames_per_second * frame_size / 1e6,
+        'mean_us': float(latencies.mean() * 1e6),
+        'p50_us': float(p50),
+        'p90_us': float(p90),
+        'p99_us': float(p99),
+        'max_us': float(latencies.max() * 1e6),
+    }
+
+
+def _flush(conn):
+    # stomp.Connection.send only writes to the socket; a receipt confirms the
+    # stand-in has read every frame sent before it
+    listener = stomp.listener.WaitingListener('benchmark-flush')
+    conn.set_listener('benchmark-flush', listener)
+    conn.send(DESTINATION, '', headers={'receipt': 'benchmark-flush'})
+    listener.wait_on_receipt()
+    conn.remove_listener('benchmark-flush')
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, stages=STAGES, min_time=0.5, min_iterations=10):
+    """
+    Benchmark each stage at each frame size.
+
+    Args:
+        sizes (list): Frame sizes in samples
+        stages (list): Stage names, a subset of STAGES
+        min_time (float): Minimum seconds per stage and size
+        min_iterations (int): Minimum calls per stage and size
+
+    Returns:
+        list: One result record per stage and frame size (see summarize)
+    """
+    server = conn = None
+    if 'send' in stages:
+        server = StompServer()
+        conn = stomp.Connection([server.start()])
+        conn.connect('benchmark', 'benchmark', wait=True)
+
+    results = []
+    try:
+        for frame_size in sizes:
+            simulator = default_simulator(SAMPLE_RATE)
+            samples = simulator.generate(frame_size)
+            processor = sdr.SampleProcessor(162.450e6, SAMPLE_RATE, frame_size, simulated=True)
+            message = processor.process(samples)[0]
+            null_conn = _NullConnection()
+            sdr.send_to_activemq(null_conn, **message)
+            body = null_conn.last_body
+
+            benchmarks = {
+                'generate': lambda: simulator.generate(frame_size),
+                'compute_fft': lambda: sdr.compute_fft(samples),
+                'time_stats': lambda: sdr.compute_time_domain_stats(np.abs(samples) ** 2),
+                'serialize': lambda: sdr.send_to_activemq(null_conn, **message),
+                'send': lambda: conn.send(DESTINATION, body),
+            }
+            for stage in stages:
+                latencies, wall_time = measure(benchmarks[stage], min_time, min_iterations)
+                if stage == 'send':
+                    flush_start = time.perf_counter()
+                    _flush(conn)
+                    wall_time += time.perf_counter() - flush_start
+                result = summarize(stage, frame_size, latencies, wall_time)
+                if stage in ('serialize', 'send'):
+                    result['message_bytes'] = len(body)
+                results.append(result)
+    finally:
+        if conn is not None:
+            conn.disconnect()
+            server.stop()
+    return results
+
+
+def measure_import_times(modules=IMPORT_MODULES, repeats=3):
+    """
+    Time the import of modules, each in a fresh interpreter.
+
+    Args:
+        modules (list): Module names, importable from this directory
+        repeats (int): Imports timed per module; the fastest is reported
+
+    Returns:
+        list: Per module, the best import time in milliseconds and the heavy
+        dependencies (HEAVY_MODULES) the import loaded
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for module in modules:
+        runs = []
+        for _ in range(repeats):
+            output = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT, module,
+                                     *HEAVY_MODULES],
+                                    cwd=directory, capture_output=True, text=True, check=True)
+            runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+        results.append({
+            'module': module,
+            'import_ms': min(run['seconds'] for run in runs) * 1e3,
+            'loaded': runs[-1]['loaded'],
+        })
+    return results
+
+
+def print_import_times(import_times):
+    """
+    Print import times as a table.
+
+    Args:
+        import_times (list): Records from measure_import_times
+    """
+    print(f"{'module':<20} {'import ms':>10}  heavy dependencies loaded")
+    for r in import_times:
+        print(f"{r['module']:<20} {r['import_ms']:>10.1f}  {', '.join(r['loaded']) or '-'}")
+
+
+def compare_results(results, baseline, threshold=0.1):
+    """
+    Compare results against an earlier run.
+
+    Args:
+        results (list): Result records of this run
+        baseline (list): Result records of the earlier run
+        threshold (float): Fractional throughput drop reported as a regression
+
+    Returns:
+        list: (stage, frame_size, throughput ratio, regressed) for records in both runs
+    """
+    previous = {(r['stage'], r['frame_size']): r for r in baseline}
+    comparison = []
+    for result in results:
+        before = previous.get((result['stage'], result['frame_size']))
+        if before is None:
+            continue
+        ratio = result['frames_per_s'] / before['frames_per_s']
+        comparison.append((result['stage'], result['frame_size'], ratio, ratio < 1 - threshold))
+    return comparison
+
+
+def print_results(results):
+    """
+    Print result records as a table.
+
+    Args:
+        results (list): Result records from run_benchmarks
+    """
+    print(f"{'stage':<12} {'size':>6} {'frames/s':>12} {'Msamples/s':>11} "
+          f"{'p50 us':>10} {'p90 us':>10} {'p99 us':>10}")
+    for r in results:
+        print(f"{r['stage']:<12} {r['frame_size']:>6} {r['frames_per_s']:>12.1f} "
+              f"{r['msamples_per_s']:>11.2f} {r['p50_us']:>10.1f} {r['p90_us']:>10.1f} "
+              f"{r['p99_us']:>10.1f}")
+
+
+def environment():
+    """
+    Describe the machine and library versions a run was made with.
+
+    Returns:
+        dict: Python, numpy and stomp.py versions, platform and FFT backend
+    """
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'stomp': '.'.join(str(part) for part in stomp.__version__),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'fft_backend': 'scipy' if SCIPY_FFT_AVAILABLE else 'numpy',
+    }
+
+
+def parse_args(argv=None):
+    """
+    Parse command line arguments.
+
+    Args:
+        argv (list, optional): Arguments to parse, defaults to none
+
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Per-stage SDR pipeline benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Frame sizes in samples")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES),
+                        help="Stages to benchmark")
+    parser.add_argument('--min-time', type=float, default=0.5, metavar='SECONDS',
+                        help="Minimum time per stage and frame size")
+    parser.add_argument('--min-iterations', type=int, default=10,
+                        help="Minimum calls per stage and frame size")
+    parser.add_argument('--import-modules', nargs='+', default=list(IMPORT_MODULES),
+                        metavar='MODULE', help="Modules whose import time is measured")
+    parser.add_argument('--import-repeats', type=int, default=3,
+                        help="Fresh-interpreter imports per module (0 skips import timing)")
+    parser.add_argument('--output', metavar='FILE', default=None,
+                        help="Write the results as JSON")
+    parser.add_argument('--compare', metavar='FILE', default=None,
+                        help="Compare against the JSON results of an earlier run")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="Throughput drop (fraction) reported as a regression")
+    return parser.parse_args(argv or [])
+
+
+def main(argv=None):
+    """
+    Run the benchmarks, print and optionally save and compare the results.
+
+    Args:
+        argv (list, optional): Command line arguments
+
+    Returns:
+        int: Exit status, 1 if --compare found a regression
+    """
+    args = parse_args(argv)
+    results = run_benchmarks(args.sizes, args.stages, args.min_time, args.min_iterations)
+    print_results(results)
+    import_times = []
+    if args.import_repeats > 0:
+        import_times = measure_import_times(args.import_modules, args.import_repeats)
+        print()
+        print_import_times(import_times)
+
+    if args.output:
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'environment': environment(),
+            'settings': {'min_time': args.min_time, 'min_iterations': args.min_iterations},
+            'results': results,
+            'import_times': import_times,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        comparison = compare_results(results, baseline, args.threshold)
+        print(f"\n=== Compared with {args.compare} ===")
+        for stage, frame_size, ratio, regressed in comparison:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{stage:<12} {frame_size:>6} {ratio:>7.2f}x throughput{flag}")
+        if any(regressed for *_, regressed in comparison):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
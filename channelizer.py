@@ -0,0 +1,128 @@
+﻿#!/usr/bin/env python
+"""
+Polyphase filterbank channelizer.
+
+PolyphaseChannelizer splits a complex baseband stream into N equally spaced,
+critically sampled channels (spacing and output rate sample_rate / N). Each
+output block is one dot product of the last taps_per_channel * N input samples
+with the polyphase prototype filter, folded to N values, followed by a single
+N-point FFT, so all channels cost about as much as one FFT per N input samples.
+
+Whole frames are processed at once: the input is viewed as rows of N samples
+and a sliding window over the rows gives every output block without copying
+(numpy.lib.stride_tricks), folded with one einsum and transformed with one
+batched FFT. The last (taps_per_channel - 1) * N samples, plus any partial row,
+are kept between frames so the filter state carries over frame boundaries.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def prototype_filter(num_channels, taps_per_channel=8, beta=8.6):
+    """
+    Design the lowpass prototype of the filterbank.
+
+    A Kaiser-windowed sinc with its cutoff at half the channel spacing,
+    normalized to unit gain at DC.
+
+    Args:
+        num_channels (int): Number of channels (N)
+        taps_per_channel (int): Filter taps per polyphase branch
+        beta (float): Kaiser window shape (higher: lower sidelobes, wider transition)
+
+    Returns:
+        numpy.ndarray: num_channels * taps_per_channel coefficients
+    """
+    length = num_channels * taps_per_channel
+    n = np.arange(length) - (length - 1) / 2
+    taps = np.sinc(n / num_channels) * np.kaiser(length, beta)
+    return taps / taps.sum()
+
+
+class PolyphaseChannelizer:
+    """
+    Critically sampled polyphase FFT channelizer with state kept across frames.
+
+    Channel c is centered at c * sample_rate / N from the input center (the
+    upper half of the indices being the negative offsets, as in numpy.fft);
+    channel_offsets gives them in ascending order. An instance is not thread safe.
+    """
+
+    def __init__(self, num_channels, sample_rate=2.048e6, taps_per_channel=8):
+        """
+        Args:
+            num_channels (int): Number of channels (N), also the decimation factor
+            sample_rate (float): Input sample rate in Hz
+            taps_per_channel (int): Prototype filter taps per polyphase branch
+        """
+        if num_channels < 2:
+            raise ValueError("num_channels must be at least 2")
+        self.num_channels = num_channels
+        self.sample_rate = sample_rate
+        self.taps_per_channel = taps_per_channel
+        self.output_rate = sample_rate / num_channels
+        # Row t holds the taps applied to the t-th oldest row of N input samples
+        self.polyphase = prototype_filter(num_channels, taps_per_channel).reshape(
+            taps_per_channel, num_channels).astype(np.float32)
+        # Channel offsets from the input center in Hz, ascending (fftshift order)
+        self.channel_offsets = np.fft.fftshift(np.fft.fftfreq(num_channels, 1 / sample_rate))
+        self._pending = np.zeros((taps_per_channel - 1) * num_channels, dtype=np.complex64)
+
+    def process(self, samples):
+        """
+        Channelize the next frame of samples.
+
+        Args:
+            samples (numpy.ndarray): Complex samples of any length
+
+        Returns:
+            numpy.ndarray: complex64 array of shape (blocks, N); column c is the
+            decimated stream of channel c (numpy.fft order). blocks is the number
+            of complete rows of N samples available, so it may vary by one
+            between frames when the frame size is not a multiple of N.
+        """
+        buffer = np.concatenate((self._pending, np.asarray(samples, dtype=np.complex64)))
+        rows = len(buffer) // self.num_channels
+        blocks = rows - (self.taps_per_channel - 1)
+        if blocks <= 0:
+            self._pending = buffer
+            return np.empty((0, self.num_channels), dtype=np.complex64)
+
+        matrix = buffer[:rows * self.num_channels].reshape(rows, self.num_channels)
+        # (blocks, N, taps) view of the taps_per_channel rows ending at each block
+        windows = sliding_window_view(matrix, self.taps_per_channel, axis=0)
+        folded = np.einsum('bnt,tn->bn', windows, self.polyphase)
+        # Keep the rows still needed by later blocks plus any partial row
+        self._pending = buffer[blocks * self.num_channels:]
+        return np.fft.fft(folded, axis=1).astype(np.complex64)
+
+    def reset(self):
+        """Clear the filter state."""
+        self._pending = np.zeros((self.taps_per_channel - 1) * self.num_channels,
+                                 dtype=np.complex64)
+
+
+def channel_stats(streams, noise_floor=None):
+    """
+    Compute the power statistics of every channel over a block of outputs.
+
+    Args:
+        streams (numpy.ndarray): (blocks, N) channel outputs from PolyphaseChannelizer
+        noise_floor (float, optional): Reference power for the SNR, defaults to the
+            median of the channels' mean powers
+
+    Returns:
+        dict: mean_power, max_power and std_dev (linear) and snr_db per channel,
+        each an array of N values in numpy.fft channel order
+    """
+    power = np.abs(streams) ** 2
+    mean_power = power.mean(axis=0)
+    if noise_floor is None:
+        noise_floor = float(np.median(mean_power))
+    return {
+        'mean_power': mean_power,
+        'max_power': power.max(axis=0),
+        'std_dev': power.std(axis=0),
+        'snr_db': 10 * np.log10((mean_power + 1e-10) / (noise_floor + 1e-10)),
+    }
@@ -0,0 +1,173 @@
+﻿#!/usr/bin/env python
+"""
+Typed runtime configuration, loaded once.
+
+Config holds the ActiveMQ connection settings and destinations plus the
+sample stream defaults. get_config() loads it on first use, from the
+environment and an optional .env file, and returns the same object
+afterwards. The command line overrides single fields with configure()
+(add_arguments/configure_from_args do both for an argparse parser).
+
+    ACTIVEMQ_HOST, ACTIVEMQ_PORT  broker (default localhost:61613)
+    ACTIVEMQ_BROKERS              failover list "host:port,host:port", replaces the above
+    ACTIVEMQ_USER, ACTIVEMQ_PASS  credentials (default admin/admin)
+    ACTIVEMQ_DEST                 legacy destination (default /queue/test)
+    ACTIVEMQ_SDR_DEST             SDR data (default /queue/sdr)
+    ACTIVEMQ_PUBLISHER_DEST       publisher data (default /queue/publisher)
+    SDR_SAMPLE_RATE               sample rate in Hz (default 2.048e6)
+    SDR_FFT_SIZE                  FFT size (default 1024)
+    SDR_FRAME_SIZE                samples per read (default: the FFT size)
+
+This module only uses the standard library; python-dotenv is imported when
+the configuration is loaded.
+"""
+
+import os
+from dataclasses import dataclass, field, replace
+from typing import List, Tuple
+
+# Fields that can be overridden on the command line, with their option names
+CLI_FIELDS = ('broker', 'sdr_dest', 'publisher_dest', 'sample_rate', 'fft_size', 'frame_size')
+
+
+@dataclass(frozen=True)
+class Config:
+    """ActiveMQ and sample stream settings."""
+
+    broker: List[Tuple[str, int]] = field(default_factory=lambda: [('localhost', 61613)])
+    user: str = 'admin'
+    password: str = 'admin'
+    dest: str = '/queue/test'
+    sdr_dest: str = '/queue/sdr'
+    publisher_dest: str = '/queue/publisher'
+    sample_rate: float = 2.048e6
+    fft_size: int = 1024
+    frame_size: int = 1024
+
+
+def parse_broker(text):
+    """
+    Parse a "host:port" broker address.
+
+    Args:
+        text (str): Address
+
+    Returns:
+        tuple: (host, port)
+    """
+    host, port = text.strip().rsplit(':', 1)
+    return host, int(port)
+
+
+def load_config():
+    """
+    Read the configuration from the environment (and a .env file, if present).
+
+    Returns:
+        Config: Freshly loaded configuration
+    """
+    import dotenv
+    dotenv.load_dotenv()
+
+    broker = [(os.getenv('ACTIVEMQ_HOST', 'localhost'), int(os.getenv('ACTIVEMQ_PORT', '61613')))]
+    if os.getenv('ACTIVEMQ_BROKERS'):
+        broker = [parse_broker(entry) for entry in os.getenv('ACTIVEMQ_BROKERS').split(',')]
+    fft_size = int(os.getenv('SDR_FFT_SIZE', '1024'))
+    return Config(
+        broker=broker,
+        user=os.getenv('ACTIVEMQ_USER', 'admin'),
+        password=os.getenv('ACTIVEMQ_PASS', 'admin'),
+        dest=os.getenv('ACTIVEMQ_DEST', '/queue/test'),
+        sdr_dest=os.getenv('ACTIVEMQ_SDR_DEST', '/queue/sdr'),
+        publisher_dest=os.getenv('ACTIVEMQ_PUBLISHER_DEST', '/queue/publisher'),
+        sample_rate=float(os.getenv('SDR_SAMPLE_RATE', '2.048e6')),
+        fft_size=fft_size,
+        frame_size=int(os.getenv('SDR_FRAME_SIZE', str(fft_size))),
+    )
+
+
+_current = None
+
+
+def get_config():
+    """
+    Return the current configuration, loading it on first use.
+
+    Returns:
+        Config: Current configuration
+    """
+    global _current
+    if _current is None:
+        _current = load_config()
+    return _current
+
+
+def reset():
+    """Forget the current configuration; the next get_config() loads it again."""
+    global _current
+    _current = None
+
+
+def configure(**overrides):
+    """
+    Override fields of the current configuration.
+
+    Args:
+        **overrides: Config fields; None values are ignored
+
+    Returns:
+        Config: New current configuration
+    """
+    global _current
+    changes = {name: value for name, value in overrides.items() if value is not None}
+    if 'fft_size' in changes and 'frame_size' not in changes:
+        current = get_config()
+        if current.frame_size == current.fft_size:
+            # The frame size follows the FFT size unless set separately
+            changes['frame_size'] = changes['fft_size']
+    _current = replace(get_config(), **changes)
+    return _current
+
+
+def add_arguments(parser, fields=CLI_FIELDS):
+    """
+    Add configuration overrides to an argparse parser.
+
+    Args:
+        parser (argparse.ArgumentParser): Parser to extend
+        fields (tuple): Config fields to offer, a subset of CLI_FIELDS
+    """
+    group = parser.add_argument_group("configuration overrides (default: environment)")
+    if 'broker' in fields:
+        group.add_argument('--broker', action='append', type=parse_broker, default=None,
+                           metavar='HOST:PORT',
+                           help="ActiveMQ broker; repeat for failover")
+    if 'sdr_dest' in fields:
+        group.add_argument('--sdr-dest', default=None, metavar='DEST',
+                           help="Destination of SDR data")
+    if 'publisher_dest' in fields:
+        group.add_argument('--publisher-dest', default=None, metavar='DEST',
+                           help="Destination of publisher data")
+    if 'sample_rate' in fields:
+        group.add_argument('--sample-rate', type=float, default=None, metavar='HZ',
+                           help="Sample rate in Hz")
+    if 'fft_size' in fields:
+        group.add_argument('--fft-size', type=int, default=None,
+                           help="FFT size in samples")
+    if 'frame_size' in fields:
+        group.add_argument('--frame-size', type=int, default=None,
+                           help="Samples per read (a multiple of the FFT size reads in "
+                                "blocks of several FFT frames)")
+
+
+def configure_from_args(args):
+    """
+    Apply the overrides added by add_arguments.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+
+    Returns:
+        Config: New current configuration
+    """
+    return configure(**{name: getattr(args, name, None) for name in CLI_FIELDS})
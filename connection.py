@@ -0,0 +1,297 @@
+﻿#!/usr/bin/env python
+"""
+Resilient ActiveMQ connection manager.
+
+ConnectionManager wraps stomp.Connection with:
+    - round-robin failover across all (host, port) entries of creds.BROKER
+    - exponential backoff with jitter between connection attempts
+    - optional STOMP heartbeats so dead connections are noticed
+    - a bounded local buffer for messages sent during an outage, replayed in
+      order once a broker is reachable again
+
+It has the same send/disconnect interface as stomp.Connection, so it can be
+used (or wrapped by an AsyncPublisher) wherever a connection is expected.
+stomp.py is imported by the first connection attempt.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+
+# Returned by ConnectionManager.send for a message kept for replay after reconnecting
+BUFFERED = 'buffered'
+
+
+def body_size(body):
+    """
+    Return the number of bytes a message body takes on the wire.
+
+    Args:
+        body (str or bytes): Message body; stomp.py sends text as UTF-8
+
+    Returns:
+        int: Body size in bytes
+    """
+    if isinstance(body, str) and not body.isascii():
+        return len(body.encode('utf-8'))
+    return len(body)
+
+
+class _ManagerListener:
+    """Forwards connection events to the ConnectionManager."""
+
+    def __init__(self, manager, conn):
+        self.manager = manager
+        self.conn = conn
+
+    def on_error(self, frame):
+        print('ActiveMQ error:', frame.body)
+
+    def on_disconnected(self):
+        self.manager._connection_lost(self.conn)
+
+    def on_heartbeat_timeout(self):
+        print("ActiveMQ heartbeat timeout")
+
+
+class ConnectionManager:
+    """
+    STOMP connection with broker failover, automatic reconnect and outage buffering.
+    """
+
+    def __init__(self, brokers, user, passcode, heartbeats=(0, 0), max_buffer=1000,
+                 initial_backoff=0.5, max_backoff=30.0, listener=None):
+        """
+        Args:
+            brokers (list): (host, port) tuples, tried in round-robin order
+            user (str): Broker login
+            passcode (str): Broker password
+            heartbeats (tuple): STOMP heartbeats (send, receive) in milliseconds
+            max_buffer (int): Messages kept while disconnected; oldest are dropped
+            initial_backoff (float): Delay in seconds before the second attempt
+            max_backoff (float): Maximum delay in seconds between attempts
+            listener (stomp.ConnectionListener, optional): Extra listener for each connection
+        """
+        if not brokers:
+            raise ValueError("at least one broker is required")
+        self.brokers = list(brokers)
+        self.user = user
+        self.passcode = passcode
+        self.heartbeats = heartbeats
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.listener = listener
+
+        self.conn = None
+        self.broker = None
+        self._next_broker = 0
+        self._buffer = deque(maxlen=max_buffer)
+        self._lock = threading.RLock()
+        self._reconnect_thread = None
+        self._replaying = False
+        self._closed = False
+
+        self.connects = 0
+        self.reconnects = 0
+        self.failed_attempts = 0
+        self.send_failures = 0
+        self.buffer_dropped = 0
+
+    def backoff_delay(self, attempt):
+        """
+        Delay before a connection attempt: exponential, capped, with jitter.
+
+        Args:
+            attempt (int): Number of consecutive failed attempts so far
+
+        Returns:
+            float: Seconds to wait, between half and the full backoff
+        """
+        delay = min(self.max_backoff, self.initial_backoff * 2 ** max(attempt - 1, 0))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _try_broker(self, broker):
+        import stomp
+
+        # Retries are handled here, so stomp.py makes a single attempt per broker
+        conn = stomp.Connection(host_and_ports=[broker], heartbeats=self.heartbeats,
+                                reconnect_attempts_max=1)
+        conn.set_listener('manager', _ManagerListener(self, conn))
+        if self.listener is not None:
+            conn.set_listener('', self.listener)
+        try:
+            conn.connect(login=self.user, passcode=self.passcode, wait=True)
+        except Exception:
+            try:
+                conn.disconnect()
+            except Exception:
+                pass
+            raise
+        return conn
+
+    def connect(self, max_attempts=None):
+        """
+        Connect to the next reachable broker, retrying with backoff.
+
+        Args:
+            max_attempts (int, optional): Give up after this many attempts; None retries forever
+
+        Returns:
+            bool: True once connected, False if all attempts failed or the manager was closed
+        """
+        attempt = 0
+        while not self._closed:
+            with self._lock:
+                broker = self.brokers[self._next_broker]
+                self._next_broker = (self._next_broker + 1) % len(self.brokers)
+            try:
+                conn = self._try_broker(broker)
+            except Exception as e:
+                attempt += 1
+                self.failed_attempts += 1
+                print(f"Error connecting to ActiveMQ at {broker}: {str(e) or type(e).__name__}")
+                if max_attempts is not None and attempt >= max_attempts:
+                    return False
+                time.sleep(self.backoff_delay(attempt))
+                continue
+
+            with self._lock:
+                if self.connects:
+                    self.reconnects += 1
+                self.connects += 1
+                self.conn = conn
+                self.broker = broker
+            print(f"Connected to ActiveMQ at {broker[0]}:{broker[1]}")
+            self._replay()
+            return True
+        return False
+
+    def _replay(self):
+        # One replayer at a time, so buffered messages go out in order; while it
+        # runs, send() buffers new messages behind the ones being replayed
+        with self._lock:
+            if self._replaying:
+                return
+            self._replaying = True
+        while True:
+            with self._lock:
+                if not self._buffer or self.conn is None:
+                    self._replaying = False
+                    return
+                destination, body, headers = self._buffer.popleft()
+                conn = self.conn
+            try:
+                conn.send(destination=destination, body=body, headers=headers)
+            except Exception as e:
+                print(f"Error replaying buffered message: {e}")
+                with self._lock:
+                    self._buffer.appendleft((destination, body, headers))
+                    self._replaying = False
+                self._connection_lost(conn)
+                return
+
+    def _reconnect_loop(self):
+        try:
+            self.connect()
+        finally:
+            with self._lock:
+                self._reconnect_thread = None
+            # A failure during replay may have happened while this thread was active
+            if not self._closed and not self.is_connected():
+                self.start_reconnect()
+
+    def start_reconnect(self):
+        """Start reconnecting in a background thread unless already connected or reconnecting."""
+        with self._lock:
+            if self._closed or self.conn is not None or self._reconnect_thread is not None:
+                return
+            self._reconnect_thread = threading.Thread(
+                target=self._reconnect_loop, name="activemq-reconnect", daemon=True
+            )
+            self._reconnect_thread.start()
+
+    def _connection_lost(self, conn):
+        with self._lock:
+            if conn is not self.conn:
+                return
+            self.conn = None
+            self.broker = None
+        if not self._closed:
+            print("ActiveMQ connection lost, reconnecting...")
+            self.start_reconnect()
+
+    def _buffer_message(self, destination, body, headers):
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.buffer_dropped += 1
+            self._buffer.append((destination, body, headers))
+
+    def is_connected(self):
+        """Return True while a broker connection is established."""
+        with self._lock:
+            return self.conn is not None
+
+    def send(self, destination, body, headers=None, **keyword_headers):
+        """
+        Send a message, buffering it locally if no broker is reachable.
+
+        Args:
+            destination (str): STOMP destination
+            body (str or bytes): Message body
+            headers (dict, optional): STOMP headers
+            **keyword_headers: Additional headers, as accepted by stomp.Connection.send
+
+        Returns:
+            bool or str: True if sent now, BUFFERED if kept for replay after reconnecting
+        """
+        if keyword_headers:
+            headers = dict(headers or {}, **keyword_headers)
+        with self._lock:
+            conn = self.conn
+            pending = bool(self._buffer) or self._replaying
+        if conn is None or pending:
+            # Keep ordering: nothing jumps ahead of messages waiting for (or in) replay
+            self._buffer_message(destination, body, headers)
+            if conn is None:
+                self.start_reconnect()
+            else:
+                self._replay()
+            return BUFFERED
+        try:
+            conn.send(destination=destination, body=body, headers=headers)
+            return True
+        except Exception as e:
+            self.send_failures += 1
+            print(f"Error sending to ActiveMQ: {e}")
+            self._buffer_message(destination, body, headers)
+            self._connection_lost(conn)
+            return BUFFERED
+
+    def disconnect(self):
+        """Stop reconnecting and disconnect from the current broker."""
+        with self._lock:
+            self._closed = True
+            conn = self.conn
+            self.conn = None
+        if conn is not None:
+            conn.disconnect()
+
+    def stats(self):
+        """
+        Return connection counters.
+
+        Returns:
+            dict: Connection state, current broker, reconnects, failures and buffer usage
+        """
+        with self._lock:
+            return {
+                'connected': self.conn is not None,
+                'broker': self.broker,
+                'connects': self.connects,
+                'reconnects': self.reconnects,
+                'failed_attempts': self.failed_attempts,
+                'send_failures': self.send_failures,
+                'buffered': len(self._buffer),
+                'buffer_dropped': self.buffer_dropped,
+            }
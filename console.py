@@ -0,0 +1,289 @@
+﻿#!/usr/bin/env python
+"""
+Console output for sdr.py.
+
+ConsoleReporter supports four output modes:
+    full     the detailed multi-line report for every read and summary
+    compact  one status line per interval (default one second)
+    json     one JSON object per line at a configurable interval
+    quiet    no per-read output at all
+
+Reports are only formatted when they will be written: compact and json modes
+just keep a reference to the latest data between lines, and each report is
+written with a single write call.
+"""
+
+import json
+import sys
+import time
+
+OUTPUT_MODES = ('full', 'compact', 'json', 'quiet')
+
+
+def format_sample_report(sample_data, send_success=None):
+    """
+    Format the analysis of one read.
+
+    Args:
+        sample_data (dict): Sample message data built by SampleProcessor
+        send_success (bool, optional): Result of the ActiveMQ send, None if not sent
+
+    Returns:
+        str: Multi-line report
+    """
+    read_count = sample_data['read_number']
+    if send_success is None:
+        lines = [f"\n--- Read #{read_count} ---"]
+    elif send_success:
+        lines = [f"\n--- Read #{read_count} --- (Sent to ActiveMQ)"]
+    else:
+        lines = [f"\n--- Read #{read_count} --- (Failed to send to ActiveMQ)"]
+
+    lines.append(f"Number of samples: {sample_data['sample_count']}")
+
+    time_domain = sample_data['time_domain']
+    lines += [
+        "\nTime Domain Analysis:",
+        f"  Mean power: {time_domain['mean_power']:.6f}",
+        f"  Median power: {time_domain['median_power']:.6f}",
+        f"  Max power: {time_domain['max_power']:.6f}",
+        f"  Min power: {time_domain['min_power']:.6f}",
+        f"  Standard deviation: {time_domain['std_dev']:.6f}",
+        f"  Estimated SNR: {time_domain['snr_estimate']:.6f}",
+    ]
+
+    frequency_domain = sample_data.get('frequency_domain')
+    if frequency_domain:
+        lines += [
+            "\nFrequency Domain Analysis:",
+            f"  Peak frequency: {frequency_domain['peak_freq_mhz']:.3f} MHz (relative to center)",
+            f"  Peak power: {frequency_domain['peak_power']:.6f}",
+        ]
+        for detection in frequency_domain.get('detections', []):
+            lines.append(f"  Signal: {detection['center_freq'] / 1e6:.4f} MHz, "
+                         f"{detection['bandwidth'] / 1e3:.1f} kHz wide, "
+                         f"SNR {detection['snr_db']:.1f} dB")
+
+    # First few samples
+    lines.append("\nSample values (first 10):")
+    for j, sample in enumerate(sample_data['first_samples']):
+        lines.append(f"  Sample {j}: {sample['real']:.6f} + {sample['imag']:.6f}j")
+    return "\n".join(lines)
+
+
+def format_summary_report(summary_data, send_success=None):
+    """
+    Format the periodic summary statistics.
+
+    Args:
+        summary_data (dict): Summary message data built by SampleProcessor
+        send_success (bool, optional): Result of the ActiveMQ send, None if not sent
+
+    Returns:
+        str: Multi-line report
+    """
+    lines = ["\n=== SDR Signal Summary (Last 100 Reads or Less) ==="]
+    if send_success is not None:
+        if send_success:
+            lines.append("Summary statistics sent to ActiveMQ")
+        else:
+            lines.append("Failed to send summary statistics to ActiveMQ")
+
+    lines += [
+        f"Total samples analyzed: {summary_data['total_samples']}",
+        f"Overall mean power: {summary_data['overall_mean_power']:.6f}",
+        f"Overall median power: {summary_data['overall_median_power']:.6f}",
+        f"Overall max power: {summary_data['overall_max_power']:.6f}",
+        f"Overall min power: {summary_data['overall_min_power']:.6f}",
+        f"Overall standard deviation: {summary_data['overall_std_dev']:.6f}",
+        f"Overall estimated SNR: {summary_data['overall_snr']:.6f}",
+    ]
+    return "\n".join(lines)
+
+
+def format_channel_report(channel_data, send_success=None):
+    """
+    Format the per-channel power of one channelized read.
+
+    Args:
+        channel_data (dict): Channel message data built by SampleProcessor
+        send_success (bool, optional): Result of the ActiveMQ send, None if not sent
+
+    Returns:
+        str: Multi-line report, one line per channel
+    """
+    header = (f"\nChannels ({channel_data['num_channels']} x "
+              f"{channel_data['channel_spacing'] / 1e3:.1f} kHz, "
+              f"{channel_data['output_samples']} samples each)")
+    if send_success is not None:
+        header += " (Sent to ActiveMQ)" if send_success else " (Failed to send to ActiveMQ)"
+    lines = [header]
+    for channel in channel_data['channels']:
+        lines.append(f"  {channel['freq_mhz']:.4f} MHz: mean power {channel['mean_power']:.6f}, "
+                     f"max {channel['max_power']:.6f}, SNR {channel['snr_db']:.1f} dB")
+    return "\n".join(lines)
+
+
+def format_detection_event(event, send_success=None):
+    """
+    Format a detection start or stop event.
+
+    Args:
+        event (dict): Event built by detection.DetectionTracker
+        send_success (bool, optional): Result of the ActiveMQ send, None if not sent
+
+    Returns:
+        str: One-line report
+    """
+    line = (f"Signal #{event['signal_id']} {event['event']}: "
+            f"{event['center_freq'] / 1e6:.4f} MHz, {event['bandwidth'] / 1e3:.1f} kHz wide, "
+            f"SNR {event['snr_db']:.1f} dB")
+    if 'duration' in event:
+        line += f", lasted {event['duration']:.2f} s"
+    if send_success is False:
+        line += " (Failed to send to ActiveMQ)"
+    return line
+
+
+class ConsoleReporter:
+    """
+    Writes per-read reports, summaries and status blocks according to an output mode.
+    """
+
+    def __init__(self, mode='full', interval=1.0, stream=None):
+        """
+        Args:
+            mode (str): 'full', 'compact', 'json' or 'quiet'
+            interval (float): Seconds between lines in compact and json modes
+            stream (file, optional): Output stream, defaults to sys.stdout
+        """
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode: {mode}")
+        self.mode = mode
+        self.interval = interval
+        self.stream = stream
+        self.verbose = mode == 'full'
+
+        self._reads = 0
+        self._sent = 0
+        self._failed = 0
+        self._last_sample = None
+        self._last_summary = None
+        self._last_line = time.monotonic()
+        self._last_line_reads = 0
+
+    def _write(self, text):
+        (self.stream or sys.stdout).write(text + "\n")
+
+    def _count(self, send_success):
+        if send_success is True:
+            self._sent += 1
+        elif send_success is False:
+            self._failed += 1
+
+    def _due(self):
+        return time.monotonic() - self._last_line >= self.interval
+
+    def _periodic_line(self):
+        now = time.monotonic()
+        elapsed = now - self._last_line
+        rate = (self._reads - self._last_line_reads) / elapsed if elapsed > 0 else 0.0
+        self._last_line = now
+        self._last_line_reads = self._reads
+        sample = self._last_sample or {}
+        time_domain = sample.get('time_domain', {})
+        frequency_domain = sample.get('frequency_domain', {})
+
+        if self.mode == 'json':
+            record = {
+                'time': time.time(),
+                'reads': self._reads,
+                'read_rate': rate,
+                'sent': self._sent,
+                'failed': self._failed,
+                'time_domain': time_domain,
+                'frequency_domain': frequency_domain,
+            }
+            if self._last_summary is not None:
+                record['summary'] = self._last_summary
+            self._write(json.dumps(record))
+            return
+
+        line = (f"{time.strftime('%H:%M:%S')} reads={self._reads} ({rate:.1f}/s) "
+                f"sent={self._sent} failed={self._failed}")
+        if time_domain:
+            line += f" mean_power={time_domain['mean_power']:.6f}"
+        if frequency_domain:
+            line += f" peak={frequency_domain['peak_freq_mhz']:.3f}MHz"
+        self._write(line)
+
+    def sample(self, sample_data, send_success=None):
+        """
+        Report one read.
+
+        Args:
+            sample_data (dict): Sample message data
+            send_success (bool, optional): Result of the ActiveMQ send, None if not sent
+        """
+        if self.mode == 'quiet':
+            return
+        if self.verbose:
+            self._write(format_sample_report(sample_data, send_success))
+            return
+        self._reads += 1
+        self._count(send_success)
+        self._last_sample = sample_data
+        if self._due():
+            self._periodic_line()
+
+    def summary(self, summary_data, send_success=None):
+        """
+        Report the periodic summary statistics.
+
+        Args:
+            summary_data (dict): Summary message data
+            send_success (bool, optional): Result of the ActiveMQ send, None if not sent
+        """
+        if self.mode == 'quiet':
+            return
+        if self.verbose:
+            self._write(format_summary_report(summary_data, send_success))
+            return
+        self._count(send_success)
+        self._last_summary = summary_data
+
+    def info(self, text):
+        """
+        Report a detail line that is only shown in full mode.
+
+        Args:
+            text (str): Line to write
+        """
+        if self.verbose:
+            self._write(text)
+
+    def notice(self, text):
+        """
+        Report a warning line, shown in full and compact modes.
+
+        Args:
+            text (str): Line to write
+        """
+        if self.mode in ('full', 'compact'):
+            self._write(text)
+
+    def status(self, name, stats, printer):
+        """
+        Report a block of counters (pipeline, publisher, ...).
+
+        Args:
+            name (str): Block name, used as the record type in json mode
+            stats (dict): Counters to report
+            printer (callable): Prints the block in full and compact modes
+        """
+        if self.mode == 'quiet':
+            return
+        if self.mode == 'json':
+            self._write(json.dumps({'type': name, 'time': time.time(), **stats}))
+        else:
+            printer(stats)
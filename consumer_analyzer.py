@@ -0,0 +1,499 @@
+﻿#!/usr/bin/env python
+"""
+Consumer-side latency and throughput analyzer for the SDR and publisher destinations.
+
+Subscribes to creds.SDR_DEST and creds.PUBLISHER_DEST (or any destinations
+given) and reports, per destination, what a consumer actually sees:
+
+    - end-to-end latency (receive time minus send time) in HDR-style
+      histograms: log-linear buckets with a fixed relative precision, so
+      microsecond and multi-second latencies are both resolved
+    - message rate and bytes per second
+    - sequence gaps, duplicates and out-of-order messages
+
+The send time of a message is taken from, in order: a 'send-time' header
+(load_generator.py), the header of a binary spectrum frame or waterfall tile,
+the 'timestamp' field of a JSON message (sdr.py), or the ISO 8601 body of a
+publisher.py message. Batched frames from AsyncPublisher are split into their
+messages. Sequences are the 'sequence' header per 'producer' (load
+generator) or the read_number of sdr.py sample messages per channel; sdr.py
+numbers reads rather than messages, so averaging or change-driven publishing
+show up as gaps there. Send and receive clocks must be synchronized for
+latencies between hosts to mean anything.
+
+The STOMP receiver thread only timestamps and queues frames. The main thread
+decodes them in batches, records each batch's latencies in one vectorized
+histogram update and acknowledges them (client-individual acks by default,
+or one cumulative 'client' ack per batch), so with a large enough prefetch
+the analyzer keeps up with the producers.
+
+Usage:
+    python consumer_analyzer.py [--dest DEST ...] [--prefetch N] [--batch-size N]
+                                [--ack MODE] [--duration SECONDS] [--interval SECONDS]
+"""
+
+import argparse
+import datetime
+import json
+import queue
+import sys
+import time
+
+import numpy as np
+
+import config
+import creds
+from async_publisher import unpack_batch
+from spectrum_frames import MAGIC as FRAME_MAGIC, decode_spectrum_frame
+from waterfall import MAGIC as TILE_MAGIC, decode_tile
+
+ACK_MODES = ('auto', 'client', 'client-individual')
+
+# Percentiles of the printed latency distribution
+REPORT_PERCENTILES = (50, 75, 90, 99, 99.9, 99.99, 100)
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram.
+
+    Latencies are recorded in whole microseconds. Values below 2**bits are
+    counted exactly; above that each power-of-two range is split into
+    2**(bits - 1) equal buckets, so every value is known within a relative
+    error of 2**-(bits - 1) (0.8% with the default 8 bits) from a few
+    thousand counters.
+    """
+
+    def __init__(self, significant_bits=8, max_seconds=3600.0):
+        """
+        Args:
+            significant_bits (int): Bits of precision kept per value
+            max_seconds (float): Largest latency resolved; larger values are clamped
+        """
+        self.bits = significant_bits
+        self.sub_count = 1 << significant_bits
+        self.half = self.sub_count >> 1
+        self.max_us = int(max_seconds * 1e6)
+        top_exponent = max(0, self.max_us.bit_length() - significant_bits)
+        self.counts = np.zeros(self.sub_count + top_exponent * self.half, dtype=np.int64)
+        self.total = 0
+        self.negative = 0
+        self.min_value = None
+        self.max_value = None
+        self._sum = 0.0
+
+    def _indices(self, values_us):
+        exponent = np.maximum(np.frexp(values_us.astype(np.float64))[1] - self.bits, 0)
+        mantissa = values_us >> exponent
+        return np.where(exponent == 0, values_us,
+                        self.sub_count + (exponent - 1) * self.half + mantissa - self.half)
+
+    def _bucket_range(self, index):
+        if index < self.sub_count:
+            return index, 1
+        exponent, offset = divmod(index - self.sub_count, self.half)
+        exponent += 1
+        return (offset + self.half) << exponent, 1 << exponent
+
+    def record(self, latencies):
+        """
+        Record latencies.
+
+        Args:
+            latencies (array-like): Latencies in seconds; negative values (clock
+                skew) are counted separately and recorded as zero
+        """
+        values = np.asarray(latencies, dtype=np.float64)
+        if not len(values):
+            return
+        self.negative += int(np.count_nonzero(values < 0))
+        values = np.clip(values, 0.0, None)
+        self.total += len(values)
+        self._sum += float(values.sum())
+        low, high = float(values.min()), float(values.max())
+        self.min_value = low if self.min_value is None else min(self.min_value, low)
+        self.max_value = high if self.max_value is None else max(self.max_value, high)
+        values_us = np.minimum(np.rint(values * 1e6), self.max_us).astype(np.int64)
+        np.add.at(self.counts, self._indices(values_us), 1)
+
+    def percentile(self, percent):
+        """
+        Return the latency below which percent of the values fall.
+
+        Args:
+            percent (float): Percentile, 0 to 100
+
+        Returns:
+            float: Highest value equivalent to the bucket of the percentile, in
+            seconds (never above the largest recorded value); 0 when empty
+        """
+        if not self.total:
+            return 0.0
+        if percent >= 100:
+            return self.max_value
+        rank = max(1, int(np.ceil(percent / 100 * self.total)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        lower, width = self._bucket_range(index)
+        return min((lower + width - 1) / 1e6, self.max_value)
+
+    def summary(self):
+        """
+        Summarize the distribution.
+
+        Returns:
+            dict: count, negative (clock skew), min, mean, max and p<percentile>
+            entries for REPORT_PERCENTILES, in seconds
+        """
+        summary = {
+            'count': self.total,
+            'negative': self.negative,
+            'min': self.min_value or 0.0,
+            'mean': self._sum / self.total if self.total else 0.0,
+            'max': self.max_value or 0.0,
+        }
+        for percent in REPORT_PERCENTILES:
+            summary[f'p{percent:g}'] = self.percentile(percent)
+        return summary
+
+
+class SequenceTracker:
+    """
+    Counts gaps, duplicates and reordering in per-source sequence numbers.
+    """
+
+    def __init__(self):
+        self.last = {}
+        self.gaps = 0
+        self.missing = 0
+        self.out_of_order = 0
+
+    def update(self, key, sequence):
+        """
+        Check the next sequence number of a source.
+
+        Args:
+            key: Source identifier
+            sequence (int): Sequence number
+        """
+        last = self.last.get(key)
+        if last is not None:
+            if sequence <= last:
+                self.out_of_order += 1
+                return
+            if sequence > last + 1:
+                self.gaps += 1
+                self.missing += sequence - last - 1
+        self.last[key] = sequence
+
+
+def _iso_time(text):
+    return datetime.datetime.fromisoformat(text.strip().replace('Z', '+00:00')).timestamp()
+
+
+def _decode_body(body, headers):
+    # Returns (send_time, source, sequence) for one message body
+    channel = headers.get('channel')
+    if 'send-time' in headers:
+        sequence = headers.get('sequence')
+        return (float(headers['send-time']), headers.get('producer', channel),
+                int(sequence) if sequence is not None else None)
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        magic = bytes(body[:4])
+        if magic == FRAME_MAGIC:
+            frame = decode_spectrum_frame(body)
+            metadata = frame['metadata']
+            data = metadata.get('data') or {}
+            sequence = data.get('read_number') if metadata.get('type') == 'sample' else None
+            return frame['timestamp'], metadata.get('channel', channel), sequence
+        if magic == TILE_MAGIC:
+            timestamps = decode_tile(body)['timestamps']
+            return (float(timestamps[-1]) if len(timestamps) else None), channel, None
+        body = bytes(body).decode('utf-8')
+    text = body.strip()
+    if text.startswith('{'):
+        message = json.loads(text)
+        data = message.get('data')
+        sequence = None
+        if message.get('type') == 'sample' and isinstance(data, dict):
+            sequence = data.get('read_number')
+        return message.get('timestamp'), message.get('channel', channel), sequence
+    return _iso_time(text), channel, None
+
+
+def decode_message(headers, body):
+    """
+    Extract the send time and sequence of every message in a received frame.
+
+    Args:
+        headers (dict): Frame headers
+        body (str or bytes): Frame body
+
+    Returns:
+        list: (send_time or None, source, sequence or None) per message
+    """
+    return [_decode_body(part, headers) for part in unpack_batch(body, headers)]
+
+
+class DestinationStats:
+    """
+    Latency, throughput and sequence statistics of one destination.
+    """
+
+    def __init__(self, destination):
+        self.destination = destination
+        self.latency = LatencyHistogram()
+        self.sequences = SequenceTracker()
+        self.frames = 0
+        self.messages = 0
+        self.bytes = 0
+        self.errors = 0
+        self.first_receive = None
+        self.last_receive = None
+
+    def summary(self):
+        """
+        Summarize the destination.
+
+        Returns:
+            dict: Message, frame, byte and error counts, rates, latency summary and
+            sequence gap counters
+        """
+        elapsed = 0.0
+        if self.first_receive is not None:
+            elapsed = self.last_receive - self.first_receive
+        return {
+            'destination': self.destination,
+            'frames': self.frames,
+            'messages': self.messages,
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'elapsed': elapsed,
+            'message_rate': self.messages / elapsed if elapsed > 0 else 0.0,
+            'bytes_per_second': self.bytes / elapsed if elapsed > 0 else 0.0,
+            'latency': self.latency.summary(),
+            'gaps': self.sequences.gaps,
+            'missing': self.sequences.missing,
+            'out_of_order': self.sequences.out_of_order,
+        }
+
+
+class _QueueListener:
+    """Timestamps received frames and queues them for the analyzer."""
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def on_message(self, frame):
+        self.frames.put((time.time(), frame.headers, frame.body))
+
+    def on_error(self, frame):
+        print('ActiveMQ error:', frame.body)
+
+
+class ConsumerAnalyzer:
+    """
+    Subscribes to destinations and analyzes what arrives in batches.
+    """
+
+    def __init__(self, conn, destinations, ack='client-individual', prefetch=1000,
+                 batch_size=500):
+        """
+        Args:
+            conn (stomp.Connection): Connected connection, created with auto_decode=False
+                so binary bodies arrive as bytes
+            destinations (list): Destinations to subscribe to
+            ack (str): 'auto', 'client' (one cumulative ack per batch) or
+                'client-individual' (every message acked)
+            prefetch (int): Unacknowledged messages the broker may send ahead
+            batch_size (int): Maximum frames decoded and acknowledged together
+        """
+        if ack not in ACK_MODES:
+            raise ValueError(f"Unknown ack mode: {ack}")
+        self.conn = conn
+        self.destinations = list(destinations)
+        self.ack = ack
+        self.prefetch = prefetch
+        self.batch_size = batch_size
+        self.frames = queue.SimpleQueue()
+        self.stats = {destination: DestinationStats(destination)
+                      for destination in self.destinations}
+        self._subscriptions = {}
+        conn.set_listener('consumer-analyzer', _QueueListener(self.frames))
+
+    def start(self):
+        """Subscribe to every destination."""
+        for number, destination in enumerate(self.destinations, 1):
+            sub_id = str(number)
+            self._subscriptions[sub_id] = destination
+            self.conn.subscribe(destination, sub_id, ack=self.ack,
+                                headers={'activemq.prefetchSize': str(self.prefetch)})
+
+    def process_batch(self, timeout=0.1):
+        """
+        Decode, record and acknowledge up to batch_size received frames.
+
+        Args:
+            timeout (float): Seconds to wait for the first frame
+
+        Returns:
+            int: Number of frames processed
+        """
+        try:
+            batch = [self.frames.get(timeout=timeout)]
+        except queue.Empty:
+            return 0
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.frames.get_nowait())
+            except queue.Empty:
+                break
+
+        latencies = {}
+        last_ack = {}
+        for receive_time, headers, body in batch:
+            destination = self._subscriptions.get(headers.get('subscription'),
+                                                  headers.get('destination'))
+            stats = self.stats.get(destination)
+            if stats is None:
+                stats = self.stats[destination] = DestinationStats(destination)
+            stats.frames += 1
+            stats.bytes += len(body)
+            if stats.first_receive is None:
+                stats.first_receive = receive_time
+            stats.last_receive = receive_time
+            try:
+                records = decode_message(headers, body)
+            except Exception:
+                stats.errors += 1
+                records = []
+            stats.messages += max(len(records), 1)
+            for send_time, source, sequence in records:
+                if send_time is not None:
+                    latencies.setdefault(destination, []).append(receive_time - send_time)
+                if sequence is not None:
+                    stats.sequences.update(source, sequence)
+
+            ack_id = headers.get('ack', headers.get('message-id'))
+            if self.ack == 'client-individual':
+                self.conn.ack(ack_id, headers.get('subscription'))
+            elif self.ack == 'client':
+                last_ack[headers.get('subscription')] = ack_id
+
+        for subscription, ack_id in last_ack.items():
+            # Cumulative: acknowledges everything delivered before it on the subscription
+            self.conn.ack(ack_id, subscription)
+        for destination, values in latencies.items():
+            self.stats[destination].latency.record(values)
+        return len(batch)
+
+    def run(self, duration=None, interval=10.0, report=None):
+        """
+        Process frames until the duration has passed or Ctrl+C.
+
+        Args:
+            duration (float, optional): Seconds to run, None for no limit
+            interval (float): Seconds between intermediate reports
+            report (callable, optional): Called with report() every interval
+        """
+        start = time.monotonic()
+        next_report = start + interval
+        try:
+            while duration is None or time.monotonic() - start < duration:
+                self.process_batch()
+                if report and time.monotonic() >= next_report:
+                    report(self.report())
+                    next_report += interval
+        except KeyboardInterrupt:
+            print("\nInterrupted by user")
+        # Drain what has already arrived
+        while self.process_batch(timeout=0):
+            pass
+
+    def report(self):
+        """
+        Return the statistics of every destination.
+
+        Returns:
+            list: DestinationStats.summary() per destination
+        """
+        return [stats.summary() for stats in self.stats.values()]
+
+
+def print_analyzer_report(report):
+    """
+    Print a ConsumerAnalyzer report.
+
+    Args:
+        report (list): Destination summaries from ConsumerAnalyzer.report()
+    """
+    for summary in report:
+        latency = summary['latency']
+        print(f"\n=== {summary['destination']} ===")
+        print(f"Messages: {summary['messages']} in {summary['frames']} frames, "
+              f"{summary['bytes'] / 1e6:.2f} MB, {summary['errors']} undecodable")
+        print(f"Rate: {summary['message_rate']:.1f} msg/s, "
+              f"{summary['bytes_per_second'] / 1e6:.3f} MB/s")
+        print(f"Sequence gaps: {summary['gaps']} ({summary['missing']} missing), "
+              f"out of order: {summary['out_of_order']}")
+        if not latency['count']:
+            print("Latency: no timestamped messages")
+            continue
+        print(f"Latency over {latency['count']} messages (ms): min {latency['min'] * 1e3:.3f}, "
+              f"mean {latency['mean'] * 1e3:.3f}")
+        for percent in REPORT_PERCENTILES:
+            print(f"  {percent:>7g}%  {latency[f'p{percent:g}'] * 1e3:10.3f}")
+        if latency['negative']:
+            print(f"  {latency['negative']} negative latencies (unsynchronized clocks?)")
+
+
+def parse_args(argv=None):
+    """Parse command line arguments (none by default)."""
+    parser = argparse.ArgumentParser(
+        description="Measure the latency, rate and sequence gaps consumers see")
+    parser.add_argument('--dest', action='append', default=None, metavar='DEST',
+                        help="Destination to analyze (repeatable; default: the SDR and "
+                             "publisher destinations)")
+    parser.add_argument('--ack', choices=ACK_MODES, default='client-individual',
+                        help="Subscription ack mode")
+    parser.add_argument('--prefetch', type=int, default=1000,
+                        help="Unacknowledged messages the broker may send ahead")
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help="Maximum messages decoded and acknowledged together")
+    parser.add_argument('--duration', type=float, default=None, metavar='SECONDS',
+                        help="Stop after SECONDS (default: run until Ctrl+C)")
+    parser.add_argument('--interval', type=float, default=10.0, metavar='SECONDS',
+                        help="Seconds between intermediate reports")
+    parser.add_argument('--json', action='store_true',
+                        help="Print the final report as JSON")
+    config.add_arguments(parser, ('broker', 'sdr_dest', 'publisher_dest'))
+    return parser.parse_args(argv or [])
+
+
+def main(argv=None):
+    import stomp
+
+    args = parse_args(argv)
+    config.configure_from_args(args)
+    destinations = args.dest or [creds.SDR_DEST, creds.PUBLISHER_DEST]
+
+    conn = stomp.Connection(creds.BROKER, auto_decode=False)
+    analyzer = ConsumerAnalyzer(conn, destinations, args.ack, args.prefetch, args.batch_size)
+    conn.connect(creds.USER, creds.PASS, wait=True)
+    try:
+        analyzer.start()
+        print(f"Analyzing {', '.join(destinations)}. Press Ctrl+C to stop...")
+        analyzer.run(args.duration, args.interval,
+                     None if args.json else print_analyzer_report)
+    finally:
+        conn.disconnect()
+
+    report = analyzer.report()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_analyzer_report(report)
+    return report
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
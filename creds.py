@@ -1,26 +1,26 @@
 ﻿# creds.py
 
 """
-Load ActiveMQ connection settings from environment variables (with optional .env support).
-Ensure you have python-dotenv installed: pip install python-dotenv
-"""
-import os
-from dotenv import load_dotenv
+ActiveMQ connection settings, as module attributes.
 
-# Load environment variables from .env file (if present)
-load_dotenv()
+The settings come from the config module, which loads them once from the
+environment (and an optional .env file) and applies command line overrides.
+BROKER, USER, PASS, DEST, SDR_DEST and PUBLISHER_DEST always reflect the
+current configuration; use config.reset() to load it again.
+"""
+import config
 
-# Broker host and port
-BROKER = [(
-    os.getenv('ACTIVEMQ_HOST', 'localhost'),
-    int(os.getenv('ACTIVEMQ_PORT', '61613'))
-)]
+_ATTRIBUTES = {
+    'BROKER': 'broker',
+    'USER': 'user',
+    'PASS': 'password',
+    'DEST': 'dest',  # Legacy destination for backward compatibility
+    'SDR_DEST': 'sdr_dest',  # Destination for SDR data
+    'PUBLISHER_DEST': 'publisher_dest',  # Destination for publisher data
+}
 
-# Destinations (queues or topics)
-DEST = os.getenv('ACTIVEMQ_DEST', '/queue/test')  # Legacy destination for backward compatibility
-SDR_DEST = os.getenv('ACTIVEMQ_SDR_DEST', '/queue/sdr')  # Destination for SDR data
-PUBLISHER_DEST = os.getenv('ACTIVEMQ_PUBLISHER_DEST', '/queue/publisher')  # Destination for publisher data
 
-# Credentials
-USER = os.getenv('ACTIVEMQ_USER', 'admin')
-PASS = os.getenv('ACTIVEMQ_PASS', 'admin')
+def __getattr__(name):
+    if name in _ATTRIBUTES:
+        return getattr(config.get_config(), _ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
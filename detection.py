@@ -0,0 +1,259 @@
+﻿#!/usr/bin/env python
+"""
+CFAR signal detection over power spectra.
+
+CfarDetector compares every bin of a linear power spectrum with a threshold
+derived from its neighbours (constant false alarm rate detection):
+    ca  cell-averaging: the mean of the training cells on both sides, computed
+        for all bins at once from a cumulative sum
+    os  ordered-statistic: the k-th smallest training cell, computed for all
+        bins at once from a sliding window view and numpy.partition; more
+        robust when another signal sits in the training cells
+Guard cells next to the bin under test are left out so a signal's own skirt
+does not raise its threshold. The scale factor is derived from the requested
+false alarm probability assuming exponentially distributed noise power (a
+single periodogram); averaged spectra have less variance, so the false alarm
+rate is then lower than requested.
+
+Bins above threshold are merged into regions, each reported with its
+power-weighted center frequency, bandwidth and SNR. DetectionTracker follows
+regions from spectrum to spectrum and turns them into start/stop events.
+"""
+
+import time
+from collections import namedtuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+CFAR_METHODS = ('ca', 'os')
+
+Detection = namedtuple(
+    'Detection',
+    ['center_freq', 'bandwidth', 'snr_db', 'peak_freq', 'peak_power', 'start_bin', 'stop_bin']
+)
+
+
+def ca_scale(num_cells, pfa):
+    """
+    Threshold scale of a cell-averaging CFAR.
+
+    Args:
+        num_cells (int): Number of training cells (both sides)
+        pfa (float): False alarm probability per bin
+
+    Returns:
+        float: Factor applied to the mean training cell power
+    """
+    return num_cells * (pfa ** (-1 / num_cells) - 1)
+
+
+def os_scale(num_cells, rank, pfa):
+    """
+    Threshold scale of an ordered-statistic CFAR.
+
+    Solves pfa = prod_{i<rank} (N - i) / (N - i + scale) by bisection.
+
+    Args:
+        num_cells (int): Number of training cells (N, both sides)
+        rank (int): Order of the statistic used as noise estimate (1 = smallest)
+        pfa (float): False alarm probability per bin
+
+    Returns:
+        float: Factor applied to the rank-th smallest training cell power
+    """
+    cells = num_cells - np.arange(rank)
+    low, high = 0.0, 1.0
+    while np.prod(cells / (cells + high)) > pfa:
+        high *= 2
+    for _ in range(100):
+        middle = (low + high) / 2
+        if np.prod(cells / (cells + middle)) > pfa:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+class CfarDetector:
+    """
+    Vectorized CA/OS-CFAR detector that merges detected bins into signal regions.
+    """
+
+    def __init__(self, method='ca', guard_cells=2, training_cells=16, pfa=1e-3, rank=0.75,
+                 merge_gap=1):
+        """
+        Args:
+            method (str): 'ca' (cell-averaging) or 'os' (ordered-statistic)
+            guard_cells (int): Cells left out on each side of the bin under test
+            training_cells (int): Cells used for the noise estimate on each side
+            pfa (float): False alarm probability per bin
+            rank (float): Order statistic of the OS-CFAR as a fraction of the training cells
+            merge_gap (int): Regions separated by at most this many bins are merged
+        """
+        if method not in CFAR_METHODS:
+            raise ValueError(f"Unknown CFAR method: {method}")
+        self.method = method
+        self.guard_cells = guard_cells
+        self.training_cells = training_cells
+        self.merge_gap = merge_gap
+        num_cells = 2 * training_cells
+        if method == 'ca':
+            self.scale = ca_scale(num_cells, pfa)
+        else:
+            self.rank = min(num_cells, max(1, int(round(rank * num_cells))))
+            self.scale = os_scale(num_cells, self.rank, pfa)
+
+    def noise_estimate(self, power):
+        """
+        Estimate the noise power around every bin from its training cells.
+
+        Args:
+            power (numpy.ndarray): Linear power spectrum
+
+        Returns:
+            numpy.ndarray: Noise power per bin (the spectrum is mirrored at its edges)
+        """
+        reach = self.guard_cells + self.training_cells
+        padded = np.pad(power, reach, mode='reflect')
+        if self.method == 'ca':
+            total = np.concatenate(([0.0], np.cumsum(padded)))
+            n = len(power)
+            outer = total[2 * reach + 1:2 * reach + 1 + n] - total[:n]
+            inner = (total[reach + self.guard_cells + 1:reach + self.guard_cells + 1 + n]
+                     - total[self.training_cells:self.training_cells + n])
+            return (outer - inner) / (2 * self.training_cells)
+        windows = sliding_window_view(padded, 2 * reach + 1)
+        cells = np.concatenate((windows[:, :self.training_cells],
+                                windows[:, -self.training_cells:]), axis=1)
+        return np.partition(cells, self.rank - 1, axis=1)[:, self.rank - 1]
+
+    def detect(self, power, sample_rate, center_freq=0.0):
+        """
+        Find the signal regions of a spectrum.
+
+        Args:
+            power (numpy.ndarray): Linear power spectrum in fftshift order
+            sample_rate (float): Sample rate (span of the spectrum) in Hz
+            center_freq (float): Frequency of the middle bin in Hz
+
+        Returns:
+            list: Detection per region, lowest frequency first
+        """
+        power = np.asarray(power, dtype=np.float64)
+        if len(power) <= 2 * (self.guard_cells + self.training_cells):
+            raise ValueError(f"Spectrum of {len(power)} bins is too short for the CFAR window")
+        noise = self.noise_estimate(power)
+        mask = power > self.scale * noise
+
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8), [0]))))
+        starts, stops = edges[::2], edges[1::2]
+        if len(starts) > 1:
+            separate = starts[1:] - stops[:-1] > self.merge_gap
+            starts = np.concatenate((starts[:1], starts[1:][separate]))
+            stops = np.concatenate((stops[:-1][separate], stops[-1:]))
+
+        bin_width = sample_rate / len(power)
+        freqs = center_freq + (np.arange(len(power)) - len(power) // 2) * bin_width
+        detections = []
+        for start, stop in zip(starts, stops):
+            region = power[start:stop]
+            peak = start + int(np.argmax(region))
+            detections.append(Detection(
+                float(np.dot(region, freqs[start:stop]) / region.sum()),
+                float((stop - start) * bin_width),
+                float(10 * np.log10(region.mean() / max(noise[start:stop].mean(), 1e-20))),
+                float(freqs[peak]),
+                float(power[peak]),
+                int(start),
+                int(stop)
+            ))
+        return detections
+
+
+class DetectionTracker:
+    """
+    Follows detections across spectra and reports when signals appear and disappear.
+
+    A detection continues a tracked signal when their frequency ranges overlap
+    (within freq_tolerance). A signal is only reported started once it has been
+    detected in confirm consecutive spectra, which suppresses isolated false
+    alarms, and reported stopped after it has been missing from hold
+    consecutive spectra, so brief fades do not produce stop/start pairs.
+    """
+
+    def __init__(self, freq_tolerance=0.0, confirm=2, hold=2):
+        """
+        Args:
+            freq_tolerance (float): Extra distance in Hz allowed between matching ranges
+            confirm (int): Consecutive detections before a signal is reported started
+            hold (int): Consecutive missed spectra before a signal is reported stopped
+        """
+        self.freq_tolerance = freq_tolerance
+        self.confirm = confirm
+        self.hold = hold
+        self.active = {}
+        self._next_id = 1
+
+    def _matches(self, signal, detection):
+        distance = abs(signal['center_freq'] - detection.center_freq)
+        return distance <= (signal['bandwidth'] + detection.bandwidth) / 2 + self.freq_tolerance
+
+    def update(self, detections, timestamp=None):
+        """
+        Match the detections of one spectrum against the tracked signals.
+
+        Args:
+            detections (list): Detection list from CfarDetector.detect
+            timestamp (float, optional): Time of the spectrum, defaults to now
+
+        Returns:
+            list: Event dicts ('start' or 'stop') with the signal id, frequency,
+            bandwidth and SNR; stop events also carry the duration and peak SNR
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        events = []
+        unmatched = dict(self.active)
+        for detection in detections:
+            signal_id = next((sid for sid, signal in unmatched.items()
+                              if self._matches(signal, detection)), None)
+            if signal_id is None:
+                signal_id = self._next_id
+                self._next_id += 1
+                self.active[signal_id] = {'start_time': timestamp, 'seen': 0,
+                                          'confirmed': False, 'peak_snr_db': detection.snr_db}
+            else:
+                del unmatched[signal_id]
+            signal = self.active[signal_id]
+            signal.update(center_freq=detection.center_freq, bandwidth=detection.bandwidth,
+                          snr_db=detection.snr_db, missed=0, last_time=timestamp)
+            signal['seen'] += 1
+            signal['peak_snr_db'] = max(signal['peak_snr_db'], detection.snr_db)
+            if not signal['confirmed'] and signal['seen'] >= self.confirm:
+                signal['confirmed'] = True
+                events.append(self._event('start', signal_id, signal, timestamp))
+
+        for signal_id, signal in unmatched.items():
+            if not signal['confirmed']:
+                # Never reported: forget it without an event
+                del self.active[signal_id]
+                continue
+            signal['missed'] += 1
+            if signal['missed'] >= self.hold:
+                del self.active[signal_id]
+                event = self._event('stop', signal_id, signal, timestamp)
+                event['duration'] = signal['last_time'] - signal['start_time']
+                event['peak_snr_db'] = signal['peak_snr_db']
+                events.append(event)
+        return events
+
+    @staticmethod
+    def _event(kind, signal_id, source, timestamp):
+        return {
+            'event': kind,
+            'signal_id': signal_id,
+            'time': timestamp,
+            'center_freq': source['center_freq'],
+            'bandwidth': source['bandwidth'],
+            'snr_db': source['snr_db'],
+        }
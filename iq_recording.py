@@ -0,0 +1,201 @@
+﻿#!/usr/bin/env python
+"""
+IQ recording and replay.
+
+IQRecorder streams raw complex64 samples to disk as a SigMF recording: a
+``<name>.sigmf-data`` file of interleaved little-endian float32 I/Q (SigMF
+datatype ``cf32_le``) next to a ``<name>.sigmf-meta`` JSON sidecar with the
+sample rate, center frequency, gain and start time.
+
+IQReplaySource memory-maps a recording and serves it frame by frame through
+the same ``read_samples`` interface as RtlSdr, paced at real time, a multiple
+of real time, or as fast as possible. Only the frames being read are paged in,
+so recordings larger than memory can be replayed.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from pipeline import FramePacer
+
+DATATYPE = 'cf32_le'
+SIGMF_VERSION = '1.0.0'
+DATA_EXTENSION = '.sigmf-data'
+META_EXTENSION = '.sigmf-meta'
+
+
+def recording_paths(path):
+    """
+    Return the data and metadata file names of a recording.
+
+    Args:
+        path (str): Recording name, with or without a SigMF extension
+
+    Returns:
+        tuple: (data_path, meta_path)
+    """
+    base, extension = os.path.splitext(path)
+    if extension not in (DATA_EXTENSION, META_EXTENSION):
+        base = path
+    return base + DATA_EXTENSION, base + META_EXTENSION
+
+
+class IQRecorder:
+    """
+    Writes sample frames to a SigMF recording.
+
+    The sidecar is written when the recording starts and rewritten with the
+    final sample count on close(). Can be used as a context manager.
+    """
+
+    def __init__(self, path, sample_rate, center_freq, gain=None, description=None):
+        """
+        Args:
+            path (str): Recording name, with or without a SigMF extension
+            sample_rate (float): Sample rate in Hz
+            center_freq (float): Center frequency in Hz
+            gain (float or str, optional): Tuner gain in dB, or 'auto'
+            description (str, optional): Free-text description stored in the sidecar
+        """
+        self.data_path, self.meta_path = recording_paths(path)
+        self.sample_rate = sample_rate
+        self.center_freq = center_freq
+        self.gain = gain
+        self.description = description
+        self.start_time = datetime.now(timezone.utc)
+        self.samples_written = 0
+        self._file = open(self.data_path, 'wb')
+        self._write_meta()
+
+    def _write_meta(self):
+        global_info = {
+            'core:datatype': DATATYPE,
+            'core:sample_rate': self.sample_rate,
+            'core:version': SIGMF_VERSION,
+            'core:recorder': 'sdr.py',
+            'sdr:gain': self.gain,
+            'sdr:sample_count': self.samples_written,
+        }
+        if self.description:
+            global_info['core:description'] = self.description
+        meta = {
+            'global': global_info,
+            'captures': [{
+                'core:sample_start': 0,
+                'core:frequency': self.center_freq,
+                'core:datetime': self.start_time.isoformat().replace('+00:00', 'Z'),
+            }],
+            'annotations': [],
+        }
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+    def write(self, samples):
+        """
+        Append a frame of samples.
+
+        Args:
+            samples (numpy.ndarray): Complex samples (converted to complex64)
+        """
+        samples = np.asarray(samples, dtype='<c8')
+        self._file.write(samples.tobytes())
+        self.samples_written += len(samples)
+
+    def close(self):
+        """Flush the data file and write the final sidecar."""
+        if self._file.closed:
+            return
+        self._file.close()
+        self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_metadata(path):
+    """
+    Read the sidecar of a recording.
+
+    Args:
+        path (str): Recording name, with or without a SigMF extension
+
+    Returns:
+        dict: Parsed SigMF metadata
+    """
+    with open(recording_paths(path)[1], encoding='utf-8') as f:
+        return json.load(f)
+
+
+class IQReplaySource:
+    """
+    Replays a SigMF recording through an RtlSdr-like interface.
+
+    Exposes sample_rate, center_freq, gain, read_samples(num_samples) and
+    close(), so it can be passed to read_and_print_samples or
+    run_threaded_pipeline in place of the device. read_samples raises EOFError
+    at the end of the recording unless loop is set.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False):
+        """
+        Args:
+            path (str): Recording name, with or without a SigMF extension
+            speed (float): Multiple of real time, 0 for as fast as possible
+            loop (bool): Start again from the beginning at the end of the recording
+        """
+        self.data_path, self.meta_path = recording_paths(path)
+        self.metadata = load_metadata(path)
+        global_info = self.metadata['global']
+        if global_info.get('core:datatype') != DATATYPE:
+            raise ValueError(f"Unsupported datatype: {global_info.get('core:datatype')}")
+        captures = self.metadata.get('captures') or [{}]
+
+        self.sample_rate = global_info['core:sample_rate']
+        self.center_freq = captures[0].get('core:frequency', 0.0)
+        self.gain = global_info.get('sdr:gain')
+        self.start_time = captures[0].get('core:datetime')
+        self.loop = loop
+        self.position = 0
+        self.pacer = FramePacer(self.sample_rate, speed)
+
+        if os.path.getsize(self.data_path) == 0:
+            self.samples = np.empty(0, dtype='<c8')
+        else:
+            self.samples = np.memmap(self.data_path, dtype='<c8', mode='r')
+
+    def __len__(self):
+        return len(self.samples)
+
+    def read_samples(self, num_samples):
+        """
+        Return the next frame of the recording.
+
+        Args:
+            num_samples (int): Number of samples
+
+        Returns:
+            numpy.ndarray: Read-only complex64 view of the recording
+
+        Raises:
+            EOFError: At the end of the recording (unless looping)
+        """
+        total = len(self.samples)
+        if self.position + num_samples > total:
+            if not self.loop or num_samples > total:
+                raise EOFError("End of recording")
+            # Wrap to the beginning; the partial frame at the end is dropped
+            self.position = 0
+        self.pacer.wait(num_samples)
+        frame = self.samples[self.position:self.position + num_samples]
+        self.position += num_samples
+        return frame.view(np.ndarray)
+
+    def close(self):
+        """Release the memory map."""
+        self.samples = np.empty(0, dtype='<c8')
@@ -0,0 +1,270 @@
+﻿#!/usr/bin/env python
+"""
+Multi-connection load generator for the broker and its consumers.
+
+LoadGenerator sends messages at a target rate over several connections, one
+thread each, for a fixed duration. Every worker sends on an absolute-deadline
+schedule: message n of worker w is due at
+
+    start + w / rate + n * connections / rate
+
+so the workers interleave evenly and a late send does not shift any later
+deadline (the worker catches up instead of drifting). Every message carries
+its producer (worker) number, a per-producer sequence number and its send
+time, in the headers 'producer', 'sequence' and 'send-time' (Unix seconds),
+so consumers can measure end-to-end latency and detect gaps whatever the
+payload shape:
+
+    timestamp  the send time as an ISO 8601 string (size is ignored)
+    json       a synthetic SDR sample message of about size bytes, with the
+               sequence and send time also in its data
+    binary     size bytes: a '<IQd' header (producer, sequence, send time)
+               followed by random filler
+
+The report gives the achieved rate, the send latency percentiles (the time
+spent in the connection's send call), the largest scheduling lag and errors.
+"""
+
+import datetime
+import json
+import os
+import struct
+import threading
+import time
+from array import array
+
+from connection import BUFFERED, body_size
+
+PAYLOAD_SHAPES = ('timestamp', 'json', 'binary')
+BINARY_HEADER = struct.Struct('<IQd')
+
+
+class PayloadFactory:
+    """
+    Builds the body and headers of load messages.
+    """
+
+    def __init__(self, shape='json', size=1024):
+        """
+        Args:
+            shape (str): 'timestamp', 'json' or 'binary'
+            size (int): Approximate body size in bytes (json and binary)
+        """
+        if shape not in PAYLOAD_SHAPES:
+            raise ValueError(f"Unknown payload shape: {shape}")
+        self.shape = shape
+        self.size = size
+        if shape == 'json':
+            import numpy as np
+
+            # Each spectrum value takes about 8 bytes ("-43.21, ") in the JSON body
+            bins = max(0, (size - 250) // 8)
+            rng = np.random.default_rng(0)
+            self.spectrum = np.round(rng.normal(-40, 5, bins), 2).tolist()
+        elif shape == 'binary':
+            self.filler = os.urandom(max(0, size - BINARY_HEADER.size))
+
+    def build(self, producer, sequence, send_time):
+        """
+        Build one message.
+
+        Args:
+            producer (int): Worker number
+            sequence (int): Sequence number within the producer, from 1
+            send_time (float): Send time (Unix seconds)
+
+        Returns:
+            tuple: (body, headers)
+        """
+        headers = {
+            'producer': str(producer),
+            'sequence': str(sequence),
+            'send-time': repr(send_time),
+        }
+        if self.shape == 'timestamp':
+            body = datetime.datetime.fromtimestamp(
+                send_time, datetime.timezone.utc).isoformat().replace('+00:00', 'Z')
+            headers['content-type'] = 'text/plain'
+        elif self.shape == 'json':
+            body = json.dumps({
+                'timestamp': send_time,
+                'type': 'sample',
+                'data': {'read_number': sequence, 'producer': producer, 'sequence': sequence,
+                         'send_time': send_time},
+                'center_freq': 162.450e6,
+                'sample_rate': 2.048e6,
+                'simulated': True,
+                'spectrum_db': self.spectrum,
+            })
+        else:
+            body = BINARY_HEADER.pack(producer, sequence, send_time) + self.filler
+            headers['content-type'] = 'application/octet-stream'
+            headers['content-length'] = str(len(body))
+        return body, headers
+
+
+def latency_percentiles(latencies):
+    """
+    Summarize latencies.
+
+    Args:
+        latencies (sequence): Latencies in seconds
+
+    Returns:
+        dict: p50, p90, p99, p999 and max in seconds (zeros when empty)
+    """
+    if not len(latencies):
+        return {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'p999': 0.0, 'max': 0.0}
+    import numpy as np
+
+    values = np.asarray(latencies, dtype=np.float64)
+    p50, p90, p99, p999 = np.percentile(values, [50, 90, 99, 99.9])
+    return {'p50': float(p50), 'p90': float(p90), 'p99': float(p99), 'p999': float(p999),
+            'max': float(values.max())}
+
+
+class LoadGenerator:
+    """
+    Sends messages at a target rate from parallel connections.
+    """
+
+    def __init__(self, connect, destination, rate=100.0, connections=1, duration=10.0,
+                 shape='json', size=1024, metrics=None):
+        """
+        Args:
+            connect (callable): Returns a new connected connection (one per worker)
+            destination (str): STOMP destination
+            rate (float): Target messages per second over all connections
+            connections (int): Parallel connections, one sending thread each
+            duration (float): Seconds to send for
+            shape (str): Payload shape, see PAYLOAD_SHAPES
+            size (int): Approximate payload size in bytes
+            metrics (metrics.PipelineMetrics, optional): Also record sends in these metrics
+        """
+        if rate <= 0 or connections < 1:
+            raise ValueError("rate and connections must be positive")
+        self.connect = connect
+        self.destination = destination
+        self.rate = rate
+        self.connections = connections
+        self.duration = duration
+        self.payload = PayloadFactory(shape, size)
+        self.metrics = metrics
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Make the workers stop after their current message."""
+        self._stop.set()
+
+    def _worker(self, producer, conn, start, result):
+        interval = self.connections / self.rate
+        first = start + producer / self.rate
+        end = start + self.duration
+        latencies = result['latencies']
+        sequence = 0
+        while not self._stop.is_set():
+            deadline = first + sequence * interval
+            if deadline >= end:
+                break
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                result['max_lag'] = max(result['max_lag'], -delay)
+
+            sequence += 1
+            body, headers = self.payload.build(producer, sequence, time.time())
+            send_start = time.perf_counter()
+            try:
+                outcome = conn.send(destination=self.destination, body=body, headers=headers)
+            except Exception as e:
+                outcome = False
+                result['last_error'] = str(e) or type(e).__name__
+            latencies.append(time.perf_counter() - send_start)
+            if self.metrics is not None:
+                if outcome is False:
+                    self.metrics.send_failures.inc()
+                else:
+                    self.metrics.record_send(outcome, body, latencies[-1])
+            if outcome is BUFFERED:
+                # Held by a ConnectionManager during an outage, not sent yet
+                result['buffered'] += 1
+            elif outcome is not False:
+                result['messages'] += 1
+                result['bytes'] += body_size(body)
+            else:
+                result['errors'] += 1
+
+    def run(self):
+        """
+        Connect, send for the configured duration and report.
+
+        Returns:
+            dict: Messages sent, messages buffered for replay, errors, bytes,
+            elapsed seconds, target and achieved rate, send latency percentiles
+            and the largest scheduling lag
+        """
+        conns = [self.connect() for _ in range(self.connections)]
+        results = [{'messages': 0, 'buffered': 0, 'errors': 0, 'bytes': 0, 'max_lag': 0.0,
+                    'last_error': None, 'latencies': array('d')} for _ in conns]
+        start = time.monotonic()
+        threads = [threading.Thread(target=self._worker, args=(producer, conn, start, result),
+                                    name=f'load-{producer}', daemon=True)
+                   for producer, (conn, result) in enumerate(zip(conns, results))]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.2)
+        except KeyboardInterrupt:
+            self.stop()
+            for thread in threads:
+                thread.join()
+        elapsed = time.monotonic() - start
+        for conn in conns:
+            conn.disconnect()
+
+        messages = sum(result['messages'] for result in results)
+        latencies = array('d')
+        for result in results:
+            latencies.extend(result['latencies'])
+        errors = [result['last_error'] for result in results if result['last_error']]
+        return {
+            'connections': self.connections,
+            'shape': self.payload.shape,
+            'messages': messages,
+            'buffered': sum(result['buffered'] for result in results),
+            'errors': sum(result['errors'] for result in results),
+            'last_error': errors[-1] if errors else None,
+            'bytes': sum(result['bytes'] for result in results),
+            'elapsed': elapsed,
+            'target_rate': self.rate,
+            'achieved_rate': messages / elapsed if elapsed > 0 else 0.0,
+            'send_latency': latency_percentiles(latencies),
+            'max_lag': max(result['max_lag'] for result in results),
+        }
+
+
+def print_load_report(report):
+    """
+    Print a LoadGenerator report.
+
+    Args:
+        report (dict): Report returned by LoadGenerator.run()
+    """
+    latency = report['send_latency']
+    print("\n=== Load Generator Report ===")
+    print(f"Connections: {report['connections']}, payload: {report['shape']}")
+    print(f"Messages sent: {report['messages']} ({report['bytes'] / 1e6:.2f} MB) "
+          f"in {report['elapsed']:.2f} s")
+    print(f"Rate: {report['achieved_rate']:.1f} msg/s achieved, "
+          f"{report['target_rate']:.1f} msg/s target")
+    print(f"Send latency p50/p90/p99/p99.9/max: {latency['p50'] * 1e3:.3f}/"
+          f"{latency['p90'] * 1e3:.3f}/{latency['p99'] * 1e3:.3f}/{latency['p999'] * 1e3:.3f}/"
+          f"{latency['max'] * 1e3:.3f} ms")
+    print(f"Largest scheduling lag: {report['max_lag'] * 1e3:.2f} ms")
+    print(f"Buffered during outages: {report['buffered']}")
+    print(f"Errors: {report['errors']}")
+    if report['last_error']:
+        print(f"Last error: {report['last_error']}")
@@ -0,0 +1,427 @@
+﻿#!/usr/bin/env python
+"""
+Counters, gauges and latency histograms served in the Prometheus text format.
+
+MetricsRegistry creates metrics (optionally with constant labels, e.g. one
+latency histogram per pipeline stage under the same name) and renders them in
+the Prometheus text exposition format; MetricsServer serves that on a local
+HTTP port at /metrics from a daemon thread. Counters and gauges can also be
+backed by a function that is only called when the metrics are scraped, for
+values another component already counts (queue depth, drops, overruns).
+
+Updating a metric is one lock and an addition (a bisect for histograms), cheap
+enough to leave on. NULL_REGISTRY hands out metrics whose methods do nothing,
+so instrumented code runs unchanged with metrics disabled.
+
+PipelineMetrics defines the metrics of sdr.py and publisher.py.
+"""
+
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+from time import perf_counter
+
+from async_publisher import QUEUED
+from connection import BUFFERED, body_size
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds, from 25 microseconds to 10 seconds
+DEFAULT_BUCKETS = (25e-6, 50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3,
+                   50e-3, 100e-3, 250e-3, 500e-3, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """Monotonically increasing count."""
+
+    kind = 'counter'
+
+    def __init__(self):
+        self._value = 0
+        self._fn = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """Add amount (default 1) to the count."""
+        with self._lock:
+            self._value += amount
+
+    def set_function(self, fn):
+        """Report fn() instead of the incremented count when scraped."""
+        self._fn = fn
+
+    def get(self):
+        """Return the current value."""
+        if self._fn is not None:
+            return self._fn()
+        return self._value
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = 'gauge'
+
+    def set(self, value):
+        """Set the value."""
+        with self._lock:
+            self._value = value
+
+    def dec(self, amount=1):
+        """Subtract amount (default 1) from the value."""
+        self.inc(-amount)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(perf_counter() - self.start)
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets (tuple): Increasing upper bounds of the buckets (+Inf is implied)
+        """
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Record one value."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self):
+        """Return a context manager that observes the seconds spent inside it."""
+        return _Timer(self)
+
+    def snapshot(self):
+        """
+        Return the current distribution.
+
+        Returns:
+            tuple: (cumulative count per bucket including +Inf, sum, count)
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+
+def _format_value(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    value = float(value)
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class MetricsRegistry:
+    """
+    Creates metrics and renders them in the Prometheus text format.
+
+    Metrics with the same name but different labels form one family and must be
+    of the same kind.
+    """
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, labels, *args):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            kind, _, metrics = self._families.setdefault(name, (cls.kind, help_text, {}))
+            if kind != cls.kind:
+                raise ValueError(f"Metric {name} is already registered as a {kind}")
+            if key not in metrics:
+                metrics[key] = cls(*args)
+            return metrics[key]
+
+    def counter(self, name, help_text, **labels):
+        """
+        Get or create a counter.
+
+        Args:
+            name (str): Metric name (by convention ending in _total)
+            help_text (str): Description shown in the HELP line
+            **labels: Constant labels of this metric
+
+        Returns:
+            Counter: The counter
+        """
+        return self._register(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, **labels):
+        """
+        Get or create a gauge.
+
+        Args:
+            name (str): Metric name
+            help_text (str): Description shown in the HELP line
+            **labels: Constant labels of this metric
+
+        Returns:
+            Gauge: The gauge
+        """
+        return self._register(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, **labels):
+        """
+        Get or create a histogram.
+
+        Args:
+            name (str): Metric name (by convention with a unit suffix, e.g. _seconds)
+            help_text (str): Description shown in the HELP line
+            buckets (tuple): Increasing upper bounds of the buckets
+            **labels: Constant labels of this metric
+
+        Returns:
+            Histogram: The histogram
+        """
+        return self._register(Histogram, name, help_text, labels, buckets)
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            families = [(name, kind, help_text, list(metrics.items()))
+                        for name, (kind, help_text, metrics) in self._families.items()]
+        lines = []
+        for name, kind, help_text, metrics in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in metrics:
+                if kind != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(metric.get())}")
+                    continue
+                cumulative, total, count = metric.snapshot()
+                for bound, bucket_count in zip(metric.buckets + (float('inf'),), cumulative):
+                    bucket_labels = labels + (('le', _format_value(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {bucket_count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class _NullMetric:
+    """Metric that ignores every update."""
+
+    _context = nullcontext()
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def set_function(self, fn):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return self._context
+
+    def get(self):
+        return 0
+
+
+class NullRegistry:
+    """Registry for disabled metrics: every metric is a shared no-op."""
+
+    _metric = _NullMetric()
+
+    def counter(self, name, help_text, **labels):
+        return self._metric
+
+    def gauge(self, name, help_text, **labels):
+        return self._metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, **labels):
+        return self._metric
+
+    def render(self):
+        return ""
+
+
+NULL_REGISTRY = NullRegistry()
+
+
+class MetricsServer:
+    """
+    Serves a registry at http://host:port/metrics from a daemon thread.
+    """
+
+    def __init__(self, registry, port=9100, host='127.0.0.1'):
+        """
+        Args:
+            registry (MetricsRegistry): Metrics to serve
+            port (int): TCP port, 0 for any free port
+            host (str): Interface to listen on (local only by default)
+        """
+        self.registry = registry
+
+        # Imported here: only processes serving metrics need the HTTP server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes are not worth a console line each
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        """tuple: (host, port) the server listens on."""
+        return self._server.server_address[:2]
+
+    def start(self):
+        """Start serving in a daemon thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-http',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+        self._server.server_close()
+
+
+class PipelineMetrics:
+    """
+    The metrics of one SDR or publisher process.
+
+    Attributes are metrics from the given registry; with NULL_REGISTRY they are
+    all no-ops.
+    """
+
+    def __init__(self, registry=NULL_REGISTRY, prefix='sdr'):
+        """
+        Args:
+            registry (MetricsRegistry or NullRegistry): Registry to create the metrics in
+            prefix (str): Prefix of the metric names
+        """
+        self.registry = registry
+        self.reads = registry.counter(f'{prefix}_reads_total', "Sample reads processed")
+        self.sends = registry.counter(f'{prefix}_messages_sent_total', "Messages sent")
+        self.send_failures = registry.counter(
+            f'{prefix}_send_failures_total', "Messages that could not be sent")
+        self.bytes_published = registry.counter(
+            f'{prefix}_bytes_published_total', "Message body bytes sent")
+        self.buffered = registry.counter(
+            f'{prefix}_messages_buffered_total',
+            "Messages kept locally while the broker was unreachable, for replay")
+        self.dropped = registry.counter(
+            f'{prefix}_publish_dropped_total', "Messages dropped by the asynchronous publisher")
+        self.overruns = registry.counter(
+            f'{prefix}_ring_overruns_total', "Frames overwritten before they were processed")
+
+        stage_help = "Latency of each pipeline stage in seconds"
+        stage_name = f'{prefix}_stage_latency_seconds'
+        self.acquisition = registry.histogram(stage_name, stage_help, stage='acquisition')
+        self.fft = registry.histogram(stage_name, stage_help, stage='fft')
+        self.stats = registry.histogram(stage_name, stage_help, stage='stats')
+        self.serialize = registry.histogram(stage_name, stage_help, stage='serialize')
+        self.send = registry.histogram(stage_name, stage_help, stage='send')
+
+        self.queue_depth = registry.gauge(
+            f'{prefix}_publish_queue_depth', "Messages waiting in the asynchronous publisher")
+        self.ring_depth = registry.gauge(
+            f'{prefix}_ring_depth', "Frames waiting in the acquisition ring buffer")
+        self.rolling_window = registry.gauge(
+            f'{prefix}_rolling_window_values', "Power values in the rolling statistics window")
+
+    def record_send(self, result, body, latency=None, count=1):
+        """
+        Count the outcome of one send.
+
+        Args:
+            result: Return value of the connection's send (False means dropped
+                by an AsyncPublisher, async_publisher.QUEUED queued for its
+                sender thread, connection.BUFFERED kept for replay after
+                reconnecting)
+            body (str or bytes): Message body
+            latency (float, optional): Seconds the send took
+            count (int): Number of messages in the frame
+
+        Returns:
+            bool: True if the message was sent (or queued or buffered)
+        """
+        if result is False:
+            self.dropped.inc(count)
+            return False
+        if result is QUEUED:
+            # The AsyncPublisher records the send once its sender thread has sent it
+            return True
+        if result is BUFFERED:
+            self.buffered.inc(count)
+            return True
+        if latency is not None:
+            self.send.observe(latency)
+        self.sends.inc(count)
+        self.bytes_published.inc(body_size(body))
+        return True
+
+    def watch_publisher(self, publisher):
+        """Report the queue depth and drops of an AsyncPublisher and the frames it sends."""
+        publisher.metrics = self
+        self.queue_depth.set_function(publisher.queue_depth)
+        self.dropped.set_function(lambda: publisher.dropped)
@@ -0,0 +1,410 @@
+﻿#!/usr/bin/env python
+"""
+Multi-device / multi-channel capture supervisor.
+
+ChannelSupervisor runs one acquisition process per channel (an RTL-SDR
+selected by serial number, a replayed recording, or a simulated source) and a
+pool of DSP processes, so several dongles can be served from one host without
+the GIL or blocking reads of one device holding up the others.
+
+Frames are never pickled. Each channel owns a ring of frame slots in
+multiprocessing.shared_memory; the acquisition process writes a frame into a
+free slot and passes only (channel, slot) to the DSP process that owns the
+channel, which returns the slot once processed. When no slot is free the frame
+is dropped and counted as an overrun. Each channel is always processed by the
+same DSP process, so per-channel state (rolling statistics, Welch averaging)
+stays consistent. Only the processed messages come back to the supervisor,
+which publishes them to the channel's destination with a channel header.
+
+Channels are described in a JSON file, a list of objects such as:
+    [{"name": "noaa", "serial": "00000001", "center_freq": 162.45e6},
+     {"name": "sim", "center_freq": 100e6, "destination": "/queue/sdr.sim"}]
+A channel without "frame_size" uses the configured frame size (SDR_FRAME_SIZE
+or --frame-size, which follows the FFT size unless set separately).
+"""
+
+import json
+import multiprocessing
+import queue
+import signal
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import get_config
+
+ChannelConfig = namedtuple(
+    'ChannelConfig',
+    ['name', 'serial', 'center_freq', 'sample_rate', 'gain', 'freq_correction',
+     'destination', 'replay', 'frame_size']
+)
+ChannelConfig.__new__.__defaults__ = (None, 162.450e6, 2.048e6, 'auto', 60, None, None, None)
+
+
+def load_channels(path):
+    """
+    Read channel configurations from a JSON file.
+
+    Args:
+        path (str): JSON file holding a list of channel objects
+
+    Returns:
+        list: ChannelConfig for each channel
+    """
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    channels = []
+    for i, entry in enumerate(entries):
+        entry = dict(entry)
+        entry.setdefault('name', f"channel{i}")
+        unknown = set(entry) - set(ChannelConfig._fields)
+        if unknown:
+            raise ValueError(f"Unknown channel settings: {', '.join(sorted(unknown))}")
+        channels.append(ChannelConfig(**entry))
+    return channels
+
+
+class SharedFrameSlots:
+    """
+    A ring of complex64 frame slots in shared memory.
+
+    Created by the supervisor and attached by name in the worker processes.
+    """
+
+    def __init__(self, slots, frame_size, name=None):
+        """
+        Args:
+            slots (int): Number of frame slots
+            frame_size (int): Samples per frame
+            name (str, optional): Attach to an existing block instead of creating one
+        """
+        size = slots * frame_size * np.dtype(np.complex64).itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.name = self.shm.name
+        self.frames = np.ndarray((slots, frame_size), dtype=np.complex64, buffer=self.shm.buf)
+
+    def close(self):
+        """Detach from the shared memory block."""
+        self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        """Free the shared memory block (creator only, after all workers detached)."""
+        self.shm.unlink()
+
+
+def open_source(config, index=0, sim_speed=1.0):
+    """
+    Open the sample source of a channel.
+
+    Args:
+        config (ChannelConfig): Channel configuration
+        index (int): Channel index, used to seed simulated channels differently
+        sim_speed (float): Pacing of simulated sources as a multiple of real time
+
+    Returns:
+        object: Source providing read_samples(num_samples), and close() if it holds a device
+    """
+    if config.replay:
+        from iq_recording import IQReplaySource
+        return IQReplaySource(config.replay, sim_speed)
+    if config.serial is not None:
+        from rtlsdr import RtlSdr
+        sdr = RtlSdr(serial_number=str(config.serial))
+        sdr.sample_rate = config.sample_rate
+        sdr.center_freq = config.center_freq
+        sdr.freq_correction = config.freq_correction
+        sdr.gain = config.gain
+        return sdr
+
+    from simulator import SimulatedSource, default_simulator
+    return SimulatedSource(default_simulator(config.sample_rate, seed=index), sim_speed)
+
+
+def _ignore_interrupts():
+    # The supervisor handles Ctrl+C and stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def acquisition_worker(index, config, shm_name, slots, free_slots, tasks, stop_event,
+                       counters, sim_speed):
+    """
+    Acquisition process: read frames from one channel into shared memory slots.
+
+    Args:
+        index (int): Channel index
+        config (ChannelConfig): Channel configuration
+        shm_name (str): Name of the channel's SharedFrameSlots block
+        slots (int): Number of slots in the block
+        free_slots (multiprocessing.Queue): Slots available for writing
+        tasks (multiprocessing.Queue): Task queue of the DSP process owning the channel
+        stop_event (multiprocessing.Event): Set by the supervisor to stop
+        counters (multiprocessing.Array): Per-channel [frames_acquired, overruns]
+        sim_speed (float): Pacing of simulated and replayed sources
+    """
+    _ignore_interrupts()
+    shared = SharedFrameSlots(slots, config.frame_size, shm_name)
+    source = None
+    try:
+        source = open_source(config, index, sim_speed)
+        while not stop_event.is_set():
+            samples = source.read_samples(config.frame_size)
+            counters[2 * index] += 1
+            try:
+                slot = free_slots.get_nowait()
+            except queue.Empty:
+                counters[2 * index + 1] += 1
+                continue
+            shared.frames[slot] = samples
+            tasks.put((index, slot, time.time()))
+    except EOFError:
+        pass
+    except Exception as e:
+        print(f"Acquisition of channel {config.name} stopped: {e}")
+    finally:
+        if hasattr(source, 'close'):
+            source.close()
+        shared.close()
+
+
+def dsp_worker(channels, shm_names, slots, free_slots, tasks, results, processor_factory,
+               processor_options):
+    """
+    DSP process: analyze frames of the channels assigned to it.
+
+    Args:
+        channels (dict): Channel index -> ChannelConfig for the assigned channels
+        shm_names (dict): Channel index -> SharedFrameSlots name
+        slots (int): Number of slots per channel
+        free_slots (dict): Channel index -> queue of free slots
+        tasks (multiprocessing.Queue): (channel, slot, timestamp) items, None to stop
+        results (multiprocessing.Queue): Receives (channel, messages)
+        processor_factory (callable): Builds a processor as
+            processor_factory(center_freq, sample_rate, frame_size, simulated, **options);
+            its process(samples) returns the messages to publish
+        processor_options (dict): Extra keyword arguments for processor_factory
+    """
+    _ignore_interrupts()
+    shared = {index: SharedFrameSlots(slots, config.frame_size, shm_names[index])
+              for index, config in channels.items()}
+    processors = {
+        index: processor_factory(config.center_freq, config.sample_rate, config.frame_size,
+                                 config.serial is None and not config.replay,
+                                 **processor_options)
+        for index, config in channels.items()
+    }
+    try:
+        while True:
+            item = tasks.get()
+            if item is None:
+                break
+            index, slot, _ = item
+            try:
+                messages = processors[index].process(shared[index].frames[slot])
+            finally:
+                free_slots[index].put(slot)
+            results.put((index, messages))
+    except Exception as e:
+        print(f"DSP worker stopped: {e}")
+    finally:
+        for block in shared.values():
+            block.close()
+
+
+class ChannelSupervisor:
+    """
+    Runs acquisition and DSP processes for several channels and publishes the results.
+    """
+
+    def __init__(self, channels, processor_factory, processor_options=None, dsp_workers=None,
+                 slots=16, sim_speed=1.0):
+        """
+        Args:
+            channels (list): ChannelConfig for each channel; a frame_size of None
+                is replaced by the configured frame size
+            processor_factory (callable): Picklable processor constructor, see dsp_worker
+            processor_options (dict, optional): Extra keyword arguments for processor_factory
+            dsp_workers (int, optional): DSP processes, defaults to min(channels, CPUs)
+            slots (int): Shared memory frame slots per channel
+            sim_speed (float): Pacing of simulated and replayed sources
+
+        Raises:
+            ValueError: Without channels, or if a channel's frame size is not
+                positive or larger than the block size of processor_options
+        """
+        if not channels:
+            raise ValueError("at least one channel is required")
+        # Resolved here: the worker processes load their own configuration, without
+        # the command line overrides
+        frame_size = get_config().frame_size
+        self.channels = [channel._replace(frame_size=frame_size)
+                         if channel.frame_size is None else channel for channel in channels]
+        self.processor_factory = processor_factory
+        self.processor_options = processor_options or {}
+        # Check the sizes now rather than failing in the worker processes
+        block_size = self.processor_options.get('block_size')
+        for channel in self.channels:
+            if channel.frame_size <= 0:
+                raise ValueError(f"channel {channel.name}: frame size must be positive")
+            if block_size and block_size < channel.frame_size:
+                raise ValueError(f"channel {channel.name}: block size {block_size} is smaller "
+                                 f"than the frame size {channel.frame_size}")
+        self.dsp_workers = max(1, min(dsp_workers or multiprocessing.cpu_count(),
+                                      len(self.channels)))
+        self.slots = slots
+        self.sim_speed = sim_speed
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._stop_event = self._ctx.Event()
+        self._counters = self._ctx.Array('q', 2 * len(self.channels), lock=False)
+        self._results = self._ctx.Queue()
+        self._tasks = [self._ctx.Queue() for _ in range(self.dsp_workers)]
+        self._free_slots = {}
+        self._shared = {}
+        self._acquisition = []
+        self._dsp = []
+        self.frames_processed = [0] * len(self.channels)
+
+    def _owner(self, index):
+        return index % self.dsp_workers
+
+    def start(self):
+        """Allocate the shared memory slots and start all processes."""
+        for index, config in enumerate(self.channels):
+            self._shared[index] = SharedFrameSlots(self.slots, config.frame_size)
+            self._free_slots[index] = self._ctx.Queue()
+            for slot in range(self.slots):
+                self._free_slots[index].put(slot)
+
+        for worker in range(self.dsp_workers):
+            assigned = {index: config for index, config in enumerate(self.channels)
+                        if self._owner(index) == worker}
+            process = self._ctx.Process(
+                target=dsp_worker,
+                args=(assigned, {index: self._shared[index].name for index in assigned},
+                      self.slots, {index: self._free_slots[index] for index in assigned},
+                      self._tasks[worker], self._results, self.processor_factory,
+                      self.processor_options),
+                name=f"sdr-dsp-{worker}", daemon=True
+            )
+            process.start()
+            self._dsp.append(process)
+
+        for index, config in enumerate(self.channels):
+            process = self._ctx.Process(
+                target=acquisition_worker,
+                args=(index, config, self._shared[index].name, self.slots,
+                      self._free_slots[index], self._tasks[self._owner(index)],
+                      self._stop_event, self._counters, self.sim_speed),
+                name=f"sdr-acquisition-{config.name}", daemon=True
+            )
+            process.start()
+            self._acquisition.append(process)
+
+    def is_running(self):
+        """Return True while any acquisition process is alive."""
+        return any(process.is_alive() for process in self._acquisition)
+
+    def poll(self, publish_fn, timeout=0.5):
+        """
+        Publish the messages of processed frames as they arrive.
+
+        Each message gets the channel name and, unless it has one, the channel's
+        destination (see ChannelConfig) added before publish_fn(message) is called.
+
+        Args:
+            publish_fn (callable): Called with each message
+            timeout (float): Seconds to wait for the first result
+
+        Returns:
+            int: Number of processed frames handled
+        """
+        handled = 0
+        try:
+            item = self._results.get(timeout=timeout)
+            while True:
+                index, messages = item
+                config = self.channels[index]
+                self.frames_processed[index] += 1
+                handled += 1
+                for message in messages:
+                    message['channel'] = config.name
+                    # Messages with their own destination (waterfall tiles) keep it
+                    message.setdefault('destination', config.destination)
+                    publish_fn(message)
+                item = self._results.get_nowait()
+        except queue.Empty:
+            pass
+        return handled
+
+    def run(self, publish_fn, status_fn=None, status_interval=10.0):
+        """
+        Publish results until every acquisition process ends or Ctrl+C is pressed.
+
+        Args:
+            publish_fn (callable): Called with each message
+            status_fn (callable, optional): Called with stats() every status_interval seconds
+            status_interval (float): Seconds between status reports
+        """
+        next_status = time.monotonic() + status_interval
+        while True:
+            running = self.is_running()
+            # Once acquisition has ended, keep going until the DSP results are drained
+            if not self.poll(publish_fn) and not running:
+                break
+            if status_fn and time.monotonic() >= next_status:
+                status_fn(self.stats())
+                next_status += status_interval
+
+    def stop(self, timeout=5.0):
+        """Stop acquisition, let the DSP processes finish, and free the shared memory."""
+        self._stop_event.set()
+        for process in self._acquisition:
+            process.join(timeout)
+        for tasks in self._tasks:
+            tasks.put(None)
+        # A DSP process only exits once its queued results are read, so discard them
+        deadline = time.monotonic() + timeout
+        while any(process.is_alive() for process in self._dsp) and time.monotonic() < deadline:
+            try:
+                self._results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for process in self._acquisition + self._dsp:
+            if process.is_alive():
+                process.terminate()
+        for block in self._shared.values():
+            block.close()
+            block.unlink()
+        self._shared = {}
+
+    def stats(self):
+        """
+        Return per-channel counters.
+
+        Returns:
+            dict: Channel name -> frames acquired, processed and overruns
+        """
+        return {
+            config.name: {
+                'frames_acquired': self._counters[2 * index],
+                'frames_processed': self.frames_processed[index],
+                'overruns': self._counters[2 * index + 1],
+            }
+            for index, config in enumerate(self.channels)
+        }
+
+
+def print_channel_stats(stats):
+    """
+    Print ChannelSupervisor counters.
+
+    Args:
+        stats (dict): Counters returned by ChannelSupervisor.stats()
+    """
+    print("\n=== Channel Status ===")
+    for name, counters in stats.items():
+        print(f"{name}: acquired {counters['frames_acquired']}, "
+              f"processed {counters['frames_processed']}, overruns {counters['overruns']}")
@@ -0,0 +1,317 @@
+﻿#!/usr/bin/env python
+"""
+Threaded SDR acquisition pipeline.
+
+Decouples reading samples from the dongle from the DSP and publishing work so
+that a slow FFT or a slow broker no longer makes the USB buffer overrun.
+
+The pipeline has three stages:
+    acquisition -> SampleRingBuffer -> processing -> queue -> publishing
+
+The acquisition thread writes fixed-size frames into a preallocated complex64
+ring buffer. When the processing stage falls behind, the oldest unread frame is
+overwritten and counted as an overrun so the loss is visible.
+"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class SampleRingBuffer:
+    """
+    Fixed-capacity ring of complex64 sample frames shared between threads.
+
+    The writer never blocks: if the ring is full the oldest unread frame is
+    overwritten and the overrun counter is incremented.
+    """
+
+    def __init__(self, capacity=64, frame_size=1024):
+        """
+        Args:
+            capacity (int): Number of frames the ring can hold
+            frame_size (int): Number of complex samples per frame
+        """
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2 frames")
+        self.capacity = capacity
+        self.frame_size = frame_size
+        self._frames = np.zeros((capacity, frame_size), dtype=np.complex64)
+        self._lengths = np.zeros(capacity, dtype=np.int64)
+        self._head = 0  # Next slot to write
+        self._tail = 0  # Next slot to read
+        self._count = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.frames_written = 0
+        self.frames_read = 0
+        self.overruns = 0
+
+    def __len__(self):
+        with self._cond:
+            return self._count
+
+    def write(self, samples):
+        """
+        Copy a frame of samples into the ring.
+
+        Args:
+            samples (numpy.ndarray): Complex samples, at most frame_size long
+
+        Returns:
+            bool: False if the write overwrote an unread frame, True otherwise
+        """
+        length = min(len(samples), self.frame_size)
+        with self._cond:
+            overrun = self._count == self.capacity
+            if overrun:
+                # Processing fell behind: drop the oldest unread frame
+                self._tail = (self._tail + 1) % self.capacity
+                self._count -= 1
+                self.overruns += 1
+            self._frames[self._head, :length] = samples[:length]
+            self._lengths[self._head] = length
+            self._head = (self._head + 1) % self.capacity
+            self._count += 1
+            self.frames_written += 1
+            self._cond.notify()
+        return not overrun
+
+    def read(self, out=None, timeout=None):
+        """
+        Copy the oldest unread frame out of the ring.
+
+        Args:
+            out (numpy.ndarray, optional): Preallocated complex64 buffer of frame_size
+            timeout (float, optional): Seconds to wait for a frame, None waits forever
+
+        Returns:
+            numpy.ndarray: View of ``out`` holding the frame, or None on timeout/close
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._count > 0 or self._closed, timeout):
+                return None
+            if self._count == 0:
+                return None
+            if out is None:
+                out = np.empty(self.frame_size, dtype=np.complex64)
+            length = self._lengths[self._tail]
+            out[:length] = self._frames[self._tail, :length]
+            self._tail = (self._tail + 1) % self.capacity
+            self._count -= 1
+            self.frames_read += 1
+        return out[:length]
+
+    def close(self):
+        """Wake up any reader; subsequent reads return None once the ring is drained."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class FramePacer:
+    """
+    Paces a non-device sample source (simulator, file replay) like a real device.
+
+    Deadlines are absolute, so the pacing does not drift with the time spent
+    producing and processing frames. A speed of 2.0 delivers samples at twice
+    the sample rate; 0 disables pacing.
+    """
+
+    def __init__(self, sample_rate, speed=1.0):
+        """
+        Args:
+            sample_rate (float): Sample rate in Hz
+            speed (float): Multiple of real time, 0 for unpaced
+        """
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self._deadline = None
+
+    def wait(self, num_samples):
+        """
+        Wait until a frame of num_samples would have been received.
+
+        Args:
+            num_samples (int): Samples in the frame
+        """
+        if self.speed <= 0:
+            return
+        now = time.monotonic()
+        if self._deadline is None:
+            # The first frame is available immediately
+            self._deadline = now
+        else:
+            time.sleep(max(self._deadline - now, 0))
+        self._deadline += num_samples / (self.sample_rate * self.speed)
+
+
+class AcquisitionThread(threading.Thread):
+    """
+    Reads frames from an SDR (or any sample source) into a SampleRingBuffer.
+
+    If the device supports ``read_samples_async`` (pyrtlsdr's callback reader)
+    it is used so librtlsdr keeps its USB transfers queued; otherwise
+    ``read_fn`` is called in a tight loop.
+    """
+
+    def __init__(self, ring, sdr=None, read_fn=None, frame_size=None):
+        """
+        Args:
+            ring (SampleRingBuffer): Destination ring buffer
+            sdr (RtlSdr, optional): Device providing read_samples_async
+            read_fn (callable, optional): Called as read_fn(frame_size) to get a frame
+            frame_size (int, optional): Samples per read, defaults to ring.frame_size
+        """
+        super().__init__(name="sdr-acquisition", daemon=True)
+        if sdr is None and read_fn is None:
+            raise ValueError("either sdr or read_fn is required")
+        self.ring = ring
+        self.sdr = sdr
+        self.read_fn = read_fn
+        self.frame_size = frame_size or ring.frame_size
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def _on_samples(self, samples, _context):
+        if self._stop_event.is_set():
+            self.sdr.cancel_read_async()
+            return
+        self.ring.write(samples)
+
+    def run(self):
+        try:
+            if self.sdr is not None and hasattr(self.sdr, 'read_samples_async'):
+                self.sdr.read_samples_async(self._on_samples, self.frame_size)
+            else:
+                read_fn = self.read_fn or self.sdr.read_samples
+                while not self._stop_event.is_set():
+                    self.ring.write(read_fn(self.frame_size))
+        except Exception as e:
+            self.error = e
+            print(f"Acquisition stopped: {e}")
+        finally:
+            self.ring.close()
+
+    def stop(self):
+        """Ask the acquisition loop to finish after the current frame."""
+        self._stop_event.set()
+        if self.sdr is not None and hasattr(self.sdr, 'cancel_read_async'):
+            try:
+                self.sdr.cancel_read_async()
+            except Exception:
+                pass
+
+
+class SamplePipeline:
+    """
+    Acquisition, DSP and publishing stages connected by a ring buffer and a queue.
+
+    ``process_fn(samples)`` runs on the DSP thread and returns an iterable of
+    items to publish (or None). ``publish_fn(item)`` runs on the publishing
+    thread. If the publish queue is full the item is dropped and counted.
+    """
+
+    def __init__(self, process_fn, publish_fn, sdr=None, read_fn=None,
+                 frame_size=1024, ring_capacity=64, publish_queue_size=256):
+        """
+        Args:
+            process_fn (callable): DSP stage, called with one frame of samples
+            publish_fn (callable): Publishing stage, called with each processed item
+            sdr (RtlSdr, optional): SDR device used by the acquisition thread
+            read_fn (callable, optional): Sample source used when no SDR is given
+            frame_size (int): Samples per frame
+            ring_capacity (int): Frames held by the ring buffer
+            publish_queue_size (int): Items held between the DSP and publishing stages
+        """
+        self.process_fn = process_fn
+        self.publish_fn = publish_fn
+        self.ring = SampleRingBuffer(ring_capacity, frame_size)
+        self.acquisition = AcquisitionThread(self.ring, sdr=sdr, read_fn=read_fn)
+        self.publish_queue = queue.Queue(maxsize=publish_queue_size)
+        self.frames_processed = 0
+        self.items_published = 0
+        self.publish_drops = 0
+        self._stop_event = threading.Event()
+        self._dsp_thread = threading.Thread(target=self._dsp_loop, name="sdr-dsp", daemon=True)
+        self._publish_thread = threading.Thread(
+            target=self._publish_loop, name="sdr-publish", daemon=True
+        )
+
+    def _dsp_loop(self):
+        frame = np.empty(self.ring.frame_size, dtype=np.complex64)
+        try:
+            while not self._stop_event.is_set():
+                samples = self.ring.read(out=frame, timeout=0.5)
+                if samples is None:
+                    if not self.acquisition.is_alive():
+                        break
+                    continue
+                items = self.process_fn(samples)
+                self.frames_processed += 1
+                for item in items or ():
+                    try:
+                        self.publish_queue.put_nowait(item)
+                    except queue.Full:
+                        self.publish_drops += 1
+        except Exception as e:
+            print(f"Processing stopped: {e}")
+        finally:
+            self._stop_event.set()
+
+    def _publish_loop(self):
+        while True:
+            try:
+                item = self.publish_queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    break
+                continue
+            try:
+                self.publish_fn(item)
+                self.items_published += 1
+            except Exception as e:
+                print(f"Error publishing: {e}")
+
+    def start(self):
+        """Start all three stages."""
+        self._publish_thread.start()
+        self._dsp_thread.start()
+        self.acquisition.start()
+
+    def stop(self, timeout=2.0):
+        """Stop acquisition and processing, flush queued publishes, and join the threads."""
+        self.acquisition.stop()
+        self._stop_event.set()
+        self.ring.close()
+        self.acquisition.join(timeout)
+        self._dsp_thread.join(timeout)
+        self._publish_thread.join(timeout)
+
+    def is_running(self):
+        """Return True while the DSP stage is still consuming frames."""
+        return not self._stop_event.is_set()
+
+    def wait(self, poll_interval=0.5):
+        """Block until the pipeline stops (e.g. the source ends) or Ctrl+C is pressed."""
+        while self.is_running():
+            time.sleep(poll_interval)
+
+    def stats(self):
+        """
+        Return pipeline counters.
+
+        Returns:
+            dict: Frames acquired/processed, overruns, publish queue depth and drops
+        """
+        return {
+            'frames_acquired': self.ring.frames_written,
+            'frames_processed': self.frames_processed,
+            'overruns': self.ring.overruns,
+            'ring_depth': len(self.ring),
+            'publish_queue_depth': self.publish_queue.qsize(),
+            'publish_drops': self.publish_drops,
+            'items_published': self.items_published,
+        }
@@ -0,0 +1,218 @@
+﻿#!/usr/bin/env python
+"""
+On-demand CPU and memory profiling of the sample loop.
+
+LoopProfiler profiles the next N iterations of a loop with cProfile and takes
+tracemalloc snapshot diffs, writing each result to a timestamped file:
+
+    <prefix>-cpu-<time>.prof  cProfile data (pstats / snakeviz)
+    <prefix>-cpu-<time>.txt   the top functions by cumulative time
+    <prefix>-mem-<time>.txt   the top allocation sites grown since the previous snapshot
+
+Memory snapshots are taken at most every memory_interval seconds, as
+summaries can come many times a second.
+
+Profiling is started from the command line, from the environment
+(SDR_PROFILE=N, SDR_PROFILE_MEMORY=1, SDR_PROFILE_DIR) or, on POSIX, by a
+signal to the running process:
+
+    kill -USR1 <pid>   profile the next N iterations
+    kill -USR2 <pid>   start (or stop) tracemalloc snapshot diffs
+
+While idle the loop only checks the profiler's pending and memory attributes,
+so leaving the hooks installed costs nothing measurable. Signal handlers only
+set those attributes (turning memory snapshots off also stops tracemalloc);
+the files are written from the loop itself. cProfile, pstats and tracemalloc
+are only imported once profiling is requested.
+"""
+
+import io
+import os
+import signal
+import time
+
+PROFILE_ENV = 'SDR_PROFILE'
+MEMORY_ENV = 'SDR_PROFILE_MEMORY'
+DIR_ENV = 'SDR_PROFILE_DIR'
+
+
+class LoopProfiler:
+    """
+    Profiles loop iterations on request.
+
+    The loop calls tick() at the start of every iteration while pending is
+    non-zero, and memory_snapshot() at each point between which memory growth
+    should be compared (the summaries of sdr.py) while memory is True.
+    """
+
+    def __init__(self, output_dir='.', iterations=100, prefix='sdr', top=30,
+                 memory_interval=10.0):
+        """
+        Args:
+            output_dir (str): Directory for the result files
+            iterations (int): Iterations profiled per request
+            prefix (str): File name prefix
+            top (int): Entries listed in the text reports
+            memory_interval (float): Minimum seconds between memory snapshots
+        """
+        self.output_dir = output_dir
+        self.iterations = iterations
+        self.memory_interval = memory_interval
+        self.prefix = prefix
+        self.top = top
+        self.pending = 0
+        self.memory = False
+        self.files = []
+        self._profile = None
+        self._snapshot = None
+        self._snapshot_time = 0.0
+
+    def request_profile(self, iterations=None):
+        """Profile the next iterations (default: self.iterations)."""
+        self.pending = iterations or self.iterations
+
+    def toggle_memory(self):
+        """
+        Start tracemalloc snapshot diffs, or stop them when running.
+
+        Stopping also stops tracemalloc, so the loop no longer pays for tracing
+        allocations; the next start records a fresh baseline.
+        """
+        self.memory = not self.memory
+        if not self.memory:
+            self._stop_memory()
+
+    def _stop_memory(self):
+        if self._snapshot is not None:
+            import tracemalloc
+            self._snapshot = None
+            tracemalloc.stop()
+
+    def install_signal_handlers(self):
+        """
+        Profile on SIGUSR1 and toggle memory snapshots on SIGUSR2.
+
+        Must be called from the main thread. Does nothing where the signals do
+        not exist (Windows).
+
+        Returns:
+            bool: True if the handlers were installed
+        """
+        if not hasattr(signal, 'SIGUSR1'):
+            return False
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.request_profile())
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self.toggle_memory())
+        return True
+
+    def _path(self, kind, suffix):
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{self.prefix}-{kind}-{stamp}{suffix}")
+        index = 1
+        while os.path.exists(path):
+            # Several results within the same second
+            path = os.path.join(self.output_dir, f"{self.prefix}-{kind}-{stamp}-{index}{suffix}")
+            index += 1
+        return path
+
+    def tick(self):
+        """
+        Mark the start of an iteration while a profile is pending.
+
+        The first call starts cProfile; the call after the last requested
+        iteration stops it and writes the results.
+        """
+        if self._profile is None:
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+            return
+        self.pending -= 1
+        if self.pending <= 0:
+            self.pending = 0
+            self._finish_profile()
+
+    def _finish_profile(self):
+        import pstats
+
+        profile, self._profile = self._profile, None
+        profile.disable()
+        path = self._path('cpu', '.prof')
+        profile.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(self.top)
+        text_path = path[:-len('.prof')] + '.txt'
+        with open(text_path, 'w') as f:
+            f.write(report.getvalue())
+        self.files.extend((path, text_path))
+        print(f"Wrote CPU profile to {path}")
+
+    def memory_snapshot(self):
+        """
+        Take a tracemalloc snapshot and write its growth since the previous one.
+
+        The first call starts tracemalloc and only records the baseline. Calls
+        within memory_interval of the previous snapshot are ignored.
+
+        Returns:
+            str: Path of the report, or None for the baseline or an ignored call
+        """
+        import tracemalloc
+
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._snapshot_time < self.memory_interval:
+            return None
+        self._snapshot_time = now
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return None
+
+        stats = snapshot.compare_to(previous, 'lineno')
+        current, peak = tracemalloc.get_traced_memory()
+        path = self._path('mem', '.txt')
+        with open(path, 'w') as f:
+            f.write(f"Traced memory: {current / 1024:.1f} KiB (peak {peak / 1024:.1f} KiB)\n")
+            f.write(f"Top {self.top} allocation sites by growth since the previous snapshot:\n")
+            for stat in stats[:self.top]:
+                f.write(f"{stat}\n")
+        self.files.append(path)
+        print(f"Wrote memory snapshot diff to {path}")
+        return path
+
+    def close(self):
+        """Write any profile in progress and stop tracemalloc."""
+        if self._profile is not None:
+            self.pending = 0
+            self._finish_profile()
+        self._stop_memory()
+
+
+def profiler_from_environ(iterations=None, memory=False, output_dir=None, environ=None):
+    """
+    Create a LoopProfiler from command line values, falling back to the environment.
+
+    Args:
+        iterations (int, optional): Iterations to profile from the start
+        memory (bool): Take tracemalloc snapshot diffs from the start
+        output_dir (str, optional): Directory for the result files
+        environ (dict, optional): Environment, defaults to os.environ
+
+    Returns:
+        LoopProfiler: Profiler with any requested profiling already pending
+    """
+    environ = os.environ if environ is None else environ
+    if iterations is None:
+        iterations = int(environ.get(PROFILE_ENV, '0') or 0)
+    memory = memory or environ.get(MEMORY_ENV, '') not in ('', '0')
+    output_dir = output_dir or environ.get(DIR_ENV, '.')
+    profiler = LoopProfiler(output_dir, iterations or 100)
+    if iterations:
+        profiler.request_profile(iterations)
+    profiler.memory = memory
+    return profiler
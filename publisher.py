@@ -1,36 +1,156 @@
 ﻿#!/usr/bin/env python3
 """
 Sends the current UTC timestamp every second to ActiveMQ via STOMP.
+With --rate it becomes a load generator instead (see load_generator.py).
 Usage:
-    python time_publisher.py
+    python time_publisher.py [--heartbeat MS] [--async-publish] [--queue-size N]
+                             [--queue-policy POLICY] [--metrics-port PORT]
+    python time_publisher.py --rate MSG_S [--payload SHAPE] [--payload-size BYTES]
+                             [--connections N] [--duration SECONDS]
+    Both accept --broker HOST:PORT and --publisher-dest DEST to override the environment.
+The asynchronous publisher, load generator and metrics modules are imported
+when their options are used.
 """
+import argparse
+import sys
 import time
 import datetime
-import stomp
+import config
 import creds
+from connection import ConnectionManager
 
-def main():
-    # Setup STOMP connection (disable heartbeats to avoid background errors)
-    conn = stomp.Connection(host_and_ports=creds.BROKER, heartbeats=(0, 0))
-    conn.connect(login=creds.USER, passcode=creds.PASS, wait=True)
+# Choices of async_publisher.POLICIES and load_generator.PAYLOAD_SHAPES, repeated
+# so that parsing the command line does not import those modules
+QUEUE_POLICIES = ('block', 'drop-oldest', 'drop-newest')
+PAYLOAD_SHAPES = ('timestamp', 'json', 'binary')
 
+def parse_args(argv=None):
+    """Parse command line arguments (none by default)."""
+    parser = argparse.ArgumentParser(description="Send the current UTC time to ActiveMQ")
+    parser.add_argument('--heartbeat', type=int, default=0, metavar='MS',
+                        help="STOMP heartbeat interval in milliseconds (0 disables)")
+    parser.add_argument('--async-publish', action='store_true',
+                        help="Send from a background thread through a bounded queue")
+    parser.add_argument('--queue-size', type=int, default=1000,
+                        help="Maximum messages queued by --async-publish")
+    parser.add_argument('--queue-policy', choices=QUEUE_POLICIES, default='drop-oldest',
+                        help="What --async-publish does when the queue is full")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="Maximum messages packed into one STOMP frame")
+    parser.add_argument('--metrics-port', type=int, default=None, metavar='PORT',
+                        help="Serve Prometheus metrics on http://HOST:PORT/metrics")
+    parser.add_argument('--metrics-host', default='127.0.0.1', metavar='HOST',
+                        help="Interface of the metrics endpoint")
+    parser.add_argument('--rate', type=float, default=None, metavar='MSG_S',
+                        help="Load generator mode: send MSG_S messages per second in total")
+    parser.add_argument('--payload', choices=PAYLOAD_SHAPES, default='json',
+                        help="Load generator payload shape")
+    parser.add_argument('--payload-size', type=int, default=1024, metavar='BYTES',
+                        help="Approximate load generator payload size (json and binary)")
+    parser.add_argument('--connections', type=int, default=1,
+                        help="Parallel load generator connections, one thread each")
+    parser.add_argument('--duration', type=float, default=10.0, metavar='SECONDS',
+                        help="How long the load generator sends")
+    parser.add_argument('--destination', default=None,
+                        help="Destination of the load generator (default: creds.PUBLISHER_DEST)")
+    config.add_arguments(parser, ('broker', 'publisher_dest'))
+    return parser.parse_args(argv or [])
+
+def run_load_generator(args, metrics=None):
+    """
+    Send load as configured on the command line and print the report.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+        metrics (metrics.PipelineMetrics, optional): Metrics recording the sends
+
+    Returns:
+        dict: Report returned by LoadGenerator.run()
+    """
+    from load_generator import LoadGenerator, print_load_report
+
+    def connect():
+        conn = ConnectionManager(creds.BROKER, creds.USER, creds.PASS,
+                                 heartbeats=(args.heartbeat, args.heartbeat))
+        conn.connect()
+        return conn
+
+    destination = args.destination or creds.PUBLISHER_DEST
+    generator = LoadGenerator(connect, destination, args.rate, args.connections,
+                              args.duration, args.payload, args.payload_size, metrics)
+    print(f"Sending {args.payload} payloads to {destination} at {args.rate:g} msg/s over "
+          f"{args.connections} connection(s) for {args.duration:g} s...")
+    report = generator.run()
+    print_load_report(report)
+    return report
+
+def main(argv=None):
+    args = parse_args(argv)
+    config.configure_from_args(args)
+
+    # Metrics are only recorded when an endpoint is requested
+    metrics = None
+    metrics_server = None
+    if args.metrics_port is not None:
+        from metrics import MetricsRegistry, MetricsServer, PipelineMetrics
+        registry = MetricsRegistry()
+        metrics = PipelineMetrics(registry, prefix='publisher')
+        metrics_server = MetricsServer(registry, args.metrics_port, args.metrics_host).start()
+        host, port = metrics_server.address
+        print(f"Serving metrics on http://{host}:{port}/metrics")
+
+    conn = None
+    publisher = None
     try:
+        if args.rate:
+            run_load_generator(args, metrics)
+            return
+
+        # Setup STOMP connection (heartbeats are disabled unless requested); keeps
+        # retrying across all brokers until one is reachable
+        conn = ConnectionManager(creds.BROKER, creds.USER, creds.PASS,
+                                 heartbeats=(args.heartbeat, args.heartbeat))
+        conn.connect()
+
+        # Optionally queue sends so a slow broker does not delay the schedule
+        if args.async_publish:
+            from async_publisher import AsyncPublisher
+            publisher = AsyncPublisher(conn, max_queue=args.queue_size,
+                                       policy=args.queue_policy, batch_size=args.batch_size)
+            if metrics is not None:
+                metrics.watch_publisher(publisher)
+        sender = publisher or conn
+
         print(f"Connected to broker at {creds.BROKER}")
         print(f"Sending time to {creds.PUBLISHER_DEST} every second...")
+        next_send = time.monotonic()
         while True:
             # Get current UTC time as ISO string
             now = datetime.datetime.utcnow().isoformat() + 'Z'
-            conn.send(
+            send_start = time.perf_counter()
+            result = sender.send(
                 destination=creds.PUBLISHER_DEST,
                 body=now,
                 headers={'content-type': 'text/plain'}
             )
+            if metrics is not None:
+                # An AsyncPublisher records the send itself once it is actually sent
+                metrics.record_send(result, now, time.perf_counter() - send_start)
             print(f"Sent: {now}")
-            time.sleep(1)
+            # Sleep until an absolute deadline so send and print times do not drift
+            next_send += 1
+            time.sleep(max(0.0, next_send - time.monotonic()))
     except KeyboardInterrupt:
         print("Interrupted by user, shutting down...")
     finally:
-        conn.disconnect()
+        if publisher:
+            from async_publisher import print_publisher_stats
+            publisher.close()
+            print_publisher_stats(publisher.stats())
+        if conn is not None:
+            conn.disconnect()
+        if metrics_server:
+            metrics_server.stop()
 
 if __name__ == '__main__':
-    main()
+    main(sys.argv[1:])
@@ -0,0 +1,226 @@
+﻿#!/usr/bin/env python
+"""
+Rolling power statistics for the periodic SDR summary.
+
+RollingStats keeps the power values of the last N reads in a preallocated
+float32 window and maintains the window's count, mean and variance
+incrementally: each read is folded in (and the read falling out of the window
+is folded out) with the parallel form of Welford's algorithm. The median is
+estimated from a log-bucketed quantile sketch with bounded relative error, and
+min/max come from per-read extremes, so a summary costs the same no matter how
+many samples the window holds.
+"""
+
+import math
+
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Log-bucketed histogram giving quantile estimates with bounded relative error.
+
+    Values are mapped to bucket ``ceil(log(v) / log(gamma))`` where
+    ``gamma = (1 + alpha) / (1 - alpha)``, so any estimate is within a factor
+    of ``alpha`` of a true sample value. Values at or below ``min_value`` share
+    the lowest bucket.
+    """
+
+    def __init__(self, relative_accuracy=0.02, min_value=1e-12, max_value=1e12):
+        """
+        Args:
+            relative_accuracy (float): Relative error bound of the estimates
+            min_value (float): Smallest value resolved by the sketch
+            max_value (float): Largest value resolved by the sketch
+        """
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        self.num_buckets = math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1
+
+    def bucket_counts(self, values):
+        """
+        Histogram values into sketch buckets.
+
+        Args:
+            values (numpy.ndarray): Non-negative values
+
+        Returns:
+            numpy.ndarray: Count per bucket (length num_buckets)
+        """
+        with np.errstate(divide='ignore'):
+            logs = np.log(np.asarray(values, dtype=np.float64))
+        index = np.ceil(logs / self._log_gamma) - self._offset
+        np.clip(index, 0, self.num_buckets - 1, out=index)
+        return np.bincount(index.astype(np.intp), minlength=self.num_buckets)
+
+    def quantile(self, counts, q):
+        """
+        Estimate a quantile from bucket counts.
+
+        Args:
+            counts (numpy.ndarray): Bucket counts from bucket_counts (possibly summed)
+            q (float): Quantile in [0, 1]
+
+        Returns:
+            float: Estimated value, or 0.0 if the counts are empty
+        """
+        total = counts.sum()
+        if total == 0:
+            return 0.0
+        rank = q * (total - 1)
+        bucket = int(np.searchsorted(np.cumsum(counts), rank, side='right'))
+        bucket = min(bucket, self.num_buckets - 1)
+        # Midpoint (in relative terms) of the bucket's value range
+        return 2 * self.gamma ** (bucket + self._offset) / (self.gamma + 1)
+
+
+class RollingStats:
+    """
+    Summary statistics over the power values of the last ``window_reads`` reads.
+
+    ``update`` is O(samples per read); ``summary`` is O(1) in the window length.
+    """
+
+    # Re-aggregate from the per-read statistics this often to stop float drift
+    REFRESH_INTERVAL = 1000
+
+    def __init__(self, window_reads=100, frame_size=1024, relative_accuracy=0.02):
+        """
+        Args:
+            window_reads (int): Number of reads kept in the window
+            frame_size (int): Maximum number of values per read
+            relative_accuracy (float): Relative error bound of the median estimate
+        """
+        self.window_reads = window_reads
+        self.frame_size = frame_size
+        self.window = np.zeros((window_reads, frame_size), dtype=np.float32)
+        self.sketch = QuantileSketch(relative_accuracy)
+
+        # Per-read statistics, one slot per read in the window
+        self._counts = np.zeros(window_reads, dtype=np.int64)
+        self._means = np.zeros(window_reads, dtype=np.float64)
+        self._m2s = np.zeros(window_reads, dtype=np.float64)
+        self._mins = np.full(window_reads, np.inf)
+        self._maxs = np.full(window_reads, -np.inf)
+        self._buckets = np.zeros((window_reads, self.sketch.num_buckets), dtype=np.int32)
+
+        # Window aggregates
+        self._bucket_total = np.zeros(self.sketch.num_buckets, dtype=np.int64)
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+        self._next = 0
+        self._reads = 0
+
+    def _add(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def _remove(self, count, mean, m2):
+        remaining = self.count - count
+        if remaining <= 0:
+            self.count, self.mean, self._m2 = 0, 0.0, 0.0
+            return
+        remaining_mean = (self.count * self.mean - count * mean) / remaining
+        delta = mean - remaining_mean
+        self._m2 = max(self._m2 - m2 - delta * delta * remaining * count / self.count, 0.0)
+        self.mean = remaining_mean
+        self.count = remaining
+
+    def _refresh(self):
+        counts = self._counts
+        total = counts.sum()
+        if total == 0:
+            self.count, self.mean, self._m2 = 0, 0.0, 0.0
+            return
+        mean = np.dot(counts, self._means) / total
+        self._m2 = float(self._m2s.sum() + np.dot(counts, (self._means - mean) ** 2))
+        self.mean = float(mean)
+        self.count = int(total)
+
+    def update(self, values):
+        """
+        Add the power values of one read, evicting the oldest read if the window is full.
+
+        Args:
+            values (numpy.ndarray): Power values of one read (at most frame_size)
+        """
+        values = values[:self.frame_size]
+        count = len(values)
+        if count == 0:
+            return
+        slot = self._next
+
+        if self._counts[slot]:
+            self._remove(int(self._counts[slot]), float(self._means[slot]),
+                         float(self._m2s[slot]))
+            self._bucket_total -= self._buckets[slot]
+
+        row = self.window[slot, :count]
+        row[:] = values
+        mean = float(np.mean(values, dtype=np.float64))
+        m2 = float(np.sum(np.square(values - mean, dtype=np.float64)))
+        buckets = self.sketch.bucket_counts(row)
+
+        self._counts[slot] = count
+        self._means[slot] = mean
+        self._m2s[slot] = m2
+        self._mins[slot] = row.min()
+        self._maxs[slot] = row.max()
+        self._buckets[slot] = buckets
+        self._bucket_total += buckets
+        self._add(count, mean, m2)
+
+        self._next = (slot + 1) % self.window_reads
+        self._reads += 1
+        if self._reads % self.REFRESH_INTERVAL == 0:
+            self._refresh()
+
+    @property
+    def variance(self):
+        """Population variance of the values in the window."""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std_dev(self):
+        """Population standard deviation of the values in the window."""
+        return math.sqrt(self.variance)
+
+    def median(self):
+        """Estimated median of the values in the window."""
+        return self.sketch.quantile(self._bucket_total, 0.5)
+
+    def values(self):
+        """
+        Return the values in the window, oldest read first.
+
+        Returns:
+            numpy.ndarray: float32 copy of the window contents
+        """
+        order = np.roll(np.arange(self.window_reads), -self._next)
+        return np.concatenate([self.window[i, :self._counts[i]] for i in order])
+
+    def summary(self):
+        """
+        Summarize the window.
+
+        Returns:
+            dict: total_samples and overall mean/median/max/min/std_dev/snr, in
+            the format of the SDR summary message
+        """
+        std_dev = self.std_dev
+        filled = self._counts > 0
+        return {
+            'total_samples': self.count,
+            'overall_mean_power': float(self.mean),
+            'overall_median_power': float(self.median()),
+            'overall_max_power': float(self._maxs[filled].max()) if self.count else 0.0,
+            'overall_min_power': float(self._mins[filled].min()) if self.count else 0.0,
+            'overall_std_dev': float(std_dev),
+            'overall_snr': float(self.mean / std_dev) if std_dev > 0 else 0.0
+        }
@@ -0,0 +1,171 @@
+﻿#!/usr/bin/env python
+"""
+Wideband sweep scanner.
+
+SweepScanner hops a tunable source (RtlSdr, or a SimulatedSource) across a
+frequency range wider than one capture. After every retune the samples read
+while the tuner and its PLL settle are thrown away, then one or more FFT
+frames are averaged into the power spectrum of that hop using the cached
+SpectrumAnalyzer for the hop's parameters (spectrum.get_analyzer), so the
+window and FFT buffers are set up once for the whole scan.
+
+Only the middle ``usable_fraction`` of each hop is kept; the band edges, where
+the tuner's anti-alias filter rolls off, are trimmed. Hops are spaced a whole
+number of FFT bins apart so the kept segments line up on one frequency grid;
+where segments overlap their linear power is averaged. Each sweep produces one
+panorama covering [start_freq, stop_freq).
+"""
+
+import math
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from spectrum import get_analyzer, to_db
+
+SweepResult = namedtuple(
+    'SweepResult',
+    ['freqs', 'spectrum_db', 'power', 'hops', 'sweep_time', 'hops_per_second',
+     'peak_freq', 'peak_power']
+)
+
+
+class SweepScanner:
+    """
+    Sweeps a tunable source across [start_freq, stop_freq) and stitches the hops
+    into one panorama per sweep.
+
+    The source must expose a writable center_freq and read_samples(n). The
+    returned arrays are new for every sweep.
+    """
+
+    def __init__(self, source, start_freq, stop_freq, sample_rate=2.048e6, fft_size=1024,
+                 usable_fraction=0.75, overlap=0.0, settle_samples=16384, averages=4,
+                 window='hann', workers=None):
+        """
+        Args:
+            source (RtlSdr): Tunable source, configured with sample_rate
+            start_freq (float): Lowest frequency of the panorama in Hz
+            stop_freq (float): Highest frequency of the panorama in Hz
+            sample_rate (float): Sample rate of the source in Hz
+            fft_size (int): Samples per FFT frame
+            usable_fraction (float): Fraction of each hop's bandwidth kept, in (0, 1]
+            overlap (float): Fraction of the kept bandwidth shared with the next hop, in [0, 1)
+            settle_samples (int): Samples read and discarded after every retune
+            averages (int): FFT frames averaged per hop
+            window (str, optional): Window name, None for rectangular
+            workers (int, optional): scipy.fft worker threads
+        """
+        if stop_freq <= start_freq:
+            raise ValueError("stop_freq must be above start_freq")
+        if not 0 < usable_fraction <= 1:
+            raise ValueError("usable_fraction must be in (0, 1]")
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap must be in [0, 1)")
+        self.source = source
+        self.start_freq = start_freq
+        self.stop_freq = stop_freq
+        self.sample_rate = sample_rate
+        self.fft_size = fft_size
+        self.settle_samples = settle_samples
+        self.averages = max(1, averages)
+        self.window = window
+        self.workers = workers
+
+        self.bin_width = sample_rate / fft_size
+        # Kept bins of each hop, centered on DC in fftshift order
+        self.keep_bins = max(1, int(fft_size * usable_fraction))
+        self.trim = (fft_size - self.keep_bins) // 2
+        self.step_bins = max(1, int(round(self.keep_bins * (1 - overlap))))
+
+        self.num_bins = math.ceil((stop_freq - start_freq) / self.bin_width)
+        num_hops = 1
+        if self.num_bins > self.keep_bins:
+            num_hops += math.ceil((self.num_bins - self.keep_bins) / self.step_bins)
+        # The first kept bin of the first hop lands on start_freq
+        analyzer = get_analyzer(fft_size, sample_rate, window, workers)
+        first_center = start_freq - analyzer.freqs[self.trim]
+        self.centers = first_center + np.arange(num_hops) * self.step_bins * self.bin_width
+        self.freqs = start_freq + np.arange(self.num_bins) * self.bin_width
+
+        # Number of hops covering each bin, for averaging the overlaps
+        grid_bins = (num_hops - 1) * self.step_bins + self.keep_bins
+        counts = np.zeros(grid_bins)
+        for offset in self._offsets():
+            counts[offset:offset + self.keep_bins] += 1
+        self._weights = 1 / counts[:self.num_bins]
+        self._accumulator = np.zeros(grid_bins)
+        self.sweeps = 0
+
+    def _offsets(self):
+        return range(0, len(self.centers) * self.step_bins, self.step_bins)
+
+    def hop_power(self, samples):
+        """
+        Average the power spectra of the FFT frames in one hop's samples.
+
+        Args:
+            samples (numpy.ndarray): averages * fft_size complex samples
+
+        Returns:
+            numpy.ndarray: Linear power in fftshift order
+        """
+        analyzer = get_analyzer(self.fft_size, self.sample_rate, self.window, self.workers)
+        frames = np.reshape(samples, (-1, self.fft_size))
+        power = np.zeros(self.fft_size)
+        for frame in frames:
+            power += analyzer.analyze(frame).power
+        power /= len(frames)
+        return power
+
+    def sweep(self):
+        """
+        Tune through every hop once and stitch the panorama.
+
+        Returns:
+            SweepResult: Absolute bin frequencies in Hz, dB and linear power,
+            hop count, sweep time in seconds, hops per second and the strongest
+            bin's frequency (Hz) and power
+        """
+        start = time.perf_counter()
+        self._accumulator[:] = 0
+        kept = slice(self.trim, self.trim + self.keep_bins)
+        for center, offset in zip(self.centers, self._offsets()):
+            self.source.center_freq = center
+            if self.settle_samples:
+                # Samples captured while the tuner settles are not usable
+                self.source.read_samples(self.settle_samples)
+            samples = self.source.read_samples(self.fft_size * self.averages)
+            self._accumulator[offset:offset + self.keep_bins] += self.hop_power(samples)[kept]
+
+        power = self._accumulator[:self.num_bins] * self._weights
+        sweep_time = time.perf_counter() - start
+        self.sweeps += 1
+        peak_bin = int(np.argmax(power))
+        hops = len(self.centers)
+        return SweepResult(
+            self.freqs.copy(),
+            to_db(power),
+            power,
+            hops,
+            sweep_time,
+            hops / sweep_time if sweep_time > 0 else 0.0,
+            float(self.freqs[peak_bin]),
+            float(power[peak_bin])
+        )
+
+
+def print_sweep_stats(stats):
+    """
+    Print the timing of one sweep.
+
+    Args:
+        stats (dict): Panorama message data (see sdr.run_sweep_scanner)
+    """
+    print(f"\n=== Sweep #{stats['sweep_number']} ===")
+    print(f"Range: {stats['start_freq'] / 1e6:.3f} - {stats['stop_freq'] / 1e6:.3f} MHz "
+          f"({stats['bins']} bins of {stats['bin_width'] / 1e3:.3f} kHz)")
+    print(f"Hops: {stats['hops']} in {stats['sweep_time']:.3f} s "
+          f"({stats['hops_per_s']:.1f} hops/s)")
+    print(f"Peak: {stats['peak_freq_mhz']:.4f} MHz at {stats['peak_power_db']:.1f} dB")
@@ -5,6 +5,11 @@ SDR Data Console Printer and ActiveMQ Publisher
 This script initializes an RTL-SDR dongle, reads data from it, processes the data,
 and sends the results to ActiveMQ. It also prints the data to the console.
 It requires the pyrtlsdr, numpy, stomp.py, and python-dotenv libraries to be installed.
+pyrtlsdr and stomp.py are imported when a device is opened and when the broker
+is connected, and the modules of optional features when their options are
+used, so --help, the tests and a plain run start without them. Connection settings,
+destinations and the stream defaults (sample rate, FFT and frame size) come
+from config.py and can be overridden on the command line.
 
 Usage:
     python sdr.py
@@ -12,66 +17,81 @@ Usage:
 
 import sys
 import time
+import argparse
+import importlib.util
 import json
 import numpy as np
-import stomp
-import random
-from math import log10
+from math import ceil, log10
+
+import config
+import creds
+from async_publisher import AsyncPublisher, POLICIES, print_publisher_stats
+from connection import ConnectionManager
+from console import ConsoleReporter, OUTPUT_MODES, format_channel_report, format_detection_event
+from detection import CFAR_METHODS
+from metrics import PipelineMetrics
+from rolling_stats import RollingStats
+from spectrum import (BlockAnalyzer, SpectrumAnalyzer, WelchAverager, get_analyzer,
+                      reduce_bins, to_db, POOLING_METHODS, WINDOWS)
+from spectrum_delta import PUBLISH_MODES, SpectrumDeltaEncoder
+from spectrum_frames import CONTENT_TYPE, ENCODINGS, encode_spectrum_frame
+
+# Optional features (channels, scanning, recording, detection, channelizer,
+# waterfall, threaded pipeline, simulation, metrics endpoint, profiling) import
+# their modules where they are used, so a plain run loads only what it needs
+
+# Check if pyrtlsdr is available; it is imported when a device is opened
+PYRTLSDR_AVAILABLE = importlib.util.find_spec('rtlsdr') is not None
+
+# Pipeline metrics; every metric is a no-op until enable_metrics is called
+METRICS = PipelineMetrics()
+
+def enable_metrics(port, host='127.0.0.1'):
+    """
+    Record pipeline metrics and serve them in the Prometheus text format.
 
-# Check if pyrtlsdr is available
-PYRTLSDR_AVAILABLE = True
-try:
-    from rtlsdr import RtlSdr
-except ImportError:
-    PYRTLSDR_AVAILABLE = False
-    print("Warning: pyrtlsdr module not available. Running in simulation mode.")
-
-# Import ActiveMQ connection settings
-try:
-    from creds import BROKER, USER, PASS, SDR_DEST
-except ImportError:
-    # Fallback if creds.py is not available
-    import os
-    from dotenv import load_dotenv
-
-    # Load environment variables from .env file (if present)
-    load_dotenv()
-
-    # Get ActiveMQ connection settings from environment variables
-    BROKER = [(
-        os.getenv('ACTIVEMQ_HOST', 'localhost'),
-        int(os.getenv('ACTIVEMQ_PORT', '61613'))
-    )]
-    USER = os.getenv('ACTIVEMQ_USER', 'admin')
-    PASS = os.getenv('ACTIVEMQ_PASS', 'admin')
-    SDR_DEST = os.getenv('ACTIVEMQ_SDR_DEST', '/queue/sdr')
-
-# ActiveMQ listener class
-class MyListener(stomp.ConnectionListener):
-    def on_error(self, headers, message):
-        print('ActiveMQ error:', message)
-    def on_connected(self, headers):
-        print("Connected to ActiveMQ")
-
-def setup_activemq():
+    Args:
+        port (int): HTTP port of the /metrics endpoint
+        host (str): Interface to listen on
+
+    Returns:
+        MetricsServer: The running server
+    """
+    from metrics import MetricsRegistry, MetricsServer
+
+    global METRICS
+    registry = MetricsRegistry()
+    METRICS = PipelineMetrics(registry)
+    return MetricsServer(registry, port, host).start()
+
+# ActiveMQ listener (stomp.py calls listener methods by name)
+class MyListener:
+    def on_error(self, frame):
+        print('ActiveMQ error:', frame.body)
+
+def setup_activemq(heartbeats=(0, 0)):
     """
     Initialize and configure the ActiveMQ connection.
 
+    Connects to the first reachable entry of creds.BROKER. If none is reachable the
+    connection keeps retrying in the background (with backoff) and buffers
+    messages until a broker comes up.
+
+    Args:
+        heartbeats (tuple): STOMP heartbeats (send, receive) in milliseconds
+
     Returns:
-        stomp.Connection: Configured ActiveMQ connection object
+        ConnectionManager: Managed ActiveMQ connection object
     """
-    try:
-        print(f"\n=== ActiveMQ Connection Information ===")
-        print(f"Connecting to ActiveMQ at {BROKER}...")
-        conn = stomp.Connection(host_and_ports=BROKER, heartbeats=(0, 0))
-        conn.set_listener('', MyListener())
-        conn.connect(login=USER, passcode=PASS, wait=True)
-        print(f"Connected to ActiveMQ")
-        print(f"Destination: {SDR_DEST}")
-        return conn
-    except Exception as e:
-        print(f"Error connecting to ActiveMQ: {e}")
-        return None
+    print(f"\n=== ActiveMQ Connection Information ===")
+    print(f"Connecting to ActiveMQ at {creds.BROKER}...")
+    conn = ConnectionManager(creds.BROKER, creds.USER, creds.PASS, heartbeats=heartbeats,
+                             listener=MyListener())
+    if not conn.connect(max_attempts=len(creds.BROKER)):
+        print("ActiveMQ not reachable; buffering messages and reconnecting in the background")
+        conn.start_reconnect()
+    print(f"Destination: {creds.SDR_DEST}")
+    return conn
 
 def compute_fft(samples, log_scale=True):
     """
@@ -84,27 +104,25 @@ def compute_fft(samples, log_scale=True):
     Returns:
         numpy.ndarray: Power spectrum in dB
     """
-    # Compute FFT
-    fft = np.fft.fft(samples)
+    # Single FFT via a cached analyzer; the sample rate does not affect the spectrum
+    result = get_analyzer(len(samples), 2.048e6).analyze(samples)
 
-    # Shift the FFT so that the center frequency is in the middle
-    fft_shifted = np.fft.fftshift(fft)
-
-    # Calculate power (magnitude squared)
-    power = np.abs(fft_shifted) ** 2
-
-    # Convert to dB scale if requested
+    # Copy out of the analyzer's reusable buffers
     if log_scale:
-        # Add a small value to avoid log(0)
-        power_db = 10 * np.log10(power + 1e-10)
-        return power_db
+        return result.spectrum_db.copy()
     else:
-        return power
+        return result.power.copy()
+
+# Seeded simulators used by generate_simulated_samples, one per sample rate
+_SIMULATORS = {}
 
 def generate_simulated_samples(size=1024, center_freq=100e6, sample_rate=2.048e6):
     """
     Generate simulated complex samples for testing when no SDR hardware is available.
 
+    Samples continue the default simulated scene (see simulator.default_simulator)
+    for the sample rate, so successive calls form one continuous signal.
+
     Args:
         size (int): Number of samples to generate
         center_freq (float): Center frequency in Hz
@@ -113,24 +131,12 @@ def generate_simulated_samples(size=1024, center_freq=100e6, sample_rate=2.048e6
     Returns:
         numpy.ndarray: Complex samples
     """
-    # Generate random complex samples
-    real_part = np.random.normal(0, 1, size)
-    imag_part = np.random.normal(0, 1, size)
-    samples = real_part + 1j * imag_part
-
-    # Add some peaks to simulate signals
-    num_peaks = random.randint(1, 5)
-    for _ in range(num_peaks):
-        # Random position for the peak
-        peak_pos = random.randint(0, size-1)
-        # Random strength for the peak
-        peak_strength = random.uniform(5, 20)
-        # Add the peak
-        samples[peak_pos] += peak_strength * (1 + 1j)
-
-    return samples
+    if sample_rate not in _SIMULATORS:
+        from simulator import default_simulator
+        _SIMULATORS[sample_rate] = default_simulator(sample_rate)
+    return _SIMULATORS[sample_rate].generate(size).astype(complex)
 
-def send_to_activemq(conn, message_data, message_type="sample", spectrum_data=None, center_freq=162.450e6, sample_rate=2.048e6, simulated=False):
+def send_to_activemq(conn, message_data, message_type="sample", spectrum_data=None, center_freq=162.450e6, sample_rate=2.048e6, simulated=False, encoding="json", destination=None, channel=None):
     """
     Send data to ActiveMQ.
 
@@ -142,6 +148,10 @@ def send_to_activemq(conn, message_data, message_type="sample", spectrum_data=No
         center_freq (float): Center frequency in Hz
         sample_rate (float): Sample rate in Hz
         simulated (bool): Whether the data is simulated
+        encoding (str): "json" (default) or a binary spectrum encoding
+            ("float32", "float16" or "uint8"), see spectrum_frames
+        destination (str, optional): Destination, defaults to creds.SDR_DEST
+        channel (str, optional): Channel name, added to the message and as a 'channel' header
 
     Returns:
         bool: True if successful, False otherwise
@@ -150,7 +160,31 @@ def send_to_activemq(conn, message_data, message_type="sample", spectrum_data=No
         print("ActiveMQ connection not available")
         return False
 
+    destination = destination or creds.SDR_DEST
     try:
+        if encoding != "json":
+            # Compact binary frame: header, metadata and the raw spectrum
+            metadata = {'type': message_type, 'data': message_data, 'simulated': simulated}
+            headers = {'content-type': CONTENT_TYPE}
+            if channel is not None:
+                metadata['channel'] = channel
+                headers['channel'] = channel
+            with METRICS.serialize.time():
+                body = encode_spectrum_frame(
+                    spectrum_data,
+                    center_freq,
+                    sample_rate,
+                    time.time(),
+                    encoding,
+                    metadata
+                )
+            headers['content-length'] = str(len(body))
+            send_start = time.perf_counter()
+            result = conn.send(destination=destination, body=body, headers=headers)
+            # An AsyncPublisher only queues the message, or drops it under its queue policy
+            return METRICS.record_send(result, body, time.perf_counter() - send_start)
+
+        serialize_start = time.perf_counter()
         # Add message metadata
         message = {
             'timestamp': time.time(),
@@ -160,16 +194,25 @@ def send_to_activemq(conn, message_data, message_type="sample", spectrum_data=No
             'sample_rate': sample_rate,
             'simulated': simulated
         }
+        if channel is not None:
+            message['channel'] = channel
 
         # Add spectrum data if provided
         if spectrum_data is not None and len(spectrum_data) > 0:
             # Convert to Python list for JSON serialization
             message['spectrum_db'] = spectrum_data.tolist()
+        body = json.dumps(message)
+        METRICS.serialize.observe(time.perf_counter() - serialize_start)
 
         # Send message
-        conn.send(destination=SDR_DEST, body=json.dumps(message))
-        return True
+        send_start = time.perf_counter()
+        if channel is not None:
+            result = conn.send(destination=destination, body=body, headers={'channel': channel})
+        else:
+            result = conn.send(destination=destination, body=body)
+        return METRICS.record_send(result, body, time.perf_counter() - send_start)
     except Exception as e:
+        METRICS.send_failures.inc()
         print(f"Error sending to ActiveMQ: {e}")
         return False
 
@@ -177,14 +220,19 @@ def setup_sdr():
     """
     Initialize and configure the RTL-SDR device.
 
+    Raises:
+        ImportError: If pyrtlsdr is not installed
+
     Returns:
         RtlSdr: Configured RTL-SDR device object
     """
+    from rtlsdr import RtlSdr
+
     try:
         sdr = RtlSdr()
 
         # Configure SDR settings
-        sdr.sample_rate = 2.048e6  # Hz
+        sdr.sample_rate = config.get_config().sample_rate  # Hz
         sdr.center_freq = 162.450e6    # Hz (adjust to a frequency of interest, e.g., FM radio)
         sdr.freq_correction = 60   # PPM
         sdr.gain = 'auto'
@@ -248,7 +296,474 @@ def setup_sdr():
         print(f"Error initializing SDR: {e}")
         sys.exit(1)
 
-def read_and_print_samples(sdr, activemq_conn=None, num_samples=1024, simulated=False):
+# Full per-read console reports, used when no reporter is given
+DEFAULT_REPORTER = ConsoleReporter('full')
+
+def get_stream_parameters(sdr, simulated=False):
+    """
+    Get the center frequency and sample rate for the sample stream.
+
+    Args:
+        sdr (RtlSdr): Configured RTL-SDR device (may be None when simulated)
+        simulated (bool): Whether simulated data is used
+
+    Returns:
+        tuple: (center_freq, sample_rate) in Hz
+    """
+    if sdr and not simulated:
+        return sdr.center_freq, sdr.sample_rate
+    # Default center frequency and the configured sample rate
+    return 162.450e6, config.get_config().sample_rate
+
+def compute_time_domain_stats(power):
+    """
+    Compute the time domain statistics of one read.
+
+    Args:
+        power (numpy.ndarray): Sample power (magnitude squared)
+
+    Returns:
+        dict: Mean, median, max, min, standard deviation and estimated SNR
+    """
+    # Calculate statistics
+    mean_power = np.mean(power)
+    std_dev = np.std(power)
+
+    # Calculate signal quality metrics
+    snr_estimate = mean_power / std_dev if std_dev > 0 else 0
+
+    return {
+        'mean_power': float(mean_power),
+        'median_power': float(np.median(power)),
+        'max_power': float(np.max(power)),
+        'min_power': float(np.min(power)),
+        'std_dev': float(std_dev),
+        'snr_estimate': float(snr_estimate)
+    }
+
+def compute_block_time_domain_stats(power_frames):
+    """
+    Compute the time domain statistics of every frame of a block in single calls.
+
+    Args:
+        power_frames (numpy.ndarray): Sample power as (frames, frame_size)
+
+    Returns:
+        dict: Arrays with one mean, median, max, min, standard deviation and
+        estimated SNR per frame
+    """
+    mean_power = power_frames.mean(axis=1)
+    std_dev = power_frames.std(axis=1)
+    return {
+        'mean_power': mean_power,
+        'median_power': np.median(power_frames, axis=1),
+        'max_power': power_frames.max(axis=1),
+        'min_power': power_frames.min(axis=1),
+        'std_dev': std_dev,
+        'snr_estimate': np.divide(mean_power, std_dev, out=np.zeros_like(mean_power),
+                                  where=std_dev > 0)
+    }
+
+class SampleProcessor:
+    """
+    DSP stage: computes time and frequency domain statistics for each read and
+    builds the messages to publish. Keeps the running state used for summaries.
+    """
+
+    def __init__(self, center_freq, sample_rate, num_samples=1024, simulated=False,
+                 window=None, fft_workers=None, encoding="json", average_segments=1,
+                 overlap=0.0, output_bins=None, pooling="mean", channels=0, channel_taps=8,
+                 channel_freqs=None, detector=None, cfar_guard=2, cfar_train=16,
+                 cfar_pfa=1e-3, detection_events=False, publish_mode="full",
+                 change_tolerance=1.0, keyframe_interval=100, block_size=None,
+                 waterfall_rows=0, waterfall_history=256, waterfall_interval=None,
+                 waterfall_range=(-20.0, 80.0), waterfall_compress=False, waterfall_dest=None):
+        """
+        Args:
+            center_freq (float): Center frequency in Hz
+            sample_rate (float): Sample rate in Hz
+            num_samples (int): Number of samples per read
+            simulated (bool): Whether the data is simulated
+            window (str, optional): FFT window name, None for rectangular
+            fft_workers (int, optional): scipy.fft worker threads
+            encoding (str): Message encoding passed to send_to_activemq
+            average_segments (int): Segments Welch-averaged into each published
+                spectrum; 1 publishes every read's own spectrum
+            overlap (float): Fraction of overlap between averaged segments
+            output_bins (int, optional): Pool the published spectrum down to this many bins
+            pooling (str): Bin pooling method, "mean" or "max"
+            channels (int): Split each read into this many channels with a polyphase
+                filterbank and publish their power; 0 disables the channelizer
+            channel_taps (int): Filter taps per channel of the filterbank
+            channel_freqs (list, optional): Absolute frequencies in Hz of the channels
+                to report, defaults to all channels
+            detector (str, optional): CFAR method ("ca" or "os") used to list the
+                signals in each spectrum; None disables detection
+            cfar_guard (int): CFAR guard cells on each side
+            cfar_train (int): CFAR training cells on each side
+            cfar_pfa (float): CFAR false alarm probability per bin
+            detection_events (bool): Publish only detection start/stop events
+                instead of spectra and summaries (requires a detector)
+            publish_mode (str): "full" publishes every spectrum; "changes" skips
+                reads whose spectrum stayed within change_tolerance of the last one
+                sent; "delta" sends only the changed bins against a keyframe (see
+                spectrum_delta). Summaries then carry no spectrum.
+            change_tolerance (float): Spectrum change in dB that is not published
+            keyframe_interval (int): Maximum reads between full spectra
+            block_size (int, optional): Block mode: each read is a block of this many
+                samples, split into num_samples-sized frames (overlapping by
+                overlap) that are analyzed in batched calls. One message is
+                published per block, with the block's averaged spectrum and
+                arrays of per-frame statistics.
+            waterfall_rows (int): Keep a rolling waterfall of the published spectra
+                and publish tiles of this many rows (see waterfall); 0 disables
+            waterfall_history (int): Rows kept in the waterfall ring
+            waterfall_interval (int, optional): Spectra between tiles, defaults to
+                waterfall_rows (consecutive tiles then do not overlap)
+            waterfall_range (tuple): (min_db, max_db) range of the uint8 tile codes
+            waterfall_compress (bool): zlib-compress the tiles
+            waterfall_dest (str, optional): Tile destination, defaults to
+                creds.SDR_DEST + ".waterfall"
+        """
+        self.center_freq = center_freq
+        self.sample_rate = sample_rate
+        self.num_samples = num_samples
+        self.simulated = simulated
+        self.window = window
+        self.encoding = encoding
+        self.analyzer = SpectrumAnalyzer(num_samples, sample_rate, window, fft_workers)
+        if block_size and block_size < num_samples:
+            raise ValueError(f"block size {block_size} is smaller than the FFT size "
+                             f"{num_samples}")
+        self.block_size = block_size
+        self.block_analyzer = None
+        self.last_block = None
+        self.averager = None
+        if block_size:
+            self.block_analyzer = BlockAnalyzer(num_samples, sample_rate, window, overlap,
+                                                fft_workers)
+        elif average_segments > 1:
+            self.averager = WelchAverager(num_samples, sample_rate, average_segments,
+                                          window or 'hann', overlap, fft_workers)
+        self.output_bins = output_bins
+        self.pooling = pooling
+        self.last_spectrum_db = None
+        if block_size:
+            # Summaries cover at least as many samples as 100 single-frame reads
+            self.rolling_stats = RollingStats(ceil(100 * num_samples / block_size), block_size)
+        else:
+            self.rolling_stats = RollingStats(100, num_samples)
+        METRICS.rolling_window.set_function(lambda: self.rolling_stats.count)
+        self.read_count = 0
+
+        self.waterfall = None
+        self.waterfall_rows = waterfall_rows
+        if waterfall_rows:
+            self.waterfall_history = max(waterfall_history, waterfall_rows)
+            self.waterfall_interval = waterfall_interval or waterfall_rows
+            self.waterfall_range = waterfall_range
+            self.waterfall_compress = waterfall_compress
+            self.waterfall_dest = waterfall_dest or f"{creds.SDR_DEST}.waterfall"
+            self._rows_since_tile = 0
+
+        self.delta_encoder = None
+        if publish_mode != "full":
+            self.delta_encoder = SpectrumDeltaEncoder(publish_mode, change_tolerance,
+                                                      keyframe_interval)
+
+        self.detector = None
+        self.tracker = None
+        if detector:
+            from detection import CfarDetector, DetectionTracker
+            self.detector = CfarDetector(detector, cfar_guard, cfar_train, cfar_pfa)
+            if detection_events:
+                self.tracker = DetectionTracker()
+        elif detection_events:
+            raise ValueError("detection_events requires a detector")
+
+        self.channelizer = None
+        if channels:
+            from channelizer import PolyphaseChannelizer
+            self.channelizer = PolyphaseChannelizer(channels, sample_rate, channel_taps)
+            self.channel_indices = self._channel_indices(channel_freqs)
+            offsets = np.fft.fftfreq(channels, 1 / sample_rate)[self.channel_indices]
+            self.channel_freqs_mhz = (center_freq + offsets) / 1e6
+
+    def _channel_indices(self, channel_freqs):
+        # Channelizer output columns to report, in ascending frequency order
+        num_channels = self.channelizer.num_channels
+        if not channel_freqs:
+            return np.fft.fftshift(np.arange(num_channels))
+        indices = []
+        for freq in sorted(channel_freqs):
+            offset = freq - self.center_freq
+            if abs(offset) > self.sample_rate / 2:
+                raise ValueError(f"Channel {freq / 1e6} MHz is outside the captured band")
+            indices.append(int(round(offset / self.channelizer.output_rate)) % num_channels)
+        return np.array(indices)
+
+    def _channel_message(self, samples):
+        streams = self.channelizer.process(samples)
+        if not len(streams):
+            return None
+        from channelizer import channel_stats
+        stats = channel_stats(streams)
+        channels = []
+        for index, freq_mhz in zip(self.channel_indices, self.channel_freqs_mhz):
+            channels.append({
+                'index': int(index),
+                'freq_mhz': float(freq_mhz),
+                'mean_power': float(stats['mean_power'][index]),
+                'max_power': float(stats['max_power'][index]),
+                'std_dev': float(stats['std_dev'][index]),
+                'snr_db': float(stats['snr_db'][index]),
+            })
+        channel_data = {
+            'read_number': self.read_count,
+            'num_channels': self.channelizer.num_channels,
+            'channel_spacing': self.channelizer.output_rate,
+            'output_samples': len(streams),
+            'channels': channels,
+        }
+        # The published spectrum is the mean power of every channel, lowest first
+        return self._message(channel_data, "channels",
+                             to_db(np.fft.fftshift(stats['mean_power'])))
+
+    def _message(self, message_data, message_type, spectrum_data):
+        return {
+            'message_data': message_data,
+            'message_type': message_type,
+            'spectrum_data': spectrum_data,
+            'center_freq': self.center_freq,
+            'sample_rate': self.sample_rate,
+            'simulated': self.simulated,
+            'encoding': self.encoding
+        }
+
+    def _compute_spectrum(self, samples):
+        if self.block_analyzer is not None:
+            self.last_block = self.block_analyzer.analyze(samples)
+            return self.block_analyzer.average(self.last_block)
+        if self.averager is not None:
+            results = self.averager.add(samples)
+            return results[-1] if results else None
+        if self.analyzer.fft_size != len(samples):
+            self.analyzer = SpectrumAnalyzer(len(samples), self.sample_rate, self.window,
+                                             self.analyzer.workers)
+        return self.analyzer.analyze(samples)
+
+    def _waterfall_tile(self, spectrum_db):
+        # Add the spectrum as a waterfall row; return a tile message when one is due
+        from waterfall import Waterfall, encode_tile
+        if self.waterfall is None or self.waterfall.num_bins != len(spectrum_db):
+            self.waterfall = Waterfall(len(spectrum_db), self.waterfall_history)
+            self._rows_since_tile = 0
+        self.waterfall.add(spectrum_db, time.time())
+        self._rows_since_tile += 1
+        if self._rows_since_tile < self.waterfall_interval:
+            return None
+        self._rows_since_tile = 0
+        rows, timestamps = self.waterfall.latest(self.waterfall_rows)
+        min_db, max_db = self.waterfall_range
+        tile = encode_tile(rows, timestamps, self.center_freq, self.sample_rate, min_db, max_db,
+                           self.waterfall_compress)
+        return {
+            'message_type': "waterfall",
+            'tile': tile,
+            'rows': len(rows),
+            'destination': self.waterfall_dest,
+        }
+
+    def _frame_stats(self, power):
+        # Per-frame statistics of a block, over the same frames as the STFT
+        block = self.last_block
+        stats = compute_block_time_domain_stats(self.block_analyzer.frames(power))
+        stats['peak_freq_mhz'] = block.peak_freq / 1e6
+        stats['peak_power'] = block.peak_power
+        frame_stats = {name: values.tolist() for name, values in stats.items()}
+        frame_stats['count'] = len(block.peak_bin)
+        frame_stats['fft_size'] = self.block_analyzer.fft_size
+        frame_stats['overlap'] = self.block_analyzer.overlap
+        return frame_stats
+
+    def process(self, samples):
+        """
+        Analyze one read of samples.
+
+        Args:
+            samples (numpy.ndarray): Complex samples from SDR
+
+        Returns:
+            list: Message dicts (keyword arguments for send_to_activemq) to publish
+        """
+        self.read_count += 1
+        read_count = self.read_count
+        sample_rate = self.sample_rate
+        METRICS.reads.inc()
+        stats_start = time.perf_counter()
+
+        # Convert to power (magnitude squared)
+        power = np.abs(samples) ** 2
+        self.rolling_stats.update(power)
+        stats_time = time.perf_counter() - stats_start
+
+        # Compute the dB spectrum and the peak frequency from a single FFT
+        # (or from a Welch average once enough segments have been collected)
+        fft_start = time.perf_counter()
+        try:
+            spectrum = self._compute_spectrum(samples)
+            if spectrum is not None:
+                if self.output_bins:
+                    spectrum_db = to_db(reduce_bins(spectrum.power, self.output_bins,
+                                                    self.pooling))
+                else:
+                    # Copy out of the analyzer's buffers: the message may be published later
+                    spectrum_db = spectrum.spectrum_db.copy()
+                self.last_spectrum_db = spectrum_db
+                peak_freq = spectrum.peak_freq
+                peak_power = spectrum.peak_power
+
+            has_fft_data = True
+        except Exception as e:
+            print(f"Error calculating frequency domain info: {e}")
+            spectrum = None
+            spectrum_db = None
+            has_fft_data = False
+        METRICS.fft.observe(time.perf_counter() - fft_start)
+
+        stats_start = time.perf_counter()
+        time_domain = compute_time_domain_stats(power)
+        METRICS.stats.observe(stats_time + time.perf_counter() - stats_start)
+
+        # Prepare data for ActiveMQ
+        sample_data = {
+            'read_number': read_count,
+            'total_reads': None,
+            'sample_count': len(samples),
+            'time_domain': time_domain,
+            'first_samples': [{'real': float(s.real), 'imag': float(s.imag)} for s in samples[:10]]
+        }
+
+        # Add frequency domain data if available
+        if has_fft_data and spectrum is not None:
+            sample_data['frequency_domain'] = {
+                'peak_freq_mhz': float(peak_freq/1e6),
+                'peak_power': float(peak_power)
+            }
+            if self.averager is not None:
+                sample_data['frequency_domain']['averaged_segments'] = self.averager.num_segments
+            if self.output_bins:
+                sample_data['frequency_domain']['bins'] = self.output_bins
+            if self.block_analyzer is not None:
+                sample_data['frames'] = self._frame_stats(power)
+            if self.detector is not None:
+                detections = self.detector.detect(spectrum.power, sample_rate, self.center_freq)
+                sample_data['frequency_domain']['detections'] = [
+                    detection._asdict() for detection in detections]
+
+        messages = []
+        if self.waterfall_rows and spectrum is not None:
+            tile_message = self._waterfall_tile(spectrum_db)
+            if tile_message is not None:
+                messages.append(tile_message)
+
+        if self.tracker is not None:
+            # Events only: spectra and summaries are not published
+            if spectrum is not None:
+                for event in self.tracker.update(detections):
+                    messages.append(self._message(event, "detection", None))
+            return messages
+
+        # While a Welch average is still accumulating there is no spectrum to publish
+        if spectrum is not None and self.delta_encoder is not None:
+            update = self.delta_encoder.encode(spectrum_db)
+            if update is not None:
+                sample_data['spectrum_update'] = update
+                messages.append(self._message(sample_data, "sample",
+                                              spectrum_db if update['kind'] == 'keyframe'
+                                              else None))
+        elif spectrum is not None or not has_fft_data:
+            messages.append(self._message(sample_data, "sample", spectrum_db))
+
+        if self.channelizer is not None:
+            channel_message = self._channel_message(samples)
+            if channel_message is not None:
+                messages.append(channel_message)
+
+        # Add summary statistics periodically (every 10 reads)
+        if read_count % 10 == 0 and self.rolling_stats.count:
+            # Statistics cover the last 100 reads, maintained incrementally
+            summary_data = self.rolling_stats.summary()
+
+            # The summary carries the most recent spectrum; the processing stage
+            # never reads the device itself. Consumers of change-driven or delta
+            # publishing rebuild spectra from the sample messages instead.
+            summary_spectrum = self.last_spectrum_db if self.delta_encoder is None else None
+            messages.append(self._message(summary_data, "summary", summary_spectrum))
+
+        return messages
+
+def send_waterfall_tile(conn, tile, destination, channel=None):
+    """
+    Send an encoded waterfall tile to ActiveMQ.
+
+    Args:
+        conn (stomp.Connection): ActiveMQ connection object
+        tile (bytes): Tile from waterfall.encode_tile
+        destination (str): Destination for tiles
+        channel (str, optional): Channel name, added as a 'channel' header
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    from waterfall import CONTENT_TYPE as WATERFALL_CONTENT_TYPE
+    headers = {'content-type': WATERFALL_CONTENT_TYPE, 'content-length': str(len(tile))}
+    if channel is not None:
+        headers['channel'] = channel
+    try:
+        send_start = time.perf_counter()
+        result = conn.send(destination=destination, body=tile, headers=headers)
+        return METRICS.record_send(result, tile, time.perf_counter() - send_start)
+    except Exception as e:
+        METRICS.send_failures.inc()
+        print(f"Error sending waterfall tile to ActiveMQ: {e}")
+        return False
+
+def publish_message(activemq_conn, message, reporter=None):
+    """
+    Publishing stage: send one message to ActiveMQ and report it on the console.
+
+    Args:
+        activemq_conn (stomp.Connection): ActiveMQ connection object (may be None)
+        message (dict): Message built by SampleProcessor
+        reporter (ConsoleReporter, optional): Console output, full reports by default
+    """
+    reporter = reporter or DEFAULT_REPORTER
+    send_success = None
+    if message['message_type'] == "waterfall":
+        if activemq_conn:
+            send_success = send_waterfall_tile(activemq_conn, message['tile'],
+                                               message['destination'], message.get('channel'))
+        status = {None: "", True: " sent", False: " failed to send"}[send_success]
+        reporter.info(f"\nWaterfall tile of {message['rows']} rows ({len(message['tile'])} "
+                      f"bytes){status} to {message['destination']}")
+        return
+
+    if activemq_conn:
+        send_success = send_to_activemq(activemq_conn, **message)
+
+    if message['message_type'] == "summary":
+        reporter.summary(message['message_data'], send_success)
+    elif message['message_type'] == "channels":
+        reporter.info(format_channel_report(message['message_data'], send_success))
+    elif message['message_type'] == "detection":
+        reporter.notice(format_detection_event(message['message_data'], send_success))
+    else:
+        reporter.sample(message['message_data'], send_success)
+
+def read_and_print_samples(sdr, activemq_conn=None, num_samples=1024, simulated=False,
+                           reporter=None, sim_speed=1.0, sim_seed=0, recorder=None,
+                           profiler=None, **processor_options):
     """
     Read samples from the SDR device, print them to the console, and send to ActiveMQ.
     Runs continuously until interrupted by the user.
@@ -258,204 +773,574 @@ def read_and_print_samples(sdr, activemq_conn=None, num_samples=1024, simulated=
         activemq_conn (stomp.Connection): ActiveMQ connection object
         num_samples (int): Number of samples to read at once
         simulated (bool): Whether to use simulated data
+        reporter (ConsoleReporter, optional): Console output, full reports by default
+        sim_speed (float): Simulated sample rate as a multiple of real time, 0 for unpaced
+        sim_seed (int, optional): Seed for the simulated signal
+        recorder (IQRecorder, optional): Records every frame read
+        profiler (LoopProfiler, optional): Profiles iterations and memory on request
+        **processor_options: Extra keyword arguments for SampleProcessor
     """
+    reporter = reporter or DEFAULT_REPORTER
+    if profiler is None:
+        from profiling import LoopProfiler
+        profiler = LoopProfiler()
     try:
         print("\n=== SDR Signal Information ===")
         print(f"Reading samples continuously. Press Ctrl+C to stop...")
 
         # Get device parameters
-        if sdr and not simulated:
-            center_freq = sdr.center_freq
-            sample_rate = sdr.sample_rate
-        else:
-            center_freq = 162.450e6  # Default center frequency
-            sample_rate = 2.048e6  # Default sample rate
-
-        # Track statistics across all reads
-        all_powers = []
-        read_count = 0
+        center_freq, sample_rate = get_stream_parameters(sdr, simulated)
+        processor = SampleProcessor(center_freq, sample_rate, num_samples, simulated,
+                                    **processor_options)
+        if simulated:
+            from simulator import SimulatedSource, default_simulator
+            sdr = SimulatedSource(default_simulator(sample_rate, sim_seed), sim_speed)
+        # Block mode reads many frames at once
+        read_size = processor.block_size or num_samples
 
         while True:  # Run indefinitely until interrupted
-            read_count += 1
-            # Read samples (or generate simulated samples)
+            if profiler.pending:
+                profiler.tick()
+
+            # Read samples (simulated samples are paced like the device)
+            with METRICS.acquisition.time():
+                samples = sdr.read_samples(read_size)
             if simulated:
-                samples = generate_simulated_samples(num_samples, center_freq, sample_rate)
-                print("Using simulated samples")
-            else:
-                samples = sdr.read_samples(num_samples)
-
-            # Convert to power (magnitude squared)
-            power = np.abs(samples) ** 2
-            all_powers.extend(power)
-
-            # Calculate statistics
-            mean_power = np.mean(power)
-            max_power = np.max(power)
-            min_power = np.min(power)
-            median_power = np.median(power)
-            std_dev = np.std(power)
-
-            # Calculate signal quality metrics
-            snr_estimate = mean_power / std_dev if std_dev > 0 else 0
-
-            # Compute FFT and get spectrum data in dB
-            spectrum_db = compute_fft(samples)
-
-            # Calculate frequency domain information
-            try:
-                # Use the FFT to find peak frequency
-                fft = np.fft.fft(samples)
-                fft_freq = np.fft.fftfreq(len(samples), 1/sample_rate)
-                fft_power = np.abs(fft)**2
-                peak_freq_idx = np.argmax(fft_power[:len(fft_power)//2])
-                peak_freq = fft_freq[peak_freq_idx]
-                peak_power = fft_power[peak_freq_idx]
-
-                has_fft_data = True
-            except Exception as e:
-                print(f"Error calculating frequency domain info: {e}")
-                has_fft_data = False
-
-            # Prepare data for ActiveMQ
-            sample_data = {
-                'read_number': read_count,
-                'total_reads': None,
-                'sample_count': len(samples),
-                'time_domain': {
-                    'mean_power': float(mean_power),
-                    'median_power': float(median_power),
-                    'max_power': float(max_power),
-                    'min_power': float(min_power),
-                    'std_dev': float(std_dev),
-                    'snr_estimate': float(snr_estimate)
-                },
-                'first_samples': [{'real': float(s.real), 'imag': float(s.imag)} for s in samples[:10]]
-            }
+                reporter.info("Using simulated samples")
+            if recorder:
+                recorder.write(samples)
 
-            # Add frequency domain data if available
-            if has_fft_data:
-                sample_data['frequency_domain'] = {
-                    'peak_freq_mhz': float(peak_freq/1e6),
-                    'peak_power': float(peak_power)
-                }
-
-            # Send data to ActiveMQ
-            if activemq_conn:
-                send_success = send_to_activemq(
-                    activemq_conn, 
-                    sample_data, 
-                    "sample", 
-                    spectrum_db, 
-                    center_freq, 
-                    sample_rate, 
-                    simulated
-                )
-                if send_success:
-                    print(f"\n--- Read #{read_count} --- (Sent to ActiveMQ)")
-                else:
-                    print(f"\n--- Read #{read_count} --- (Failed to send to ActiveMQ)")
-            else:
-                print(f"\n--- Read #{read_count} ---")
-
-            print(f"Number of samples: {len(samples)}")
-
-            print("\nTime Domain Analysis:")
-            print(f"  Mean power: {mean_power:.6f}")
-            print(f"  Median power: {median_power:.6f}")
-            print(f"  Max power: {max_power:.6f}")
-            print(f"  Min power: {min_power:.6f}")
-            print(f"  Standard deviation: {std_dev:.6f}")
-            print(f"  Estimated SNR: {snr_estimate:.6f}")
-
-            if has_fft_data:
-                print("\nFrequency Domain Analysis:")
-                print(f"  Peak frequency: {peak_freq/1e6:.3f} MHz (relative to center)")
-                print(f"  Peak power: {peak_power:.6f}")
-
-            # Print first few samples
-            print("\nSample values (first 10):")
-            for j, sample in enumerate(samples[:10]):
-                print(f"  Sample {j}: {sample.real:.6f} + {sample.imag:.6f}j")
-
-            # Print summary statistics periodically (every 10 reads)
-            if read_count % 10 == 0 and all_powers:
-                print("\n=== SDR Signal Summary (Last 100 Reads or Less) ===")
-
-                # Limit the statistics to the last 100 reads to avoid memory growth
-                if len(all_powers) > 100 * num_samples:
-                    all_powers = all_powers[-100 * num_samples:]
-
-                all_mean = np.mean(all_powers)
-                all_median = np.median(all_powers)
-                all_max = np.max(all_powers)
-                all_min = np.min(all_powers)
-                all_std = np.std(all_powers)
-                all_snr = all_mean / all_std if all_std > 0 else 0
-
-                # Prepare summary data for ActiveMQ
-                summary_data = {
-                    'total_samples': len(all_powers),
-                    'overall_mean_power': float(all_mean),
-                    'overall_median_power': float(all_median),
-                    'overall_max_power': float(all_max),
-                    'overall_min_power': float(all_min),
-                    'overall_std_dev': float(all_std),
-                    'overall_snr': float(all_snr)
-                }
-
-                # Send summary to ActiveMQ
-                if activemq_conn:
-                    # Compute a final spectrum for the summary
-                    if simulated:
-                        final_samples = generate_simulated_samples(num_samples, center_freq, sample_rate)
-                    else:
-                        try:
-                            final_samples = sdr.read_samples(num_samples)
-                        except Exception:
-                            final_samples = None
-
-                    if final_samples is not None:
-                        final_spectrum = compute_fft(final_samples)
-                    else:
-                        final_spectrum = None
-
-                    send_success = send_to_activemq(
-                        activemq_conn, 
-                        summary_data, 
-                        "summary", 
-                        final_spectrum, 
-                        center_freq, 
-                        sample_rate, 
-                        simulated
-                    )
-                    if send_success:
-                        print("Summary statistics sent to ActiveMQ")
-                    else:
-                        print("Failed to send summary statistics to ActiveMQ")
-
-                print(f"Total samples analyzed: {len(all_powers)}")
-                print(f"Overall mean power: {all_mean:.6f}")
-                print(f"Overall median power: {all_median:.6f}")
-                print(f"Overall max power: {all_max:.6f}")
-                print(f"Overall min power: {all_min:.6f}")
-                print(f"Overall standard deviation: {all_std:.6f}")
-                print(f"Overall estimated SNR: {all_snr:.6f}")
+            for message in processor.process(samples):
+                publish_message(activemq_conn, message, reporter)
+                if profiler.memory and message['message_type'] == "summary":
+                    profiler.memory_snapshot()
 
     except KeyboardInterrupt:
         print("\nSampling interrupted by user")
+    except EOFError:
+        print("\nEnd of recording")
     except Exception as e:
         print(f"\nError reading samples: {e}")
+    finally:
+        profiler.close()
+
+def print_pipeline_stats(stats):
+    """
+    Print the threaded pipeline counters.
+
+    Args:
+        stats (dict): Counters returned by SamplePipeline.stats()
+    """
+    print("\n=== Pipeline Status ===")
+    print(f"Frames acquired: {stats['frames_acquired']}")
+    print(f"Frames processed: {stats['frames_processed']}")
+    print(f"Ring buffer overruns: {stats['overruns']}")
+    print(f"Ring buffer depth: {stats['ring_depth']}")
+    print(f"Publish queue depth: {stats['publish_queue_depth']}")
+    print(f"Publish queue drops: {stats['publish_drops']}")
+
+def run_threaded_pipeline(sdr, activemq_conn=None, num_samples=1024, simulated=False,
+                          ring_capacity=64, status_interval=10.0, reporter=None,
+                          sim_speed=1.0, sim_seed=0, recorder=None, **processor_options):
+    """
+    Run acquisition, processing and publishing on separate threads.
+
+    The acquisition thread fills a preallocated ring buffer (using the RtlSdr
+    async reader when available) so that slow processing or a slow broker no
+    longer stalls sample reads. Overruns are reported periodically.
+
+    Args:
+        sdr (RtlSdr): Configured RTL-SDR device
+        activemq_conn (stomp.Connection): ActiveMQ connection object
+        num_samples (int): Number of samples per frame
+        simulated (bool): Whether to use simulated data
+        ring_capacity (int): Number of frames the ring buffer can hold
+        status_interval (float): Seconds between pipeline status reports
+        reporter (ConsoleReporter, optional): Console output, full reports by default
+        sim_speed (float): Simulated sample rate as a multiple of real time, 0 for unpaced
+        sim_seed (int, optional): Seed for the simulated signal
+        recorder (IQRecorder, optional): Records every frame processed
+        **processor_options: Extra keyword arguments for SampleProcessor
+    """
+    reporter = reporter or DEFAULT_REPORTER
+    print("\n=== SDR Signal Information ===")
+    print(f"Reading samples on a threaded pipeline. Press Ctrl+C to stop...")
+
+    center_freq, sample_rate = get_stream_parameters(sdr, simulated)
+    processor = SampleProcessor(center_freq, sample_rate, num_samples, simulated,
+                                **processor_options)
+
+    from pipeline import SamplePipeline
+
+    read_fn = None
+    if simulated:
+        from simulator import SimulatedSource, default_simulator
+        source = SimulatedSource(default_simulator(sample_rate, sim_seed), sim_speed)
+
+        def read_fn(size):
+            with METRICS.acquisition.time():
+                return source.read_samples(size)
+
+    frame_size = num_samples
+    if processor.block_size:
+        # Block mode: the ring holds blocks, sized to use about as much memory
+        frame_size = processor.block_size
+        ring_capacity = max(2, ceil(ring_capacity * num_samples / frame_size))
+
+    process_fn = processor.process
+    if recorder:
+        # Recorded on the DSP thread, so disk writes never block acquisition
+        def process_fn(samples):
+            recorder.write(samples)
+            return processor.process(samples)
+
+    pipeline = SamplePipeline(
+        process_fn,
+        lambda message: publish_message(activemq_conn, message, reporter),
+        sdr=None if simulated else sdr,
+        read_fn=read_fn,
+        frame_size=frame_size,
+        ring_capacity=ring_capacity
+    )
+    METRICS.ring_depth.set_function(lambda: len(pipeline.ring))
+    METRICS.overruns.set_function(lambda: pipeline.ring.overruns)
+    pipeline.start()
+    try:
+        last_overruns = 0
+        while pipeline.is_running():
+            time.sleep(status_interval)
+            stats = pipeline.stats()
+            reporter.status('pipeline', stats, print_pipeline_stats)
+            if isinstance(activemq_conn, AsyncPublisher):
+                reporter.status('publisher', activemq_conn.stats(), print_publisher_stats)
+            if stats['overruns'] > last_overruns:
+                reporter.notice(f"Warning: processing fell behind, "
+                                f"{stats['overruns'] - last_overruns} frames overwritten")
+            last_overruns = stats['overruns']
+    except KeyboardInterrupt:
+        print("\nSampling interrupted by user")
+    finally:
+        pipeline.stop()
+        reporter.status('pipeline', pipeline.stats(), print_pipeline_stats)
 
-def main():
+def run_channel_supervisor(supervisor, activemq_conn=None, status_interval=10.0,
+                           reporter=None):
+    """
+    Capture several channels with a ChannelSupervisor and publish their messages.
+
+    Args:
+        supervisor (ChannelSupervisor): Configured supervisor (not yet started)
+        activemq_conn (stomp.Connection): ActiveMQ connection object
+        status_interval (float): Seconds between channel status reports
+        reporter (ConsoleReporter, optional): Console output, full reports by default
+    """
+    from multichannel import print_channel_stats
+
+    reporter = reporter or DEFAULT_REPORTER
+    print("\n=== SDR Channels ===")
+    for channel in supervisor.channels:
+        source = channel.replay or (f"serial {channel.serial}" if channel.serial else "simulated")
+        print(f"{channel.name}: {channel.center_freq / 1e6} MHz at "
+              f"{channel.sample_rate / 1e6} MHz ({source}) -> "
+              f"{channel.destination or creds.SDR_DEST}")
+    print(f"Reading {len(supervisor.channels)} channels with {supervisor.dsp_workers} "
+          f"DSP processes. Press Ctrl+C to stop...")
+
+    supervisor.start()
+    try:
+        supervisor.run(
+            lambda message: publish_message(activemq_conn, message, reporter),
+            lambda stats: reporter.status('channels', stats, print_channel_stats),
+            status_interval
+        )
+    except KeyboardInterrupt:
+        print("\nSampling interrupted by user")
+    finally:
+        supervisor.stop()
+        reporter.status('channels', supervisor.stats(), print_channel_stats)
+
+def panorama_message(scanner, result, sweep_number, simulated=False, encoding="json"):
+    """
+    Build the message for one sweep, in the keyword form taken by send_to_activemq.
+
+    The panorama is described like a single capture: center_freq is the
+    frequency of its middle bin and sample_rate is its span, so bin k lies at
+    center_freq + (k - bins // 2) * sample_rate / bins.
+
+    Args:
+        scanner (SweepScanner): Scanner that produced the sweep
+        result (SweepResult): Sweep to publish
+        sweep_number (int): Number of the sweep, counting from 1
+        simulated (bool): Whether the data is simulated
+        encoding (str): Message encoding, see send_to_activemq
+
+    Returns:
+        dict: Message with message_data, message_type, spectrum_data, ...
+    """
+    bins = len(result.freqs)
+    message_data = {
+        'sweep_number': sweep_number,
+        'start_freq': scanner.start_freq,
+        'stop_freq': scanner.stop_freq,
+        'bins': bins,
+        'bin_width': scanner.bin_width,
+        'hops': result.hops,
+        'sweep_time': result.sweep_time,
+        'hops_per_s': result.hops_per_second,
+        'peak_freq_mhz': result.peak_freq / 1e6,
+        'peak_power_db': 10 * log10(result.peak_power + 1e-10),
+    }
+    return {
+        'message_data': message_data,
+        'message_type': "panorama",
+        'spectrum_data': result.spectrum_db,
+        'center_freq': float(result.freqs[bins // 2]),
+        'sample_rate': bins * scanner.bin_width,
+        'simulated': simulated,
+        'encoding': encoding,
+    }
+
+def run_sweep_scanner(scanner, activemq_conn=None, simulated=False, encoding="json",
+                      reporter=None):
+    """
+    Sweep continuously and publish one panorama per sweep.
+
+    Args:
+        scanner (SweepScanner): Configured scanner
+        activemq_conn (stomp.Connection): ActiveMQ connection object
+        simulated (bool): Whether the source is simulated
+        encoding (str): Message encoding, see send_to_activemq
+        reporter (ConsoleReporter, optional): Console output, full reports by default
+    """
+    from scanner import print_sweep_stats
+
+    reporter = reporter or DEFAULT_REPORTER
+    print("\n=== Sweep Scan ===")
+    print(f"Scanning {scanner.start_freq / 1e6:.3f} - {scanner.stop_freq / 1e6:.3f} MHz in "
+          f"{len(scanner.centers)} hops of {scanner.keep_bins * scanner.bin_width / 1e6:.3f} MHz. "
+          f"Press Ctrl+C to stop...")
+    try:
+        while True:
+            result = scanner.sweep()
+            message = panorama_message(scanner, result, scanner.sweeps, simulated, encoding)
+            if activemq_conn and not send_to_activemq(activemq_conn, **message):
+                reporter.notice(f"Failed to send panorama of sweep #{scanner.sweeps} to ActiveMQ")
+            reporter.status('sweep', message['message_data'], print_sweep_stats)
+    except KeyboardInterrupt:
+        print("\nScan interrupted by user")
+
+def disconnect_activemq(activemq_conn, publisher=None):
+    """
+    Flush the asynchronous publisher (if any) and disconnect from ActiveMQ.
+
+    Args:
+        activemq_conn (stomp.Connection): ActiveMQ connection object (may be None)
+        publisher (AsyncPublisher, optional): Publisher sending on activemq_conn
+    """
+    if publisher:
+        print("\nFlushing queued messages...")
+        publisher.close()
+        print_publisher_stats(publisher.stats())
+
+    if activemq_conn:
+        print("\nDisconnecting from ActiveMQ...")
+        activemq_conn.disconnect()
+        print("Disconnected from ActiveMQ")
+
+def parse_args(argv=None):
+    """
+    Parse command line arguments.
+
+    Args:
+        argv (list, optional): Arguments to parse, defaults to none
+
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="SDR Data Console Printer and ActiveMQ Publisher")
+    parser.add_argument('--threaded', action='store_true',
+                        help="Run acquisition, processing and publishing on separate threads")
+    parser.add_argument('--ring-capacity', type=int, default=64,
+                        help="Frames held by the acquisition ring buffer in threaded mode")
+    parser.add_argument('--window', choices=[name for name in WINDOWS if name], default=None,
+                        help="FFT window (default: rectangular)")
+    parser.add_argument('--fft-workers', type=int, default=None,
+                        help="scipy.fft worker threads (-1 for all CPUs)")
+    parser.add_argument('--encoding', choices=['json'] + list(ENCODINGS), default='json',
+                        help="Message encoding: JSON (default) or a binary spectrum frame")
+    parser.add_argument('--block-size', type=int, default=None, metavar='SAMPLES',
+                        help="Block mode: read SAMPLES at a time (e.g. 262144) and analyze "
+                             "all frames of a block in batched calls")
+    parser.add_argument('--average', type=int, default=1, metavar='K',
+                        help="Publish a Welch-averaged PSD of K segments instead of every read")
+    parser.add_argument('--overlap', type=float, default=0.0,
+                        help="Fraction of overlap between averaged segments or block mode "
+                             "frames (e.g. 0.5)")
+    parser.add_argument('--output-bins', type=int, default=None, metavar='N',
+                        help="Pool the published spectrum down to N bins")
+    parser.add_argument('--pooling', choices=POOLING_METHODS, default='mean',
+                        help="Bin pooling method for --output-bins")
+    parser.add_argument('--channelize', type=int, default=0, metavar='N',
+                        help="Split each read into N channels with a polyphase filterbank "
+                             "and publish per-channel power")
+    parser.add_argument('--channel-taps', type=int, default=8,
+                        help="Filter taps per channel for --channelize")
+    parser.add_argument('--channel-freqs', type=float, nargs='+', default=None, metavar='HZ',
+                        help="Report only the --channelize channels nearest these frequencies")
+    parser.add_argument('--detector', choices=CFAR_METHODS, default=None,
+                        help="List the signals in each spectrum with a cell-averaging (ca) "
+                             "or ordered-statistic (os) CFAR detector")
+    parser.add_argument('--cfar-guard', type=int, default=2,
+                        help="CFAR guard cells on each side of the bin under test")
+    parser.add_argument('--cfar-train', type=int, default=16,
+                        help="CFAR training cells on each side of the bin under test")
+    parser.add_argument('--cfar-pfa', type=float, default=1e-3,
+                        help="CFAR false alarm probability per bin")
+    parser.add_argument('--detection-events', action='store_true',
+                        help="Publish only detection start/stop events instead of spectra")
+    parser.add_argument('--publish-mode', choices=PUBLISH_MODES, default='full',
+                        help="Publish every spectrum, only changed spectra, or sparse deltas "
+                             "against a keyframe")
+    parser.add_argument('--change-tolerance', type=float, default=1.0, metavar='DB',
+                        help="Spectrum changes up to this many dB are not published "
+                             "(--publish-mode changes/delta)")
+    parser.add_argument('--keyframe-interval', type=int, default=100, metavar='READS',
+                        help="Maximum reads between full spectra (--publish-mode changes/delta)")
+    parser.add_argument('--waterfall', type=int, default=0, metavar='ROWS',
+                        help="Keep a rolling waterfall and publish uint8 tiles of the last "
+                             "ROWS spectra")
+    parser.add_argument('--waterfall-history', type=int, default=256, metavar='ROWS',
+                        help="Rows kept in the waterfall ring")
+    parser.add_argument('--waterfall-interval', type=int, default=None, metavar='ROWS',
+                        help="Spectra between waterfall tiles (default: --waterfall)")
+    parser.add_argument('--waterfall-range', type=float, nargs=2, default=[-20.0, 80.0],
+                        metavar=('MIN_DB', 'MAX_DB'), help="dB range of the waterfall tile codes")
+    parser.add_argument('--waterfall-compress', action='store_true',
+                        help="zlib-compress waterfall tiles")
+    parser.add_argument('--waterfall-dest', default=None, metavar='DESTINATION',
+                        help="Destination for waterfall tiles (default: SDR_DEST.waterfall)")
+    parser.add_argument('--output', choices=OUTPUT_MODES, default='full',
+                        help="Console output: full reports, a compact status line, "
+                             "JSON lines, or quiet")
+    parser.add_argument('--output-interval', type=float, default=1.0, metavar='SECONDS',
+                        help="Seconds between lines in compact and json output modes")
+    parser.add_argument('--sim-speed', type=float, default=1.0, metavar='X',
+                        help="Simulated sample rate as a multiple of real time "
+                             "(0: as fast as possible)")
+    parser.add_argument('--sim-seed', type=int, default=0,
+                        help="Seed for the simulated signal")
+    parser.add_argument('--channels', metavar='FILE', default=None,
+                        help="Capture the channels listed in a JSON file, one acquisition "
+                             "process per channel (see multichannel.py)")
+    parser.add_argument('--dsp-workers', type=int, default=None,
+                        help="DSP processes for --channels (default: one per channel, up to "
+                             "the number of CPUs)")
+    parser.add_argument('--frame-slots', type=int, default=16,
+                        help="Shared memory frame slots per channel for --channels")
+    parser.add_argument('--scan', type=float, nargs=2, metavar=('START', 'STOP'), default=None,
+                        help="Sweep from START to STOP Hz and publish one panorama per sweep")
+    parser.add_argument('--scan-usable', type=float, default=0.75, metavar='FRACTION',
+                        help="Fraction of each hop's bandwidth kept (band edges are trimmed)")
+    parser.add_argument('--scan-overlap', type=float, default=0.0, metavar='FRACTION',
+                        help="Fraction of the kept bandwidth shared by adjacent hops")
+    parser.add_argument('--scan-averages', type=int, default=4, metavar='N',
+                        help="FFT frames averaged per hop")
+    parser.add_argument('--settle-samples', type=int, default=16384,
+                        help="Samples discarded after each retune while the tuner settles")
+    parser.add_argument('--record', metavar='PATH', default=None,
+                        help="Record raw IQ to PATH.sigmf-data with a PATH.sigmf-meta sidecar")
+    parser.add_argument('--replay', metavar='PATH', default=None,
+                        help="Replay a recording made with --record instead of reading a device")
+    parser.add_argument('--replay-speed', type=float, default=1.0, metavar='X',
+                        help="Replay speed as a multiple of real time (0: as fast as possible)")
+    parser.add_argument('--replay-loop', action='store_true',
+                        help="Restart the replay at the end of the recording")
+    parser.add_argument('--heartbeat', type=int, default=0, metavar='MS',
+                        help="STOMP heartbeat interval in milliseconds (0 disables)")
+    parser.add_argument('--async-publish', action='store_true',
+                        help="Send messages from a background thread through a bounded queue")
+    parser.add_argument('--queue-size', type=int, default=1000,
+                        help="Maximum messages queued by --async-publish")
+    parser.add_argument('--queue-policy', choices=POLICIES, default='drop-oldest',
+                        help="What --async-publish does when the queue is full")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="Maximum messages packed into one STOMP frame")
+    parser.add_argument('--batch-interval', type=float, default=0.05,
+                        help="Maximum seconds to wait while filling a batch")
+    parser.add_argument('--metrics-port', type=int, default=None, metavar='PORT',
+                        help="Serve Prometheus metrics on http://HOST:PORT/metrics")
+    parser.add_argument('--metrics-host', default='127.0.0.1', metavar='HOST',
+                        help="Interface of the metrics endpoint")
+    parser.add_argument('--profile', type=int, default=None, metavar='N',
+                        help="Profile the first N iterations of the sample loop with cProfile "
+                             "(default: $SDR_PROFILE); SIGUSR1 profiles the next N at any time")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="Write tracemalloc snapshot diffs at every summary "
+                             "(or set $SDR_PROFILE_MEMORY=1); SIGUSR2 toggles them")
+    parser.add_argument('--profile-dir', default=None, metavar='DIR',
+                        help="Directory for profiling results (default: $SDR_PROFILE_DIR or .)")
+    config.add_arguments(parser)
+    return parser.parse_args(argv or [])
+
+def main(argv=None):
     """
     Main function to run the SDR data console printer and ActiveMQ publisher.
     The program runs continuously until interrupted by the user (Ctrl+C).
+
+    Args:
+        argv (list, optional): Command line arguments
     """
+    args = parse_args(argv)
+    settings = config.configure_from_args(args)
+
     print("SDR Data Console Printer and ActiveMQ Publisher")
     print("----------------------------------------------")
 
+    processor_options = {
+        'window': args.window,
+        'fft_workers': args.fft_workers,
+        'encoding': args.encoding,
+        'average_segments': args.average,
+        'overlap': args.overlap,
+        'output_bins': args.output_bins,
+        'pooling': args.pooling,
+        'channels': args.channelize,
+        'channel_taps': args.channel_taps,
+        'channel_freqs': args.channel_freqs,
+        'detector': args.detector,
+        'cfar_guard': args.cfar_guard,
+        'cfar_train': args.cfar_train,
+        'cfar_pfa': args.cfar_pfa,
+        'detection_events': args.detection_events,
+        'publish_mode': args.publish_mode,
+        'change_tolerance': args.change_tolerance,
+        'keyframe_interval': args.keyframe_interval,
+        'block_size': args.block_size,
+        'waterfall_rows': args.waterfall,
+        'waterfall_history': args.waterfall_history,
+        'waterfall_interval': args.waterfall_interval,
+        'waterfall_range': tuple(args.waterfall_range),
+        'waterfall_compress': args.waterfall_compress,
+        # Resolved here: DSP worker processes load their own configuration, without
+        # the command line overrides
+        'waterfall_dest': args.waterfall_dest or f"{settings.sdr_dest}.waterfall"
+    }
+    simulation_options = {'sim_speed': args.sim_speed, 'sim_seed': args.sim_seed}
+
+    # A frame size other than the FFT size reads in blocks of several FFT frames
+    stream_options = dict(processor_options, num_samples=settings.fft_size)
+    if not args.block_size and settings.frame_size != settings.fft_size:
+        stream_options['block_size'] = settings.frame_size
+    if stream_options['block_size'] and stream_options['block_size'] < settings.fft_size:
+        print(f"Block size {stream_options['block_size']} is smaller than the FFT size "
+              f"{settings.fft_size}; use --frame-size/--block-size of at least --fft-size")
+        return
+
+    # Profiling hooks cost nothing until triggered by a flag, the environment or a signal
+    from profiling import profiler_from_environ
+    profiler = profiler_from_environ(args.profile, args.profile_memory, args.profile_dir)
+    profiler.install_signal_handlers()
+
+    if args.metrics_port is not None:
+        metrics_server = enable_metrics(args.metrics_port, args.metrics_host)
+        host, port = metrics_server.address
+        print(f"Serving metrics on http://{host}:{port}/metrics")
+
     # Initialize ActiveMQ connection
-    activemq_conn = setup_activemq()
+    activemq_conn = setup_activemq(heartbeats=(args.heartbeat, args.heartbeat))
+
+    # Optionally send from a background thread through a bounded queue
+    publisher = None
+    if args.async_publish and activemq_conn:
+        publisher = AsyncPublisher(
+            activemq_conn,
+            max_queue=args.queue_size,
+            policy=args.queue_policy,
+            batch_size=args.batch_size,
+            batch_interval=args.batch_interval
+        )
+        METRICS.watch_publisher(publisher)
+
+    reporter = ConsoleReporter(args.output, args.output_interval)
+
+    def run(sdr, activemq_conn, simulated=False):
+        if args.scan:
+            from scanner import SweepScanner
+            from simulator import SimulatedSource, default_simulator
+            start_freq, stop_freq = args.scan
+            sample_rate = get_stream_parameters(sdr, simulated)[1]
+            if simulated:
+                # Place the simulated scene in the middle of the scanned range
+                sdr = SimulatedSource(default_simulator(sample_rate, args.sim_seed),
+                                      args.sim_speed, (start_freq + stop_freq) / 2)
+            scanner = SweepScanner(sdr, start_freq, stop_freq, sample_rate, settings.fft_size,
+                                   usable_fraction=args.scan_usable,
+                                   overlap=args.scan_overlap,
+                                   settle_samples=args.settle_samples,
+                                   averages=args.scan_averages,
+                                   window=args.window or 'hann',
+                                   workers=args.fft_workers)
+            run_sweep_scanner(scanner, publisher or activemq_conn, simulated, args.encoding,
+                              reporter)
+            return
+
+        recorder = None
+        if args.record:
+            from iq_recording import IQRecorder
+            center_freq, sample_rate = get_stream_parameters(sdr, simulated)
+            gain = None if simulated else getattr(sdr, 'gain', None)
+            recorder = IQRecorder(args.record, sample_rate, center_freq, gain)
+            print(f"Recording IQ to {recorder.data_path}")
+        try:
+            if args.threaded:
+                run_threaded_pipeline(sdr, publisher or activemq_conn, simulated=simulated,
+                                      ring_capacity=args.ring_capacity, reporter=reporter,
+                                      recorder=recorder, **simulation_options,
+                                      **stream_options)
+            else:
+                read_and_print_samples(sdr, publisher or activemq_conn, simulated=simulated,
+                                       reporter=reporter, recorder=recorder, profiler=profiler,
+                                       **simulation_options, **stream_options)
+        finally:
+            if recorder:
+                recorder.close()
+                print(f"Recorded {recorder.samples_written} samples to {recorder.data_path}")
+
+    # Capture several channels in separate processes
+    if args.channels:
+        from multichannel import ChannelSupervisor, load_channels
+        try:
+            supervisor = ChannelSupervisor(load_channels(args.channels), SampleProcessor,
+                                           processor_options, args.dsp_workers,
+                                           args.frame_slots, args.sim_speed)
+        except ValueError as e:
+            print(f"Invalid channels in {args.channels}: {e}")
+            disconnect_activemq(activemq_conn, publisher)
+            return
+        try:
+            run_channel_supervisor(supervisor, publisher or activemq_conn, reporter=reporter)
+        finally:
+            disconnect_activemq(activemq_conn, publisher)
+        return
+
+    # Replay a recording instead of reading a device
+    if args.replay:
+        if args.scan:
+            print("--scan needs a tunable device and cannot be used with --replay")
+            disconnect_activemq(activemq_conn, publisher)
+            return
+        from iq_recording import IQReplaySource
+        sdr = IQReplaySource(args.replay, args.replay_speed, args.replay_loop)
+        print("\n=== Replaying IQ Recording ===")
+        print(f"File: {sdr.data_path} ({len(sdr)} samples, recorded {sdr.start_time})")
+        print(f"Sample rate: {sdr.sample_rate / 1e6} MHz")
+        print(f"Center frequency: {sdr.center_freq / 1e6} MHz")
+        try:
+            run(sdr, activemq_conn)
+        finally:
+            sdr.close()
+            disconnect_activemq(activemq_conn, publisher)
+        return
 
     # Check if pyrtlsdr is available
     if not PYRTLSDR_AVAILABLE:
@@ -464,13 +1349,10 @@ def main():
 
         try:
             # Read, print, and send simulated samples continuously
-            read_and_print_samples(None, activemq_conn, simulated=True)
+            run(None, activemq_conn, simulated=True)
         finally:
-            # Disconnect from ActiveMQ
-            if activemq_conn:
-                print("\nDisconnecting from ActiveMQ...")
-                activemq_conn.disconnect()
-                print("Disconnected from ActiveMQ")
+            # Flush queued messages and disconnect from ActiveMQ
+            disconnect_activemq(activemq_conn, publisher)
         return
 
     # Try to initialize SDR
@@ -483,19 +1365,16 @@ def main():
 
         try:
             # Read, print, and send simulated samples continuously
-            read_and_print_samples(None, activemq_conn, simulated=True)
+            run(None, activemq_conn, simulated=True)
         finally:
-            # Disconnect from ActiveMQ
-            if activemq_conn:
-                print("\nDisconnecting from ActiveMQ...")
-                activemq_conn.disconnect()
-                print("Disconnected from ActiveMQ")
+            # Flush queued messages and disconnect from ActiveMQ
+            disconnect_activemq(activemq_conn, publisher)
         return
 
     # If we got here, we have a working SDR
     try:
         # Read, print, and send samples continuously
-        read_and_print_samples(sdr, activemq_conn)
+        run(sdr, activemq_conn)
     finally:
         # Clean up
         if sdr:
@@ -503,11 +1382,8 @@ def main():
             sdr.close()
             print("SDR device closed")
 
-        # Disconnect from ActiveMQ
-        if activemq_conn:
-            print("\nDisconnecting from ActiveMQ...")
-            activemq_conn.disconnect()
-            print("Disconnected from ActiveMQ")
+        # Flush queued messages and disconnect from ActiveMQ
+        disconnect_activemq(activemq_conn, publisher)
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
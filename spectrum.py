@@ -0,0 +1,398 @@
+﻿#!/usr/bin/env python
+"""
+Spectral analysis for SDR sample frames.
+
+SpectrumAnalyzer runs one FFT per frame and derives everything the publisher
+needs from it: the shifted dB spectrum, the linear power spectrum and the peak
+bin/frequency/power. The frequency axis and window are computed once per
+(fft_size, sample_rate, window) and output buffers are reused between calls.
+
+WelchAverager averages the power of K (optionally overlapping) windowed
+segments into one PSD, and reduce_bins pools a spectrum down to fewer output
+bins, both to publish fewer, smaller and cleaner spectra.
+
+BlockAnalyzer is the batched short-time FFT: a large block of samples is
+viewed as a (frames x fft_size) array (overlapping frames through a strided
+view, without copying) and the FFT, power and peaks of every frame are
+computed in single calls along the frame axis.
+
+scipy.fft is used when it is installed so the transform can use worker
+threads; otherwise numpy.fft is used.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# scipy.fft is optional: it supports multithreaded transforms
+SCIPY_FFT_AVAILABLE = True
+try:
+    import scipy.fft as scipy_fft
+except ImportError:
+    SCIPY_FFT_AVAILABLE = False
+
+# Small value added to the power before taking log10 to avoid log(0)
+POWER_FLOOR = 1e-10
+
+WINDOWS = {
+    None: None,
+    'rect': None,
+    'hann': np.hanning,
+    'hamming': np.hamming,
+    'blackman': np.blackman,
+}
+
+POOLING_METHODS = ('mean', 'max')
+
+SpectrumResult = namedtuple(
+    'SpectrumResult',
+    ['spectrum_db', 'power', 'peak_bin', 'peak_freq', 'peak_power']
+)
+
+# Per-frame results of BlockAnalyzer: power is (frames, fft_size) in fftshift
+# order, the peak fields are arrays with one value per frame
+BlockResult = namedtuple('BlockResult', ['power', 'peak_bin', 'peak_freq', 'peak_power'])
+
+
+def _fft(x, axis=-1, workers=None, overwrite_x=False):
+    # Shared FFT backend: scipy.fft with worker threads when installed, else numpy.fft
+    if SCIPY_FFT_AVAILABLE:
+        return scipy_fft.fft(x, axis=axis, workers=workers, overwrite_x=overwrite_x)
+    return np.fft.fft(x, axis=axis)
+
+
+def make_window(name, size):
+    """
+    Build a window function.
+
+    Args:
+        name (str): Window name (None/'rect', 'hann', 'hamming' or 'blackman')
+        size (int): Window length
+
+    Returns:
+        numpy.ndarray: Window coefficients, or None for a rectangular window
+    """
+    if name not in WINDOWS:
+        raise ValueError(f"Unknown window: {name}")
+    window_fn = WINDOWS[name]
+    return None if window_fn is None else window_fn(size)
+
+
+class SpectrumAnalyzer:
+    """
+    Single-pass FFT analysis with cached frequency axis, window and buffers.
+
+    The arrays in the returned SpectrumResult are the analyzer's own buffers and
+    are overwritten by the next call; copy them if they must outlive it. An
+    analyzer instance is not thread safe.
+    """
+
+    def __init__(self, fft_size=1024, sample_rate=2.048e6, window=None, workers=None):
+        """
+        Args:
+            fft_size (int): Number of samples per transform
+            sample_rate (float): Sample rate in Hz
+            window (str, optional): Window name, None for rectangular
+            workers (int, optional): scipy.fft worker threads (-1 for all CPUs)
+        """
+        self.fft_size = fft_size
+        self.sample_rate = sample_rate
+        self.window_name = window
+        self.workers = workers
+        self.window = make_window(window, fft_size)
+
+        # Frequency axis in shifted order (negative to positive), relative to center
+        self.freqs = np.fft.fftshift(np.fft.fftfreq(fft_size, 1 / sample_rate))
+        # Shifted index of DC; bins from here on are the positive frequencies
+        self.dc_bin = fft_size // 2
+
+        self._windowed = np.empty(fft_size, dtype=np.complex128)
+        self._magnitude = np.empty(fft_size, dtype=np.float64)
+        self._power = np.empty(fft_size, dtype=np.float64)
+        self._spectrum_db = np.empty(fft_size, dtype=np.float64)
+
+    def _transform(self, samples):
+        if self.window is not None:
+            np.multiply(samples, self.window, out=self._windowed)
+            samples = self._windowed
+        return _fft(samples, workers=self.workers, overwrite_x=samples is self._windowed)
+
+    def analyze(self, samples):
+        """
+        Compute the spectrum and peak of one frame with a single FFT.
+
+        Args:
+            samples (numpy.ndarray): fft_size complex samples
+
+        Returns:
+            SpectrumResult: dB spectrum and linear power (both shifted so the
+            center frequency is in the middle), and the strongest
+            positive-frequency bin with its frequency (Hz, relative to center)
+            and linear power
+        """
+        if len(samples) != self.fft_size:
+            raise ValueError(f"Expected {self.fft_size} samples, got {len(samples)}")
+
+        fft = self._transform(samples)
+
+        # Power (magnitude squared), written in fftshift order
+        np.abs(fft, out=self._magnitude)
+        np.square(self._magnitude, out=self._magnitude)
+        split = self.fft_size - self.dc_bin
+        self._power[self.dc_bin:] = self._magnitude[:split]
+        self._power[:self.dc_bin] = self._magnitude[split:]
+
+        np.add(self._power, POWER_FLOOR, out=self._spectrum_db)
+        np.log10(self._spectrum_db, out=self._spectrum_db)
+        self._spectrum_db *= 10
+
+        peak_bin = self.dc_bin + int(np.argmax(self._power[self.dc_bin:]))
+        return SpectrumResult(
+            self._spectrum_db,
+            self._power,
+            peak_bin,
+            float(self.freqs[peak_bin]),
+            float(self._power[peak_bin])
+        )
+
+
+@lru_cache(maxsize=16)
+def get_analyzer(fft_size, sample_rate, window=None, workers=None):
+    """
+    Get a cached SpectrumAnalyzer for the given parameters.
+
+    Analyzers hold reusable buffers, so a cached instance must only be used from
+    one thread at a time.
+
+    Args:
+        fft_size (int): Number of samples per transform
+        sample_rate (float): Sample rate in Hz
+        window (str, optional): Window name, None for rectangular
+        workers (int, optional): scipy.fft worker threads
+
+    Returns:
+        SpectrumAnalyzer: Analyzer keyed on (fft_size, sample_rate, window, workers)
+    """
+    return SpectrumAnalyzer(fft_size, sample_rate, window, workers)
+
+
+def to_db(power):
+    """
+    Convert linear power to dB.
+
+    Args:
+        power (numpy.ndarray): Linear power
+
+    Returns:
+        numpy.ndarray: 10 * log10(power), floored to avoid log(0)
+    """
+    return 10 * np.log10(power + POWER_FLOOR)
+
+
+def reduce_bins(power, num_bins, method='mean'):
+    """
+    Pool a linear power spectrum down to fewer bins.
+
+    Pooling is done on linear power (averaging dB values would be biased).
+
+    Args:
+        power (numpy.ndarray): Linear power spectrum
+        num_bins (int): Number of output bins; must divide len(power)
+        method (str): 'mean' or 'max' pooling
+
+    Returns:
+        numpy.ndarray: Pooled spectrum of num_bins values
+    """
+    if method not in POOLING_METHODS:
+        raise ValueError(f"Unknown pooling method: {method}")
+    if num_bins <= 0 or len(power) % num_bins:
+        raise ValueError(f"{len(power)} bins cannot be pooled into {num_bins}")
+    blocks = np.reshape(power, (num_bins, -1))
+    return blocks.mean(axis=1) if method == 'mean' else blocks.max(axis=1)
+
+
+class WelchAverager:
+    """
+    Welch-averaged power spectrum over K windowed, optionally overlapping segments.
+
+    Samples are fed frame by frame; segments may span frame boundaries. Each
+    time K segments have been accumulated an averaged spectrum is produced and
+    the accumulator restarts. Power is normalized by the window's mean square so
+    the noise floor matches an unwindowed periodogram.
+    """
+
+    def __init__(self, fft_size=1024, sample_rate=2.048e6, num_segments=8,
+                 window='hann', overlap=0.5, workers=None):
+        """
+        Args:
+            fft_size (int): Segment length
+            sample_rate (float): Sample rate in Hz
+            num_segments (int): Segments (K) averaged into each PSD
+            window (str, optional): Window name, None for rectangular
+            overlap (float): Fraction of a segment shared with the next, in [0, 1)
+            workers (int, optional): scipy.fft worker threads (-1 for all CPUs)
+        """
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap must be in [0, 1)")
+        self.fft_size = fft_size
+        self.sample_rate = sample_rate
+        self.num_segments = num_segments
+        self.workers = workers
+        self.hop = max(1, int(round(fft_size * (1 - overlap))))
+        window_values = make_window(window, fft_size)
+        if window_values is None:
+            window_values = np.ones(fft_size)
+        self.window = window_values / np.sqrt(np.mean(window_values ** 2))
+        self.freqs = np.fft.fftshift(np.fft.fftfreq(fft_size, 1 / sample_rate))
+        self.dc_bin = fft_size // 2
+
+        self._pending = np.empty(0, dtype=np.complex64)
+        self._accumulator = np.zeros(fft_size, dtype=np.float64)
+        self._count = 0
+
+    def _result(self):
+        power = np.fft.fftshift(self._accumulator / self._count)
+        self._accumulator[:] = 0
+        self._count = 0
+        peak_bin = self.dc_bin + int(np.argmax(power[self.dc_bin:]))
+        return SpectrumResult(to_db(power), power, peak_bin,
+                              float(self.freqs[peak_bin]), float(power[peak_bin]))
+
+    def add(self, samples):
+        """
+        Feed a frame of samples.
+
+        Args:
+            samples (numpy.ndarray): Complex samples of any length
+
+        Returns:
+            list: SpectrumResult for every PSD completed by this frame (usually
+            zero or one)
+        """
+        buffer = np.concatenate((self._pending, samples))
+        if len(buffer) < self.fft_size:
+            self._pending = buffer
+            return []
+
+        segments = sliding_window_view(buffer, self.fft_size)[::self.hop]
+        consumed = len(segments) * self.hop
+        self._pending = buffer[consumed:]
+
+        results = []
+        while len(segments):
+            take = self.num_segments - self._count
+            batch = segments[:take]
+            segments = segments[take:]
+            spectra = _fft(batch * self.window, axis=1, workers=self.workers, overwrite_x=True)
+            self._accumulator += np.sum(spectra.real ** 2 + spectra.imag ** 2, axis=0)
+            self._count += len(batch)
+            if self._count == self.num_segments:
+                results.append(self._result())
+        return results
+
+
+def stft_frames(samples, fft_size, overlap=0.0):
+    """
+    View a block of samples as consecutive, optionally overlapping frames.
+
+    Args:
+        samples (numpy.ndarray): 1-D block of samples
+        fft_size (int): Samples per frame
+        overlap (float): Fraction of a frame shared with the next, in [0, 1)
+
+    Returns:
+        numpy.ndarray: Read-only (frames, fft_size) view of samples (no copy);
+        trailing samples that do not fill a frame are left out
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap must be in [0, 1)")
+    hop = max(1, int(round(fft_size * (1 - overlap))))
+    if len(samples) < fft_size:
+        return np.empty((0, fft_size), dtype=samples.dtype)
+    if hop == fft_size:
+        frames = len(samples) // fft_size
+        view = samples[:frames * fft_size].reshape(frames, fft_size)
+        view.flags.writeable = False
+        return view
+    return sliding_window_view(samples, fft_size)[::hop]
+
+
+class BlockAnalyzer:
+    """
+    Batched short-time FFT over a block of many frames.
+
+    The window and frequency axis are computed once. Unlike SpectrumAnalyzer the
+    returned arrays are new for every block.
+    """
+
+    def __init__(self, fft_size=1024, sample_rate=2.048e6, window=None, overlap=0.0,
+                 workers=None):
+        """
+        Args:
+            fft_size (int): Samples per frame
+            sample_rate (float): Sample rate in Hz
+            window (str, optional): Window name, None for rectangular
+            overlap (float): Fraction of a frame shared with the next, in [0, 1)
+            workers (int, optional): scipy.fft worker threads (-1 for all CPUs)
+        """
+        self.fft_size = fft_size
+        self.sample_rate = sample_rate
+        self.overlap = overlap
+        self.workers = workers
+        self.window = make_window(window, fft_size)
+        self.freqs = np.fft.fftshift(np.fft.fftfreq(fft_size, 1 / sample_rate))
+        self.dc_bin = fft_size // 2
+
+    def frames(self, samples):
+        """
+        View a block as this analyzer's frames (see stft_frames).
+
+        Args:
+            samples (numpy.ndarray): 1-D block of samples
+
+        Returns:
+            numpy.ndarray: Read-only (frames, fft_size) view
+        """
+        return stft_frames(samples, self.fft_size, self.overlap)
+
+    def analyze(self, samples):
+        """
+        Compute the power spectrum and peak of every frame of a block.
+
+        Args:
+            samples (numpy.ndarray): 1-D block of complex samples
+
+        Returns:
+            BlockResult: (frames, fft_size) power in fftshift order and, per frame,
+            the strongest positive-frequency bin with its frequency (Hz, relative to
+            center) and power
+        """
+        frames = self.frames(samples)
+        if self.window is not None:
+            frames = frames * self.window
+        spectra = _fft(frames, axis=1, workers=self.workers,
+                       overwrite_x=self.window is not None)
+        power = np.fft.fftshift(spectra.real ** 2 + spectra.imag ** 2, axes=1)
+        peak_bin = self.dc_bin + np.argmax(power[:, self.dc_bin:], axis=1)
+        peak_power = np.take_along_axis(power, peak_bin[:, np.newaxis], axis=1)[:, 0]
+        return BlockResult(power, peak_bin, self.freqs[peak_bin], peak_power)
+
+    def average(self, result):
+        """
+        Average the frames of a block into one spectrum.
+
+        Args:
+            result (BlockResult): Result of analyze()
+
+        Returns:
+            SpectrumResult: Mean power spectrum of the block and its peak, or None
+            if the block was shorter than one frame
+        """
+        if not len(result.power):
+            return None
+        power = result.power.mean(axis=0)
+        peak_bin = self.dc_bin + int(np.argmax(power[self.dc_bin:]))
+        return SpectrumResult(to_db(power), power, peak_bin, float(self.freqs[peak_bin]),
+                              float(power[peak_bin]))
@@ -0,0 +1,161 @@
+﻿#!/usr/bin/env python
+"""
+Change-driven and delta-encoded spectrum publishing.
+
+Consecutive spectra of a quiet band are nearly identical, so publishing each
+one in full mostly repeats the previous message. SpectrumDeltaEncoder decides
+per spectrum what to send, in one of two modes:
+
+    changes  send the full spectrum only when some bin moved by more than
+             tolerance_db since the last one sent; otherwise skip it
+    delta    send a full keyframe, then for each following spectrum only the
+             bins that differ from the keyframe by more than tolerance_db, as
+             (index, code) pairs with dB = keyframe + code * quantum_db
+
+Either way a full keyframe is sent at least every keyframe_interval spectra,
+so a consumer that joins late or misses a message recovers. Deltas are always
+taken against the keyframe, never chained, so a lost delta only loses that
+spectrum. A delta that would not be much smaller than the spectrum, or whose
+changes do not fit in an int8 code, is sent as a new keyframe instead.
+
+The update description is a small JSON-serializable dict that travels in the
+message data (so it works with JSON and binary message encodings alike);
+SpectrumDeltaDecoder rebuilds the full spectra from it on the consumer side.
+"""
+
+import numpy as np
+
+PUBLISH_MODES = ('full', 'changes', 'delta')
+
+
+class SpectrumDeltaEncoder:
+    """
+    Decides whether and how to publish each spectrum.
+    """
+
+    def __init__(self, mode='delta', tolerance_db=1.0, keyframe_interval=100, quantum_db=0.25,
+                 max_delta_fraction=0.25):
+        """
+        Args:
+            mode (str): 'changes' (skip unchanged spectra) or 'delta' (sparse deltas)
+            tolerance_db (float): Changes up to this many dB are not published
+            keyframe_interval (int): Maximum spectra between two full keyframes
+            quantum_db (float): dB per delta code step
+            max_delta_fraction (float): Send a keyframe instead of a delta when more
+                than this fraction of the bins changed
+        """
+        if mode not in PUBLISH_MODES[1:]:
+            raise ValueError(f"Unknown publish mode: {mode}")
+        self.mode = mode
+        self.tolerance_db = tolerance_db
+        self.keyframe_interval = keyframe_interval
+        self.quantum_db = quantum_db
+        self.max_delta_fraction = max_delta_fraction
+        self.keyframe = None
+        self.keyframe_id = 0
+        self.since_keyframe = 0
+        self.skipped = 0
+
+    def _keyframe(self, spectrum_db):
+        self.keyframe = np.array(spectrum_db, dtype=np.float64)
+        self.keyframe_id += 1
+        self.since_keyframe = 0
+        return {'kind': 'keyframe', 'keyframe': self.keyframe_id}
+
+    def encode(self, spectrum_db):
+        """
+        Describe how to publish a spectrum.
+
+        Args:
+            spectrum_db (numpy.ndarray): Spectrum in dB
+
+        Returns:
+            dict: Update description: {'kind': 'keyframe', 'keyframe': id} when the
+            full spectrum must be sent, or {'kind': 'delta', 'keyframe': id,
+            'quantum': dB, 'indices': [...], 'codes': [...]} with the changed bins;
+            None when the spectrum should not be published
+        """
+        self.since_keyframe += 1
+        if (self.keyframe is None or len(spectrum_db) != len(self.keyframe)
+                or self.since_keyframe >= self.keyframe_interval):
+            return self._keyframe(spectrum_db)
+
+        difference = spectrum_db - self.keyframe
+        changed = np.flatnonzero(np.abs(difference) > self.tolerance_db)
+        if self.mode == 'changes':
+            if len(changed):
+                return self._keyframe(spectrum_db)
+            self.skipped += 1
+            return None
+
+        if len(changed) > self.max_delta_fraction * len(spectrum_db):
+            return self._keyframe(spectrum_db)
+        codes = np.rint(difference[changed] / self.quantum_db)
+        if len(codes) and np.abs(codes).max() > 127:
+            return self._keyframe(spectrum_db)
+        return {
+            'kind': 'delta',
+            'keyframe': self.keyframe_id,
+            'quantum': self.quantum_db,
+            'indices': changed.tolist(),
+            'codes': codes.astype(np.int8).tolist(),
+        }
+
+
+class SpectrumDeltaDecoder:
+    """
+    Rebuilds full spectra from keyframes and deltas (see SpectrumDeltaEncoder).
+    """
+
+    def __init__(self):
+        self.keyframe = None
+        self.keyframe_id = None
+
+    def decode(self, update, spectrum_db=None):
+        """
+        Apply one update.
+
+        Args:
+            update (dict): Update description from the message data
+            spectrum_db (numpy.ndarray, optional): Full spectrum sent with a keyframe
+
+        Returns:
+            numpy.ndarray: The full spectrum in dB, or None for a delta whose
+            keyframe was not received
+        """
+        if update['kind'] == 'keyframe':
+            self.keyframe = np.array(spectrum_db, dtype=np.float64)
+            self.keyframe_id = update['keyframe']
+            return self.keyframe.copy()
+        if update['keyframe'] != self.keyframe_id:
+            return None
+        spectrum = self.keyframe.copy()
+        indices = np.asarray(update['indices'], dtype=np.intp)
+        spectrum[indices] += np.asarray(update['codes'], dtype=np.float64) * update['quantum']
+        return spectrum
+
+    def decode_message(self, message):
+        """
+        Rebuild the spectrum of a received sample message.
+
+        Args:
+            message (dict): A parsed JSON message, or a binary frame returned by
+                spectrum_frames.decode_spectrum_frame
+
+        Returns:
+            numpy.ndarray: The full spectrum in dB, or None when the message has no
+            spectrum or refers to a keyframe that was not received
+        """
+        if 'metadata' in message:
+            # Binary frame: the message fields are in its metadata
+            data = message['metadata'].get('data', {})
+            spectrum = message['spectrum'] if message['fft_size'] else None
+            if spectrum is not None and message['encoding'] == 'uint8':
+                spectrum = message['offset'] + spectrum * np.float32(message['scale'])
+        else:
+            data = message.get('data', {})
+            spectrum = message.get('spectrum_db')
+        update = data.get('spectrum_update')
+        if update is None:
+            return None if spectrum is None else np.asarray(spectrum, dtype=np.float64)
+        return self.decode(update, spectrum)
@@ -0,0 +1,159 @@
+﻿#!/usr/bin/env python
+"""
+Compact binary encoding of SDR spectrum messages.
+
+A frame is a fixed little-endian header, a length-prefixed JSON metadata block
+(message type, statistics, simulated flag) and the spectrum itself as float32,
+float16 or 8-bit quantized dB values:
+
+    offset  size  field
+    0       4     magic b'SDRS'
+    4       1     schema version
+    5       1     spectrum encoding (ENCODINGS)
+    6       2     reserved
+    8       4     fft_size (number of bins)
+    12      8     center_freq (Hz, float64)
+    20      8     sample_rate (Hz, float64)
+    28      8     timestamp (Unix seconds, float64)
+    36      4     scale (float32, uint8 only: dB = offset + code * scale)
+    40      4     offset (float32, uint8 only)
+    44      4     metadata length in bytes
+    48      n     metadata JSON (UTF-8), padded to a multiple of 4 bytes
+    48+n    ...   spectrum values
+
+JSON messages stay the default; binary frames are opt-in for consumers that
+read them with decode_spectrum_frame.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b'SDRS'
+SCHEMA_VERSION = 1
+CONTENT_TYPE = 'application/x-sdr-spectrum'
+
+HEADER = struct.Struct('<4sBBHIdddffI')
+
+# Spectrum encoding name -> (code, numpy dtype)
+ENCODINGS = {
+    'float32': (0, np.dtype('<f4')),
+    'float16': (1, np.dtype('<f2')),
+    'uint8': (2, np.dtype('u1')),
+}
+ENCODING_NAMES = {code: name for name, (code, _) in ENCODINGS.items()}
+
+
+def quantize_db(spectrum_db):
+    """
+    Quantize a dB spectrum to 8 bits over its own range.
+
+    Args:
+        spectrum_db (numpy.ndarray): Spectrum in dB
+
+    Returns:
+        tuple: (codes as uint8 array, scale, offset) with dB = offset + code * scale
+    """
+    low = float(np.min(spectrum_db))
+    high = float(np.max(spectrum_db))
+    scale = (high - low) / 255 if high > low else 1.0
+    codes = np.rint((spectrum_db - low) / scale)
+    return codes.astype(np.uint8), scale, low
+
+
+def encode_spectrum_frame(spectrum_db, center_freq, sample_rate, timestamp,
+                          encoding='float32', metadata=None):
+    """
+    Encode a spectrum and its metadata as a binary frame.
+
+    Args:
+        spectrum_db (numpy.ndarray): Spectrum in dB
+        center_freq (float): Center frequency in Hz
+        sample_rate (float): Sample rate in Hz
+        timestamp (float): Unix timestamp of the reading
+        encoding (str): 'float32', 'float16' or 'uint8'
+        metadata (dict, optional): JSON-serializable message fields
+
+    Returns:
+        bytes: Encoded frame
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown spectrum encoding: {encoding}")
+    code, dtype = ENCODINGS[encoding]
+
+    if spectrum_db is None:
+        spectrum_db = np.empty(0, dtype=np.float32)
+    scale, offset = 1.0, 0.0
+    if encoding == 'uint8' and len(spectrum_db):
+        payload, scale, offset = quantize_db(spectrum_db)
+    else:
+        payload = np.asarray(spectrum_db, dtype=dtype)
+
+    meta = json.dumps(metadata or {}, separators=(',', ':')).encode('utf-8')
+    meta += b' ' * (-len(meta) % 4)
+
+    header = HEADER.pack(MAGIC, SCHEMA_VERSION, code, 0, len(payload), center_freq,
+                         sample_rate, timestamp, scale, offset, len(meta))
+    return b''.join((header, meta, payload.tobytes()))
+
+
+def decode_spectrum_frame(body):
+    """
+    Decode a binary spectrum frame.
+
+    The spectrum is a read-only view into ``body`` (no copy). Use spectrum_db()
+    to get dB values regardless of encoding.
+
+    Args:
+        body (bytes): Encoded frame (bytes, bytearray or memoryview)
+
+    Returns:
+        dict: version, encoding, fft_size, center_freq, sample_rate, timestamp,
+        scale, offset, metadata and spectrum
+    """
+    if len(body) < HEADER.size:
+        raise ValueError("Frame is shorter than the header")
+    (magic, version, code, _reserved, fft_size, center_freq, sample_rate,
+     timestamp, scale, offset, meta_len) = HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError("Not an SDR spectrum frame")
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported schema version: {version}")
+    if code not in ENCODING_NAMES:
+        raise ValueError(f"Unknown spectrum encoding code: {code}")
+
+    encoding = ENCODING_NAMES[code]
+    meta_start = HEADER.size
+    metadata = json.loads(bytes(body[meta_start:meta_start + meta_len]) or b'{}')
+    spectrum = np.frombuffer(body, dtype=ENCODINGS[encoding][1], count=fft_size,
+                             offset=meta_start + meta_len)
+
+    return {
+        'version': version,
+        'encoding': encoding,
+        'fft_size': fft_size,
+        'center_freq': center_freq,
+        'sample_rate': sample_rate,
+        'timestamp': timestamp,
+        'scale': scale,
+        'offset': offset,
+        'metadata': metadata,
+        'spectrum': spectrum,
+    }
+
+
+def spectrum_db(frame):
+    """
+    Get the spectrum of a decoded frame in dB.
+
+    Args:
+        frame (dict): Frame returned by decode_spectrum_frame
+
+    Returns:
+        numpy.ndarray: The zero-copy spectrum for float encodings, or a float32
+        array of dequantized values for uint8
+    """
+    if frame['encoding'] == 'uint8':
+        return frame['offset'] + frame['spectrum'] * np.float32(frame['scale'])
+    return frame['spectrum']
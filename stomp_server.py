@@ -0,0 +1,530 @@
+﻿#!/usr/bin/env python
+"""
+Lightweight asyncio STOMP 1.2 broker, a stand-in for ActiveMQ (1.0 and 1.1
+clients are accepted too).
+
+StompServer supports CONNECT/STOMP, SEND, SUBSCRIBE, UNSUBSCRIBE, ACK, NACK,
+DISCONNECT and receipts on any frame, so sdr.py, publisher.py and consumers
+can run end-to-end offline, at rates the broker container cannot sustain.
+
+Destinations starting with /topic/ are topics: every subscriber gets a copy
+and messages sent with no subscriber are discarded. Everything else is a queue:
+messages are kept until a subscriber is available and are delivered to one
+subscriber at a time, round-robin. Subscriptions with ack mode client or
+client-individual receive at most prefetch unacknowledged messages (ActiveMQ's
+activemq.prefetchSize header); unacknowledged queue messages are redelivered
+when the subscriber disconnects. Nothing is persisted.
+
+Heart-beats are negotiated as in STOMP 1.1: CONNECTED offers to send at the
+rate the client asks for and to receive at the rate it offers, and the server
+sends an EOL whenever it has written nothing for the agreed interval. Silent
+clients are not disconnected.
+
+Use it in-process (start() runs the event loop on a background thread; the
+stomp_broker pytest fixture wraps this) or from the command line:
+
+    python stomp_server.py --port 61613
+"""
+
+import argparse
+import asyncio
+import itertools
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, deque, namedtuple
+
+Frame = namedtuple('Frame', ['command', 'headers', 'body'])
+
+VERSIONS = ('1.0', '1.1', '1.2')
+
+# Longest header line or body without content-length a client stream may send
+# (asyncio's default is 64 KiB, less than one large spectrum or tile)
+STREAM_LIMIT = 16 * 1024 * 1024
+
+_ESCAPES = {'\\\\': '\\', '\\n': '\n', '\\r': '\r', '\\c': ':'}
+
+
+def _unescape(value):
+    if '\\' not in value:
+        return value
+    out = []
+    i = 0
+    while i < len(value):
+        pair = value[i:i + 2]
+        if pair in _ESCAPES:
+            out.append(_ESCAPES[pair])
+            i += 2
+        else:
+            out.append(value[i])
+            i += 1
+    return ''.join(out)
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('\n', '\\n')
+            .replace('\r', '\\r').replace(':', '\\c'))
+
+
+def encode_frame(command, headers=None, body=b''):
+    """
+    Encode a STOMP 1.2 frame.
+
+    Args:
+        command (str): Frame command, e.g. 'MESSAGE'
+        headers (dict, optional): Frame headers (escaped as required by STOMP 1.2)
+        body (bytes or str): Frame body; a content-length header is always added
+
+    Returns:
+        bytes: Encoded frame, including the terminating NUL
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    headers = dict(headers or {})
+    headers['content-length'] = str(len(body))
+    lines = [command] + [f"{_escape(key)}:{_escape(value)}" for key, value in headers.items()]
+    return ('\n'.join(lines) + '\n\n').encode('utf-8') + body + b'\0'
+
+
+async def read_frame(reader):
+    """
+    Read the next frame from a stream, skipping heart-beat EOLs.
+
+    Args:
+        reader (asyncio.StreamReader): Client stream
+
+    Returns:
+        Frame: The frame, or None when the client closed the connection or sent
+        a line or body without content-length longer than the reader's limit
+    """
+    try:
+        line = b''
+        while not line.strip():
+            line = await reader.readuntil(b'\n')
+        command = line.strip(b'\r\n').decode('utf-8')
+
+        headers = {}
+        while True:
+            line = (await reader.readuntil(b'\n')).rstrip(b'\n').rstrip(b'\r')
+            if not line:
+                break
+            key, _, value = line.decode('utf-8').partition(':')
+            # Repeated headers: only the first occurrence counts
+            headers.setdefault(_unescape(key), _unescape(value))
+
+        if 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+            await reader.readexactly(1)
+        else:
+            body = (await reader.readuntil(b'\0'))[:-1]
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        return None
+    return Frame(command, headers, body)
+
+
+class _Subscription:
+    """One SUBSCRIBE of a client session."""
+
+    def __init__(self, session, sub_id, destination, ack, prefetch):
+        self.session = session
+        self.id = sub_id
+        self.destination = destination
+        self.ack = ack
+        self.prefetch = prefetch
+        self.unacked = OrderedDict()
+        # Topic messages waiting for prefetch space (queues share the destination backlog)
+        self.pending = deque()
+
+    def can_deliver(self):
+        return self.ack == 'auto' or len(self.unacked) < self.prefetch
+
+
+class _Session:
+    """State of one client connection."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.subscriptions = {}
+        self.last_write = time.monotonic()
+        self.heartbeat_task = None
+
+
+def is_topic(destination):
+    """Return True if destination is a topic rather than a queue."""
+    return destination.startswith('/topic/')
+
+
+class StompServer:
+    """
+    STOMP 1.2 broker with queues and topics.
+
+    All broker state lives on the event loop. The counters (frames_received,
+    messages_received, bytes_received, messages_delivered) can be read from
+    other threads.
+
+    Usage:
+        server = StompServer()
+        host, port = server.start()
+        ...
+        server.stop()
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, login=None, passcode=None,
+                 default_prefetch=1000):
+        """
+        Args:
+            host (str): Interface to listen on
+            port (int): TCP port, 0 picks a free port
+            login (str, optional): Required login; any credentials are accepted if None
+            passcode (str, optional): Required passcode
+            default_prefetch (int): Unacknowledged messages per client-ack subscription
+                when the client does not set activemq.prefetchSize
+        """
+        self.host = host
+        self.port = port
+        self.login = login
+        self.passcode = passcode
+        self.default_prefetch = default_prefetch
+
+        self.frames_received = Counter()
+        self.messages_received = Counter()
+        self.bytes_received = Counter()
+        self.messages_delivered = Counter()
+        self.connections = 0
+
+        self._queues = {}
+        self._subscribers = {}
+        self._round_robin = Counter()
+        self._message_ids = itertools.count(1)
+        self._sessions = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def address(self):
+        """(host, port) to connect to, once started."""
+        return self.host, self.port
+
+    # Delivery
+
+    def _write(self, session, command, headers=None, body=b''):
+        session.writer.write(encode_frame(command, headers, body))
+        session.last_write = time.monotonic()
+
+    async def _send_heartbeats(self, session, interval):
+        # An EOL whenever nothing else was written for interval seconds
+        while not session.writer.is_closing():
+            delay = session.last_write + interval - time.monotonic()
+            if delay <= 0:
+                session.writer.write(b'\n')
+                session.last_write = time.monotonic()
+                delay = interval
+            await asyncio.sleep(delay)
+
+    def _deliver(self, sub, message):
+        message_id, headers, body = message
+        headers = dict(headers, subscription=sub.id)
+        if sub.ack != 'auto':
+            headers['ack'] = message_id
+            sub.unacked[message_id] = message
+        self.messages_delivered[sub.destination] += 1
+        self._write(sub.session, 'MESSAGE', headers, body)
+
+    def _dispatch(self, destination):
+        subscribers = self._subscribers.get(destination, [])
+        if is_topic(destination):
+            for sub in subscribers:
+                while sub.pending and sub.can_deliver():
+                    self._deliver(sub, sub.pending.popleft())
+            return
+
+        backlog = self._queues.get(destination)
+        while backlog and subscribers:
+            # Next subscriber with prefetch space, round-robin
+            start = self._round_robin[destination]
+            for offset in range(len(subscribers)):
+                sub = subscribers[(start + offset) % len(subscribers)]
+                if sub.can_deliver():
+                    self._round_robin[destination] = start + offset + 1
+                    self._deliver(sub, backlog.popleft())
+                    break
+            else:
+                return
+
+    def _publish(self, destination, headers, body):
+        message_id = f"ID:stomp_server-{next(self._message_ids)}"
+        message_headers = {key: value for key, value in headers.items()
+                           if key not in ('receipt', 'transaction', 'content-length')}
+        message_headers['message-id'] = message_id
+        message = (message_id, message_headers, body)
+        if is_topic(destination):
+            for sub in self._subscribers.get(destination, []):
+                sub.pending.append(message)
+        else:
+            self._queues.setdefault(destination, deque()).append(message)
+        self._dispatch(destination)
+
+    def _release(self, sub, messages):
+        # Return unacknowledged messages for redelivery, oldest first
+        if is_topic(sub.destination):
+            if sub in self._subscribers.get(sub.destination, []):
+                sub.pending.extendleft(reversed(messages))
+        else:
+            self._queues.setdefault(sub.destination, deque()).extendleft(reversed(messages))
+
+    def _unsubscribe(self, sub):
+        subscribers = self._subscribers.get(sub.destination, [])
+        if sub in subscribers:
+            subscribers.remove(sub)
+        self._release(sub, list(sub.unacked.values()))
+        sub.unacked.clear()
+        self._dispatch(sub.destination)
+
+    def _acknowledge(self, session, ack_id, requeue):
+        for sub in session.subscriptions.values():
+            if ack_id not in sub.unacked:
+                continue
+            if sub.ack == 'client':
+                # Cumulative: everything up to and including ack_id
+                acked = []
+                while True:
+                    message_id, message = sub.unacked.popitem(last=False)
+                    acked.append(message)
+                    if message_id == ack_id:
+                        break
+            else:
+                acked = [sub.unacked.pop(ack_id)]
+            if requeue:
+                self._release(sub, acked)
+            self._dispatch(sub.destination)
+            return True
+        return False
+
+    # Frame handling
+
+    def _error(self, session, message, frame=None):
+        headers = {'message': message}
+        if frame is not None and 'receipt' in frame.headers:
+            headers['receipt-id'] = frame.headers['receipt']
+        self._write(session, 'ERROR', headers)
+        return False
+
+    def _handle_frame(self, session, frame):
+        command = frame.command
+        headers = frame.headers
+        self.frames_received[command] += 1
+
+        if command in ('CONNECT', 'STOMP'):
+            if self.login is not None and (headers.get('login') != self.login
+                                           or headers.get('passcode') != self.passcode):
+                return self._error(session, 'Authentication failed', frame)
+            accepted = headers.get('accept-version', '1.0').split(',')
+            version = max((v for v in accepted if v in VERSIONS), default='1.0')
+            try:
+                # Client: can send every cx ms, wants to receive every cy ms
+                cx, cy = (int(value) for value in headers.get('heart-beat', '0,0').split(','))
+            except ValueError:
+                return self._error(session, 'Invalid heart-beat header', frame)
+            if cx < 0 or cy < 0:
+                return self._error(session, 'Invalid heart-beat header', frame)
+            self._write(session, 'CONNECTED', {'version': version, 'heart-beat': f"{cy},{cx}",
+                                               'server': 'stomp_server'})
+            if cy and session.heartbeat_task is None:
+                session.heartbeat_task = asyncio.get_running_loop().create_task(
+                    self._send_heartbeats(session, cy / 1000))
+            return True
+
+        if command == 'SEND':
+            destination = headers.get('destination')
+            if not destination:
+                return self._error(session, 'SEND requires a destination header', frame)
+            self.messages_received[destination] += 1
+            self.bytes_received[destination] += len(frame.body)
+            self._publish(destination, headers, frame.body)
+        elif command == 'SUBSCRIBE':
+            destination = headers.get('destination')
+            if not destination or 'id' not in headers:
+                return self._error(session, 'SUBSCRIBE requires destination and id', frame)
+            ack = headers.get('ack', 'auto')
+            if ack not in ('auto', 'client', 'client-individual'):
+                return self._error(session, f"Unknown ack mode: {ack}", frame)
+            prefetch = int(headers.get('activemq.prefetchSize', self.default_prefetch))
+            sub = _Subscription(session, headers['id'], destination, ack, max(prefetch, 1))
+            session.subscriptions[sub.id] = sub
+            self._subscribers.setdefault(destination, []).append(sub)
+            self._dispatch(destination)
+        elif command == 'UNSUBSCRIBE':
+            sub = session.subscriptions.pop(headers.get('id'), None)
+            if sub is None:
+                return self._error(session, 'Unknown subscription id', frame)
+            self._unsubscribe(sub)
+        elif command in ('ACK', 'NACK'):
+            # STOMP 1.2 acknowledges by 'id', 1.0 and 1.1 by 'message-id'
+            ack_id = headers.get('id') or headers.get('message-id')
+            if not self._acknowledge(session, ack_id, command == 'NACK'):
+                return self._error(session, f"Unknown {command} id", frame)
+        elif command != 'DISCONNECT':
+            return self._error(session, f"Unsupported command: {command}", frame)
+
+        if 'receipt' in headers:
+            self._write(session, 'RECEIPT', {'receipt-id': headers['receipt']})
+        return command != 'DISCONNECT'
+
+    async def _handle_client(self, reader, writer):
+        session = _Session(writer)
+        self._sessions.add(session)
+        self.connections += 1
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None or not self._handle_frame(session, frame):
+                    break
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if session.heartbeat_task is not None:
+                session.heartbeat_task.cancel()
+            self._sessions.discard(session)
+            for sub in session.subscriptions.values():
+                self._unsubscribe(sub)
+            writer.close()
+
+    # Lifecycle
+
+    async def start_serving(self):
+        """Start listening on the running event loop (for use from asyncio code)."""
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port,
+                                                  limit=STREAM_LIMIT)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stop listening and disconnect all clients (for use from asyncio code)."""
+        self._server.close()
+        # Closing the client transports ends each handler at its next read
+        for session in list(self._sessions):
+            session.writer.close()
+        await self._server.wait_closed()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self.start_serving())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self.close())
+        tasks = asyncio.all_tasks(self._loop)
+        self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.close()
+
+    def start(self):
+        """
+        Start listening on a background thread.
+
+        Returns:
+            tuple: (host, port) to connect to
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="stomp-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self.address
+
+    def stop(self):
+        """Stop the server and its thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+            self._loop = None
+
+    def stats(self):
+        """
+        Return broker counters.
+
+        Returns:
+            dict: Connections, frames by command, and messages received,
+            delivered and waiting per destination
+        """
+        return {
+            'connections': self.connections,
+            'frames_received': dict(self.frames_received),
+            'messages_received': dict(self.messages_received),
+            'bytes_received': dict(self.bytes_received),
+            'messages_delivered': dict(self.messages_delivered),
+            'queued': {name: len(backlog) for name, backlog in list(self._queues.items())},
+        }
+
+
+def print_server_stats(stats):
+    """
+    Print broker counters.
+
+    Args:
+        stats (dict): Counters returned by StompServer.stats()
+    """
+    print("\n=== STOMP Server Status ===")
+    print(f"Connections: {stats['connections']}")
+    for destination, count in sorted(stats['messages_received'].items()):
+        print(f"{destination}: received {count}, "
+              f"delivered {stats['messages_delivered'].get(destination, 0)}, "
+              f"queued {stats['queued'].get(destination, 0)}")
+
+
+def parse_args(argv=None):
+    """
+    Parse command line arguments.
+
+    Args:
+        argv (list, optional): Arguments to parse, defaults to none
+
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Lightweight STOMP 1.2 broker for testing")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on")
+    parser.add_argument('--port', type=int, default=61613, help="TCP port")
+    parser.add_argument('--login', default=None, help="Required login (default: accept any)")
+    parser.add_argument('--passcode', default=None, help="Required passcode")
+    parser.add_argument('--stats-interval', type=float, default=10.0, metavar='SECONDS',
+                        help="Seconds between status reports (0 disables)")
+    return parser.parse_args(argv or [])
+
+
+async def serve(server, stats_interval=10.0):
+    """
+    Run a broker until cancelled, printing its counters periodically.
+
+    Args:
+        server (StompServer): Broker to run
+        stats_interval (float): Seconds between status reports, 0 disables
+    """
+    await server.start_serving()
+    print(f"STOMP server listening on {server.host}:{server.port}")
+    try:
+        while True:
+            await asyncio.sleep(stats_interval or 3600)
+            if stats_interval:
+                print_server_stats(server.stats())
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    """
+    Run the broker from the command line until interrupted.
+
+    Args:
+        argv (list, optional): Command line arguments
+    """
+    args = parse_args(argv)
+    server = StompServer(args.host, args.port, args.login, args.passcode)
+    try:
+        asyncio.run(serve(server, args.stats_interval))
+    except KeyboardInterrupt:
+        print("\nSTOMP server stopped")
+        print_server_stats(server.stats())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
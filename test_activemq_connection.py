@@ -1,36 +1,267 @@
-﻿import stomp
-import time
-import json
+﻿"""
+Check the ActiveMQ connection, or probe the broker's round-trip performance.
+
+Without arguments a single test message is sent to the SDR destination. With
+--probe the script subscribes to a temporary destination and, for each
+payload size of a sweep (100 B to 1 MB by default), measures:
+
+    - round-trip latency: send (with a receipt) until the message comes back
+      on the subscription, and send until the broker's receipt arrives
+    - sustained throughput: a burst of messages sent back to back, each with
+      a receipt, until all of them have been received
+    - connect time, over several fresh connections
+
+and prints a summary table, or JSON with --json. Use it to verify broker
+tuning before putting SDR load on a host.
+
+Usage:
+    python test_activemq_connection.py [--probe] [--sizes BYTES ...] [--samples N]
+                                       [--burst-bytes BYTES] [--burst-messages N] [--json]
+"""
+import argparse
 import os
-from dotenv import load_dotenv
+import sys
+import threading
+import uuid
 
-# Load environment variables from .env file (if present)
-load_dotenv()
+import stomp
+import time
+import json
 
-# Get ActiveMQ connection settings from environment variables
-BROKER = [(
-    os.getenv('ACTIVEMQ_HOST', 'localhost'),
-    int(os.getenv('ACTIVEMQ_PORT', '61613'))
-)]
-USER = os.getenv('ACTIVEMQ_USER', 'admin')
-PASS = os.getenv('ACTIVEMQ_PASS', 'admin')
-DEST = os.getenv('ACTIVEMQ_SDR_DEST', '/queue/sdr')
+import config
+import creds
+from load_generator import latency_percentiles
 
 # ActiveMQ listener class
 class MyListener(stomp.ConnectionListener):
-    def on_error(self, headers, message):
-        print('ActiveMQ error:', message)
-    def on_connected(self, headers):
+    def on_error(self, frame):
+        print('ActiveMQ error:', frame.body)
+    def on_connected(self, frame):
         print("Connected to ActiveMQ")
 
-def main():
-    """Test connection to ActiveMQ and send a test message."""
+# Payload sizes of the probe sweep, 100 B to 1 MB
+DEFAULT_SIZES = (100, 1000, 10000, 100000, 1000000)
+
+class ProbeListener(stomp.ConnectionListener):
+    """Records when probe messages and receipts arrive."""
+
+    def __init__(self):
+        self.messages = {}
+        self.receipts = {}
+        self.condition = threading.Condition()
+
+    def on_message(self, frame):
+        with self.condition:
+            self.messages[frame.headers.get('probe-id')] = time.perf_counter()
+            self.condition.notify_all()
+
+    def on_receipt(self, frame):
+        with self.condition:
+            self.receipts[frame.headers.get('receipt-id')] = time.perf_counter()
+            self.condition.notify_all()
+
+    def on_error(self, frame):
+        print('ActiveMQ error:', frame.body)
+
+    def wait(self, ids, timeout):
+        """
+        Wait until every id has been received as a message and as a receipt.
+
+        Args:
+            ids (list): Probe ids
+            timeout (float): Seconds to wait at most
+
+        Returns:
+            bool: True if everything arrived in time
+        """
+        deadline = time.perf_counter() + timeout
+        with self.condition:
+            while not all(i in self.messages and i in self.receipts for i in ids):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+def probe_connect_time(samples=5):
+    """
+    Measure how long connecting to the broker takes.
+
+    Args:
+        samples (int): Number of fresh connections
+
+    Returns:
+        dict: Latency percentiles in seconds (see load_generator.latency_percentiles)
+    """
+    times = []
+    for _ in range(samples):
+        conn = stomp.Connection(host_and_ports=creds.BROKER, heartbeats=(0, 0))
+        start = time.perf_counter()
+        conn.connect(login=creds.USER, passcode=creds.PASS, wait=True)
+        times.append(time.perf_counter() - start)
+        conn.disconnect()
+    return latency_percentiles(times)
+
+def probe_size(conn, listener, destination, size, samples=50, burst_bytes=20000000,
+               burst_messages=10000, timeout=30.0):
+    """
+    Measure round-trip latency and throughput for one payload size.
+
+    Args:
+        conn (stomp.Connection): Connection subscribed to destination
+        listener (ProbeListener): Listener of conn
+        destination (str): Probe destination
+        size (int): Payload size in bytes
+        samples (int): Round trips measured one at a time
+        burst_bytes (int): Bytes sent back to back for the throughput measurement
+        burst_messages (int): Maximum messages of the burst (at least 10 are sent)
+        timeout (float): Seconds to wait for one round trip or for the whole burst
+
+    Returns:
+        dict: size, rtt and receipt latency percentiles (seconds), burst message
+        count, messages/s, MB/s and lost (messages not back within the timeout)
+    """
+    body = os.urandom(size)
+    rtts = []
+    receipts = []
+    lost = 0
+
+    def send(probe_id):
+        conn.send(destination=destination, body=body,
+                  headers={'probe-id': probe_id, 'receipt': probe_id,
+                           'content-type': 'application/octet-stream'})
+
+    for _ in range(samples):
+        probe_id = uuid.uuid4().hex
+        start = time.perf_counter()
+        send(probe_id)
+        if not listener.wait([probe_id], timeout):
+            lost += 1
+            continue
+        rtts.append(listener.messages[probe_id] - start)
+        receipts.append(listener.receipts[probe_id] - start)
+
+    count = max(10, min(burst_bytes // size, burst_messages))
+    ids = [uuid.uuid4().hex for _ in range(count)]
+    start = time.perf_counter()
+    for probe_id in ids:
+        send(probe_id)
+    if not listener.wait(ids, timeout):
+        lost += sum(1 for i in ids if i not in listener.messages)
+    elapsed = time.perf_counter() - start
+    received = sum(1 for i in ids if i in listener.messages)
+
+    return {
+        'size': size,
+        'rtt': latency_percentiles(rtts),
+        'receipt': latency_percentiles(receipts),
+        'burst': count,
+        'messages_per_second': received / elapsed,
+        'mb_per_second': received * size / elapsed / 1e6,
+        'lost': lost,
+    }
+
+def run_probe(sizes=DEFAULT_SIZES, samples=50, burst_bytes=20000000, burst_messages=10000,
+              connect_samples=5, timeout=30.0):
+    """
+    Probe the broker across payload sizes on a temporary destination.
+
+    Args:
+        sizes (tuple): Payload sizes in bytes
+        samples (int): Round trips measured per size
+        burst_bytes (int): Bytes per throughput burst
+        burst_messages (int): Maximum messages per throughput burst
+        connect_samples (int): Fresh connections timed
+        timeout (float): Seconds to wait for a round trip or a burst
+
+    Returns:
+        dict: broker, connect time percentiles and one probe_size result per size
+    """
+    connect = probe_connect_time(connect_samples)
+
+    listener = ProbeListener()
+    # Bodies stay bytes: decoding megabyte payloads would be measured as broker time
+    conn = stomp.Connection(host_and_ports=creds.BROKER, heartbeats=(0, 0), auto_decode=False)
+    conn.set_listener('probe', listener)
+    conn.connect(login=creds.USER, passcode=creds.PASS, wait=True)
+    destination = f"/temp-queue/probe-{uuid.uuid4().hex[:12]}"
+    try:
+        conn.subscribe(destination, 'probe', ack='auto')
+        results = [probe_size(conn, listener, destination, size, samples, burst_bytes,
+                              burst_messages, timeout)
+                   for size in sizes]
+    finally:
+        conn.disconnect()
+    return {'broker': [f"{host}:{port}" for host, port in creds.BROKER], 'connect': connect,
+            'sizes': results}
+
+def _format_size(size):
+    for unit, scale in (('MB', 1000000), ('kB', 1000)):
+        if size >= scale:
+            return f"{size / scale:g} {unit}"
+    return f"{size} B"
+
+def print_probe_table(report):
+    """
+    Print probe results as a table.
+
+    Args:
+        report (dict): Result of run_probe
+    """
+    connect = report['connect']
+    print(f"\n=== Broker Probe: {', '.join(report['broker'])} ===")
+    print(f"Connect time p50/max: {connect['p50'] * 1e3:.2f}/{connect['max'] * 1e3:.2f} ms")
+    print(f"{'Size':>8}  {'RTT p50':>9}  {'p90':>9}  {'p99':>9}  {'Receipt p50':>11}  "
+          f"{'msg/s':>9}  {'MB/s':>8}  {'Lost':>4}")
+    for result in report['sizes']:
+        rtt = result['rtt']
+        print(f"{_format_size(result['size']):>8}  {rtt['p50'] * 1e3:>6.2f} ms  "
+              f"{rtt['p90'] * 1e3:>6.2f} ms  {rtt['p99'] * 1e3:>6.2f} ms  "
+              f"{result['receipt']['p50'] * 1e3:>8.2f} ms  "
+              f"{result['messages_per_second']:>9.1f}  {result['mb_per_second']:>8.2f}  "
+              f"{result['lost']:>4}")
+
+def parse_args(argv=None):
+    """Parse command line arguments (none by default)."""
+    parser = argparse.ArgumentParser(description="Check or probe the ActiveMQ connection")
+    parser.add_argument('--probe', action='store_true',
+                        help="Measure round-trip latency and throughput across payload sizes")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        metavar='BYTES', help="Payload sizes of the probe")
+    parser.add_argument('--samples', type=int, default=50,
+                        help="Round trips measured per payload size")
+    parser.add_argument('--burst-bytes', type=int, default=20000000, metavar='BYTES',
+                        help="Bytes sent back to back per size for the throughput measurement")
+    parser.add_argument('--burst-messages', type=int, default=10000,
+                        help="Maximum messages sent back to back per size")
+    parser.add_argument('--connect-samples', type=int, default=5,
+                        help="Fresh connections timed for the connect time")
+    parser.add_argument('--timeout', type=float, default=30.0, metavar='SECONDS',
+                        help="Maximum wait for a round trip or a throughput burst")
+    parser.add_argument('--json', action='store_true',
+                        help="Print the probe results as JSON instead of a table")
+    config.add_arguments(parser, ('broker', 'sdr_dest'))
+    return parser.parse_args(argv or [])
+
+def main(argv=None):
+    """Test connection to ActiveMQ and send a test message, or probe the broker."""
+    args = parse_args(argv)
+    config.configure_from_args(args)
+    if args.probe:
+        report = run_probe(args.sizes, args.samples, args.burst_bytes, args.burst_messages,
+                           args.connect_samples, args.timeout)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_probe_table(report)
+        return report
+
     try:
         # Setup ActiveMQ connection
-        print(f"Connecting to ActiveMQ at {BROKER}...")
-        conn = stomp.Connection(host_and_ports=BROKER, heartbeats=(0, 0))
+        print(f"Connecting to ActiveMQ at {creds.BROKER}...")
+        conn = stomp.Connection(host_and_ports=creds.BROKER, heartbeats=(0, 0))
         conn.set_listener('', MyListener())
-        conn.connect(login=USER, passcode=PASS, wait=True)
+        conn.connect(login=creds.USER, passcode=creds.PASS, wait=True)
         
         # Send a test message
         test_message = {
@@ -38,8 +269,8 @@ def main():
             'message': 'Test message from local machine',
             'test': True
         }
-        print(f"Sending test message to {DEST}...")
-        conn.send(destination=DEST, body=json.dumps(test_message))
+        print(f"Sending test message to {creds.SDR_DEST}...")
+        conn.send(destination=creds.SDR_DEST, body=json.dumps(test_message))
         print("Test message sent successfully!")
         
         # Wait a moment before disconnecting
@@ -56,4 +287,4 @@ def main():
         return False
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(sys.argv[1:])
\ No newline at end of file
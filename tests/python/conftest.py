@@ -3,6 +3,8 @@ import os
 import pytest
 from unittest.mock import MagicMock
 
+from stomp_server import StompServer
+
 @pytest.fixture
 def mock_env():
     """Set up test environment variables."""
@@ -31,4 +33,12 @@ def mock_datetime(mocker):
     """Mock the datetime module."""
     mock_dt = mocker.patch('datetime.datetime')
     mock_dt.utcnow.return_value.isoformat.return_value = '2023-01-01T12:00:00'
-    return mock_dt
\ No newline at end of file
+    return mock_dt
+
+@pytest.fixture
+def stomp_broker():
+    """Run an in-process STOMP broker for the test; connect to stomp_broker.address."""
+    server = StompServer()
+    server.start()
+    yield server
+    server.stop()
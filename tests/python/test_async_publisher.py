@@ -0,0 +1,166 @@
+﻿# tests/python/test_async_publisher.py
+import threading
+import pytest
+from unittest.mock import MagicMock
+
+from async_publisher import (AsyncPublisher, pack_batch, unpack_batch, BATCH_HEADER,
+                             BATCH_TYPE_HEADER, QUEUED, TEXT_BATCH_CONTENT_TYPE)
+from connection import BUFFERED
+
+@pytest.fixture
+def blocked_conn():
+    """Create a mock connection whose send blocks until released."""
+    conn = MagicMock()
+    release = threading.Event()
+    started = threading.Event()
+
+    def send(**kwargs):
+        started.set()
+        release.wait(5)
+
+    conn.send.side_effect = send
+    conn.release = release
+    conn.started = started
+    return conn
+
+def test_sends_in_background():
+    """Test that queued messages are sent with their destination and headers."""
+    conn = MagicMock()
+    publisher = AsyncPublisher(conn)
+
+    assert publisher.send('/queue/sdr', 'hello', headers={'content-type': 'text/plain'})
+    publisher.close()
+
+    conn.send.assert_called_once_with(
+        destination='/queue/sdr', body='hello', headers={'content-type': 'text/plain'}
+    )
+    stats = publisher.stats()
+    assert stats['messages_sent'] == 1
+    assert stats['queue_depth'] == 0
+
+def test_counts_utf8_bytes():
+    """Test that bytes_sent counts the UTF-8 encoded size of text bodies."""
+    conn = MagicMock()
+    publisher = AsyncPublisher(conn)
+
+    publisher.send('/queue/sdr', '{"unit": "\u00b5s"}')
+    publisher.close()
+
+    body = conn.send.call_args.kwargs['body']
+    assert isinstance(body, str)  # Text is passed on unchanged
+    assert publisher.bytes_sent == len(body.encode('utf-8')) == len(body) + 1
+
+def test_counts_buffered_messages_separately():
+    """Test that messages a ConnectionManager buffers during an outage are not counted as sent."""
+    conn = MagicMock()
+    conn.send.return_value = BUFFERED
+    publisher = AsyncPublisher(conn)
+
+    publisher.send('/queue/sdr', 'hello')
+    publisher.close()
+
+    stats = publisher.stats()
+    assert stats['messages_buffered'] == 1
+    assert stats['messages_sent'] == stats['bytes_sent'] == 0
+
+def test_batches_messages_into_one_frame():
+    """Test that messages for the same destination are packed into one frame."""
+    conn = MagicMock()
+    publisher = AsyncPublisher(conn, batch_size=3, batch_interval=1.0)
+
+    for i in range(3):
+        publisher.send('/queue/sdr', f'{{"n": {i}}}', headers={'content-type': 'application/json'})
+    publisher.close()
+
+    conn.send.assert_called_once()
+    kwargs = conn.send.call_args.kwargs
+    assert kwargs['headers'][BATCH_HEADER] == '3'
+    assert kwargs['headers']['content-type'] == TEXT_BATCH_CONTENT_TYPE
+    assert kwargs['headers'][BATCH_TYPE_HEADER] == 'application/json'
+    assert unpack_batch(kwargs['body'], kwargs['headers']) == ['{"n": 0}', '{"n": 1}', '{"n": 2}']
+    assert publisher.bytes_sent == len(kwargs['body'])
+
+def test_text_batch_round_trip():
+    """Test that text bodies containing newlines survive packing and unpacking."""
+    bodies = ['{\n  "n": 1\n}', '', 'line\nbreak \u00b5s']
+    headers = {BATCH_HEADER: '3', 'content-type': TEXT_BATCH_CONTENT_TYPE}
+
+    assert unpack_batch(pack_batch(bodies), headers) == bodies
+
+def test_messages_with_different_headers_are_not_batched():
+    """Test that every message keeps its own headers when batching is enabled."""
+    conn = MagicMock()
+    publisher = AsyncPublisher(conn, batch_size=4, batch_interval=1.0)
+
+    for channel in 'aabc':
+        publisher.send('/queue/sdr', channel, headers={'channel': channel})
+    publisher.close()
+
+    frames = [(call.kwargs['headers']['channel'], call.kwargs['headers'].get(BATCH_HEADER))
+              for call in conn.send.call_args_list]
+    assert frames == [('a', '2'), ('b', None), ('c', None)]
+
+def test_drop_newest_policy(blocked_conn):
+    """Test that drop-newest rejects messages while the queue is full."""
+    publisher = AsyncPublisher(blocked_conn, max_queue=2, policy='drop-newest')
+    publisher.send('/queue/sdr', 'in-flight')
+    assert blocked_conn.started.wait(5)
+
+    results = [publisher.send('/queue/sdr', str(i)) for i in range(4)]
+    blocked_conn.release.set()
+    publisher.close()
+
+    assert results == [QUEUED, QUEUED, False, False]
+    assert publisher.stats()['dropped'] == 2
+    bodies = [call.kwargs['body'] for call in blocked_conn.send.call_args_list]
+    assert bodies == ['in-flight', '0', '1']
+
+def test_drop_oldest_policy(blocked_conn):
+    """Test that drop-oldest discards the oldest queued message."""
+    publisher = AsyncPublisher(blocked_conn, max_queue=2, policy='drop-oldest')
+    publisher.send('/queue/sdr', 'in-flight')
+    assert blocked_conn.started.wait(5)
+
+    for i in range(4):
+        assert publisher.send('/queue/sdr', str(i))
+    blocked_conn.release.set()
+    publisher.close()
+
+    bodies = [call.kwargs['body'] for call in blocked_conn.send.call_args_list]
+    assert bodies == ['in-flight', '2', '3']
+    assert publisher.stats()['dropped'] == 2
+
+def test_block_policy_times_out(blocked_conn):
+    """Test that the block policy gives up after its timeout."""
+    publisher = AsyncPublisher(blocked_conn, max_queue=1, policy='block', block_timeout=0.05)
+    publisher.send('/queue/sdr', 'in-flight')
+    assert blocked_conn.started.wait(5)
+
+    assert publisher.send('/queue/sdr', 'queued')
+    assert not publisher.send('/queue/sdr', 'blocked')
+    blocked_conn.release.set()
+    publisher.close()
+
+    assert publisher.stats()['dropped'] == 1
+
+def test_send_failures_are_counted():
+    """Test that failed sends are counted and do not stop the sender."""
+    conn = MagicMock()
+    conn.send.side_effect = [Exception("broker down"), None]
+    publisher = AsyncPublisher(conn)
+
+    publisher.send('/queue/sdr', 'a')
+    publisher.send('/queue/sdr', 'b')
+    publisher.close()
+
+    stats = publisher.stats()
+    assert stats['send_failures'] == 1
+    assert stats['messages_sent'] == 1
+
+def test_binary_batch_round_trip():
+    """Test that binary bodies survive packing and unpacking."""
+    bodies = [b'\x00\x01', b'', b'abc']
+
+    packed = pack_batch(bodies)
+
+    assert [bytes(b) for b in unpack_batch(packed, {BATCH_HEADER: '3'})] == bodies
@@ -0,0 +1,56 @@
+﻿# tests/python/test_benchmark.py
+import json
+import stomp
+
+import benchmark
+from stomp_server import StompServer
+
+def test_stomp_server_counts_sent_messages():
+    """Test that the STOMP stand-in accepts a stomp.Connection and acknowledges receipts."""
+    server = StompServer()
+    conn = stomp.Connection([server.start()])
+    try:
+        conn.connect('user', 'pass', wait=True)
+        for i in range(5):
+            conn.send('/queue/test', f"message {i}")
+        benchmark._flush(conn)
+        conn.disconnect()
+    finally:
+        server.stop()
+
+    assert server.messages_received['/queue/test'] == 5
+    assert server.bytes_received['/queue/test'] == 5 * len("message 0")
+
+def test_run_benchmarks_reports_every_stage():
+    """Test that each stage and frame size produces a JSON-serializable result record."""
+    results = benchmark.run_benchmarks(sizes=[256, 1024], min_time=0, min_iterations=3)
+
+    assert [(r['stage'], r['frame_size']) for r in results] == \
+        [(stage, size) for size in (256, 1024) for stage in benchmark.STAGES]
+    for result in results:
+        assert result['iterations'] >= 3
+        assert result['p50_us'] <= result['p99_us'] <= result['max_us']
+    assert results[-1]['message_bytes'] > 0
+    json.dumps(results)
+
+def test_compare_flags_regressions():
+    """Test that a throughput drop beyond the threshold is flagged."""
+    baseline = [{'stage': 'compute_fft', 'frame_size': 1024, 'frames_per_s': 1000.0},
+                {'stage': 'send', 'frame_size': 1024, 'frames_per_s': 1000.0}]
+    results = [{'stage': 'compute_fft', 'frame_size': 1024, 'frames_per_s': 950.0},
+               {'stage': 'send', 'frame_size': 1024, 'frames_per_s': 500.0},
+               {'stage': 'send', 'frame_size': 4096, 'frames_per_s': 100.0}]
+
+    comparison = benchmark.compare_results(results, baseline, threshold=0.1)
+
+    assert comparison == [('compute_fft', 1024, 0.95, False), ('send', 1024, 0.5, True)]
+
+def test_import_times_list_heavy_dependencies():
+    """Test that import times are measured and only numpy is imported eagerly by sdr.py."""
+    import_times = benchmark.measure_import_times(['config', 'sdr'], repeats=1)
+
+    assert [r['module'] for r in import_times] == ['config', 'sdr']
+    assert all(r['import_ms'] > 0 for r in import_times)
+    assert import_times[0]['loaded'] == []
+    assert import_times[1]['loaded'] == ['numpy']
+    json.dumps(import_times)
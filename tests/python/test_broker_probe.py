@@ -0,0 +1,47 @@
+﻿# tests/python/test_broker_probe.py
+import json
+
+import stomp
+
+import test_activemq_connection as probe
+
+def test_probe_measures_each_size(stomp_broker, mocker):
+    """Test that the probe reports latency and throughput for every payload size."""
+    mocker.patch.object(probe.creds, 'BROKER', [stomp_broker.address])
+
+    report = probe.run_probe(sizes=(100, 100000), samples=5, burst_bytes=200000,
+                             connect_samples=2, timeout=5)
+
+    assert [result['size'] for result in report['sizes']] == [100, 100000]
+    for result in report['sizes']:
+        assert result['lost'] == 0
+        assert 0 < result['rtt']['p50'] <= result['rtt']['max'] < 5
+        assert result['messages_per_second'] > 0
+    assert report['sizes'][0]['burst'] == 2000
+    assert report['sizes'][1]['burst'] == 10  # At least 10 messages per burst
+    assert report['connect']['p50'] > 0
+    # Temporary destinations are drained: nothing is left queued
+    assert not any(stomp_broker.stats()['queued'].values())
+
+def test_probe_prints_json(stomp_broker, mocker, capsys):
+    """Test that --probe --json prints the report as JSON."""
+    mocker.patch.object(probe.creds, 'BROKER', [stomp_broker.address])
+
+    probe.main(['--probe', '--json', '--sizes', '1000', '--samples', '2',
+                '--burst-bytes', '10000', '--connect-samples', '1'])
+
+    report = json.loads(capsys.readouterr().out)
+    assert report['sizes'][0]['size'] == 1000
+    assert report['sizes'][0]['burst'] == 10
+
+def test_default_mode_sends_test_message(stomp_broker, mocker, capsys):
+    """Test that the default check connects, sends one message and reports broker errors."""
+    mocker.patch.object(probe.creds, 'BROKER', [stomp_broker.address])
+
+    assert probe.main([])
+
+    out = capsys.readouterr().out
+    assert "Connected to ActiveMQ" in out
+    assert "Test completed successfully!" in out
+    probe.MyListener().on_error(stomp.utils.Frame('ERROR', {}, 'bad frame'))
+    assert "ActiveMQ error: bad frame" in capsys.readouterr().out
@@ -0,0 +1,54 @@
+﻿# tests/python/test_channelizer.py
+import pytest
+import numpy as np
+
+from channelizer import PolyphaseChannelizer, channel_stats, prototype_filter
+from simulator import SignalSimulator
+
+SAMPLE_RATE = 2.048e6
+
+def test_prototype_filter_has_unit_dc_gain():
+    """Test that the prototype filter has N * taps coefficients summing to one."""
+    taps = prototype_filter(32, 6)
+
+    assert len(taps) == 192
+    assert taps.sum() == pytest.approx(1.0)
+    np.testing.assert_allclose(taps, taps[::-1])
+
+def test_tones_land_in_their_channels():
+    """Test that each tone appears at full power in its channel and is rejected by the others."""
+    spacing = SAMPLE_RATE / 64
+    samples = (SignalSimulator(SAMPLE_RATE, noise_power=0)
+               .add_tone(5 * spacing, amplitude=2.0)
+               .add_tone(-3 * spacing, amplitude=1.0)
+               .generate(64 * 100))
+
+    streams = PolyphaseChannelizer(64, SAMPLE_RATE).process(samples)
+    power = np.mean(np.abs(streams[10:]) ** 2, axis=0)
+
+    assert streams.shape == (100, 64)
+    assert power[5] == pytest.approx(4.0, rel=1e-3)
+    assert power[-3] == pytest.approx(1.0, rel=1e-3)
+    others = np.delete(power, [5, 61])
+    assert others.max() < 1e-6
+
+def test_state_carries_across_frames():
+    """Test that frames of any size give the same output as one long frame."""
+    samples = SignalSimulator(SAMPLE_RATE, seed=4).add_fm(2e5).generate(32 * 200)
+    whole = PolyphaseChannelizer(32, SAMPLE_RATE, taps_per_channel=4).process(samples)
+
+    channelizer = PolyphaseChannelizer(32, SAMPLE_RATE, taps_per_channel=4)
+    pieces = [channelizer.process(samples[i:i + 1000]) for i in range(0, len(samples), 1000)]
+
+    np.testing.assert_allclose(np.concatenate(pieces), whole, atol=1e-5)
+
+def test_channel_stats_reference_the_median_channel():
+    """Test that the per-channel SNR is relative to the median channel power."""
+    streams = np.ones((10, 4), dtype=np.complex64)
+    streams[:, 2] *= 10
+
+    stats = channel_stats(streams)
+
+    np.testing.assert_allclose(stats['mean_power'], [1, 1, 100, 1])
+    assert stats['snr_db'][2] == pytest.approx(20.0)
+    assert stats['snr_db'][0] == pytest.approx(0.0)
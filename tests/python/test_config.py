@@ -0,0 +1,81 @@
+﻿# tests/python/test_config.py
+import argparse
+
+import pytest
+
+import config
+import creds
+
+@pytest.fixture(autouse=True)
+def fresh_config():
+    """Load the configuration again in every test and forget any overrides."""
+    config.reset()
+    yield
+    config.reset()
+
+def test_defaults(mocker):
+    """Test that the defaults are used when nothing is set in the environment."""
+    mocker.patch('os.getenv', side_effect=lambda key, default=None: default)
+    mocker.patch('dotenv.load_dotenv')
+
+    settings = config.get_config()
+
+    assert settings == config.Config()
+    assert settings.broker == [('localhost', 61613)]
+    assert (settings.sample_rate, settings.fft_size, settings.frame_size) == (2.048e6, 1024, 1024)
+
+def test_environment_values(monkeypatch, mocker):
+    """Test that the environment sets typed fields and the failover broker list."""
+    mocker.patch('dotenv.load_dotenv')
+    monkeypatch.setenv('ACTIVEMQ_BROKERS', 'one:61613, two:61614')
+    monkeypatch.setenv('ACTIVEMQ_SDR_DEST', '/topic/sdr')
+    monkeypatch.setenv('SDR_SAMPLE_RATE', '2.4e6')
+    monkeypatch.setenv('SDR_FFT_SIZE', '4096')
+    monkeypatch.delenv('SDR_FRAME_SIZE', raising=False)
+
+    settings = config.get_config()
+
+    assert settings.broker == [('one', 61613), ('two', 61614)]
+    assert settings.sdr_dest == '/topic/sdr'
+    assert settings.sample_rate == 2.4e6
+    assert settings.fft_size == settings.frame_size == 4096  # Frame size follows the FFT size
+
+def test_loads_once(mocker):
+    """Test that the .env file is read once and the same configuration is returned."""
+    load_dotenv = mocker.patch('dotenv.load_dotenv')
+
+    first = config.get_config()
+
+    assert config.get_config() is first
+    assert creds.USER == first.user
+    load_dotenv.assert_called_once()
+
+def test_command_line_overrides(mocker):
+    """Test that command line options override the environment, also through creds."""
+    mocker.patch('dotenv.load_dotenv')
+    parser = argparse.ArgumentParser()
+    config.add_arguments(parser)
+    args = parser.parse_args(['--broker', 'a:1', '--broker', 'b:2', '--sdr-dest', '/queue/x',
+                              '--sample-rate', '1e6', '--fft-size', '512'])
+
+    settings = config.configure_from_args(args)
+
+    assert settings.broker == [('a', 1), ('b', 2)]
+    assert (settings.sdr_dest, settings.sample_rate) == ('/queue/x', 1e6)
+    assert (settings.fft_size, settings.frame_size) == (512, 512)
+    assert creds.BROKER == [('a', 1), ('b', 2)]
+    assert creds.SDR_DEST == '/queue/x'
+    # Options that are not given keep their current values
+    settings = config.configure_from_args(parser.parse_args(['--frame-size', '2048']))
+    assert (settings.broker, settings.fft_size, settings.frame_size) == ([('a', 1), ('b', 2)],
+                                                                         512, 2048)
+
+def test_importing_creds_keeps_overrides(mocker):
+    """Test that (re)importing creds does not discard configured overrides."""
+    import importlib
+    mocker.patch('dotenv.load_dotenv')
+    config.configure(sdr_dest='/queue/override')
+
+    importlib.reload(creds)
+
+    assert creds.SDR_DEST == '/queue/override'
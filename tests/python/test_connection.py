@@ -0,0 +1,129 @@
+﻿# tests/python/test_connection.py
+import threading
+
+import pytest
+from unittest.mock import MagicMock
+
+from connection import BUFFERED, ConnectionManager
+
+BROKERS = [('broker-a', 61613), ('broker-b', 61613)]
+
+@pytest.fixture
+def brokers(mocker):
+    """Patch stomp.Connection with mock connections to brokers that can be taken down."""
+    state = {'down': set(), 'created': []}
+
+    def factory(host_and_ports, heartbeats, **kwargs):
+        conn = MagicMock()
+        broker = host_and_ports[0]
+
+        def connect(login, passcode, wait):
+            if broker in state['down']:
+                raise ConnectionError(f"{broker} refused")
+
+        conn.connect.side_effect = connect
+        conn.broker = broker
+        state['created'].append(conn)
+        return conn
+
+    mocker.patch('stomp.Connection', side_effect=factory)
+    mocker.patch('time.sleep')
+    return state
+
+def test_fails_over_to_next_broker(brokers):
+    """Test that brokers are tried in round-robin order until one connects."""
+    brokers['down'].add(BROKERS[0])
+    manager = ConnectionManager(BROKERS, 'user', 'pass')
+
+    assert manager.connect(max_attempts=3)
+
+    assert manager.broker == BROKERS[1]
+    assert manager.failed_attempts == 1
+    brokers['created'][-1].connect.assert_called_once_with(login='user', passcode='pass', wait=True)
+
+def test_gives_up_after_max_attempts(brokers):
+    """Test that connect returns False when no broker is reachable."""
+    brokers['down'].update(BROKERS)
+    manager = ConnectionManager(BROKERS, 'user', 'pass')
+
+    assert not manager.connect(max_attempts=4)
+    assert manager.failed_attempts == 4
+    assert not manager.is_connected()
+
+def test_backoff_grows_with_jitter_and_cap():
+    """Test that backoff doubles per attempt, stays within jitter bounds and is capped."""
+    manager = ConnectionManager(BROKERS, 'user', 'pass', initial_backoff=1.0, max_backoff=8.0)
+
+    for attempt, full in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 8.0), (10, 8.0)]:
+        delay = manager.backoff_delay(attempt)
+        assert full / 2 <= delay <= full
+
+def test_buffers_during_outage_and_replays_in_order(brokers):
+    """Test that messages sent while disconnected are replayed after reconnecting."""
+    manager = ConnectionManager(BROKERS, 'user', 'pass', max_buffer=2)
+    assert manager.connect()
+    first = brokers['created'][-1]
+    first.send.side_effect = ConnectionError("broker restarted")
+    brokers['down'].update(BROKERS)
+    manager.start_reconnect = MagicMock()
+
+    assert manager.send('/queue/sdr', 'a') is BUFFERED
+    assert manager.send('/queue/sdr', 'b') is BUFFERED
+    assert manager.send('/queue/sdr', 'c') is BUFFERED
+
+    stats = manager.stats()
+    assert not stats['connected']
+    assert stats['buffered'] == 2
+    assert stats['buffer_dropped'] == 1
+
+    brokers['down'].clear()
+    assert manager.connect()
+    second = brokers['created'][-1]
+    assert [call.kwargs['body'] for call in second.send.call_args_list] == ['b', 'c']
+    assert manager.stats()['reconnects'] == 1
+
+def test_sends_wait_for_replay_in_progress(mocker):
+    """Test that messages sent during a replay go out after the replayed ones, in order."""
+    manager = ConnectionManager(BROKERS, 'user', 'pass')
+    manager.start_reconnect = MagicMock()
+    for body in ('a', 'b'):
+        assert manager.send('/queue/sdr', body) is BUFFERED
+
+    sending, release = threading.Event(), threading.Event()
+    sent = []
+
+    def factory(host_and_ports, heartbeats, **kwargs):
+        conn = MagicMock()
+
+        def send(destination, body, headers):
+            if body == 'a':
+                # Hold the replay of the first message while the caller sends
+                sending.set()
+                release.wait(5)
+            sent.append(body)
+
+        conn.send.side_effect = send
+        return conn
+
+    mocker.patch('stomp.Connection', side_effect=factory)
+    replayer = threading.Thread(target=manager.connect)
+    replayer.start()
+    assert sending.wait(5)
+    assert manager.send('/queue/sdr', 'c') is BUFFERED
+    release.set()
+    replayer.join(5)
+
+    assert sent == ['a', 'b', 'c']
+    assert manager.send('/queue/sdr', 'd') is True
+    assert sent[-1] == 'd'
+
+def test_disconnect_stops_reconnecting(brokers):
+    """Test that disconnect closes the connection and prevents reconnects."""
+    manager = ConnectionManager(BROKERS, 'user', 'pass')
+    manager.connect()
+    conn = brokers['created'][-1]
+
+    manager.disconnect()
+
+    conn.disconnect.assert_called_once()
+    assert not manager.connect(max_attempts=1)
@@ -0,0 +1,89 @@
+﻿# tests/python/test_console.py
+import io
+import json
+import pytest
+
+from console import ConsoleReporter, format_sample_report
+
+@pytest.fixture
+def sample_data():
+    """Build sample message data for one read."""
+    return {
+        'read_number': 3,
+        'total_reads': None,
+        'sample_count': 1024,
+        'time_domain': {
+            'mean_power': 2.0, 'median_power': 1.5, 'max_power': 9.0,
+            'min_power': 0.1, 'std_dev': 1.0, 'snr_estimate': 2.0
+        },
+        'first_samples': [{'real': 0.5, 'imag': -0.5}],
+        'frequency_domain': {'peak_freq_mhz': 0.25, 'peak_power': 100.0}
+    }
+
+def test_full_mode_writes_report(sample_data):
+    """Test that full mode writes the detailed report in one piece."""
+    stream = io.StringIO()
+    reporter = ConsoleReporter('full', stream=stream)
+
+    reporter.sample(sample_data, True)
+
+    assert stream.getvalue() == format_sample_report(sample_data, True) + "\n"
+    assert "--- Read #3 --- (Sent to ActiveMQ)" in stream.getvalue()
+    assert "Peak frequency: 0.250 MHz" in stream.getvalue()
+
+def test_compact_mode_rate_limits(sample_data, mocker):
+    """Test that compact mode writes at most one line per interval."""
+    clock = mocker.patch('time.monotonic', return_value=100.0)
+    stream = io.StringIO()
+    reporter = ConsoleReporter('compact', interval=1.0, stream=stream)
+
+    for _ in range(5):
+        reporter.sample(sample_data, True)
+    assert stream.getvalue() == ""
+
+    clock.return_value = 101.0
+    reporter.sample(sample_data, False)
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    assert "reads=6" in lines[0]
+    assert "sent=5 failed=1" in lines[0]
+
+def test_compact_mode_skips_formatting(sample_data, mocker):
+    """Test that reports are not formatted between compact lines."""
+    formatter = mocker.patch('console.format_sample_report')
+    reporter = ConsoleReporter('compact', interval=60, stream=io.StringIO())
+
+    reporter.sample(sample_data, True)
+
+    formatter.assert_not_called()
+
+def test_json_mode_writes_json_lines(sample_data, mocker):
+    """Test that json mode writes parseable records including the last summary."""
+    clock = mocker.patch('time.monotonic', return_value=0.0)
+    stream = io.StringIO()
+    reporter = ConsoleReporter('json', interval=5.0, stream=stream)
+
+    reporter.summary({'overall_mean_power': 1.0}, True)
+    clock.return_value = 5.0
+    reporter.sample(sample_data, True)
+    reporter.status('pipeline', {'overruns': 2}, print)
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert records[0]['reads'] == 1
+    assert records[0]['frequency_domain']['peak_freq_mhz'] == 0.25
+    assert records[0]['summary'] == {'overall_mean_power': 1.0}
+    assert records[1]['type'] == 'pipeline'
+    assert records[1]['overruns'] == 2
+
+def test_quiet_mode_writes_nothing(sample_data):
+    """Test that quiet mode suppresses all per-read output."""
+    stream = io.StringIO()
+    reporter = ConsoleReporter('quiet', stream=stream)
+
+    reporter.sample(sample_data, True)
+    reporter.summary({}, True)
+    reporter.info("Using simulated samples")
+    reporter.notice("Warning")
+
+    assert stream.getvalue() == ""
@@ -0,0 +1,98 @@
+﻿# tests/python/test_consumer_analyzer.py
+import json
+import time
+
+import numpy as np
+import pytest
+import stomp
+
+import sdr
+from async_publisher import BATCH_HEADER, TEXT_BATCH_CONTENT_TYPE, pack_batch
+from consumer_analyzer import (ConsumerAnalyzer, LatencyHistogram, SequenceTracker,
+                               decode_message)
+from load_generator import PayloadFactory
+
+def test_histogram_percentiles_within_precision():
+    """Test that percentiles are within the histogram's relative precision."""
+    rng = np.random.default_rng(1)
+    latencies = rng.lognormal(np.log(0.005), 1.0, 100000)
+    histogram = LatencyHistogram()
+
+    for batch in np.array_split(latencies, 10):
+        histogram.record(batch)
+
+    for percent in (50, 90, 99, 99.9):
+        assert histogram.percentile(percent) == pytest.approx(
+            np.percentile(latencies, percent), rel=0.01)
+    assert histogram.percentile(100) == latencies.max()
+    assert histogram.summary()['count'] == 100000
+
+def test_histogram_counts_negative_latencies():
+    """Test that negative latencies from clock skew are counted and recorded as zero."""
+    histogram = LatencyHistogram()
+
+    histogram.record([-0.002, 0.000003, 0.5])
+
+    summary = histogram.summary()
+    assert summary['negative'] == 1
+    assert summary['min'] == 0.0
+    assert summary['p50'] == pytest.approx(0.000003)
+
+def test_sequence_tracker():
+    """Test that gaps, missing messages and reordering are counted per source."""
+    tracker = SequenceTracker()
+
+    for source, sequence in [('a', 1), ('a', 2), ('b', 1), ('a', 5), ('a', 4), ('b', 2)]:
+        tracker.update(source, sequence)
+
+    assert (tracker.gaps, tracker.missing, tracker.out_of_order) == (1, 2, 1)
+
+def test_decodes_every_message_kind(mocker):
+    """Test that send times and sequences come from each producer's format."""
+    conn = mocker.MagicMock()
+    sdr.send_to_activemq(conn, {'read_number': 4}, "sample", np.zeros(16), encoding="uint8")
+    frame = conn.send.call_args.kwargs
+    sdr.send_to_activemq(conn, {'read_number': 5}, "sample", None)
+    text = conn.send.call_args.kwargs['body']
+    load_body, load_headers = PayloadFactory('binary', 64).build(2, 9, 1700000000.0)
+
+    (frame_time, _, frame_sequence), = decode_message(frame['headers'], frame['body'])
+    assert frame_time == pytest.approx(time.time(), abs=5) and frame_sequence == 4
+    assert decode_message({}, text.encode())[0][2] == 5
+    assert decode_message({}, b'2023-11-14T22:13:20.5Z') == [(1700000000.5, None, None)]
+    assert decode_message(load_headers, load_body) == [(1700000000.0, '2', 9)]
+    batch = pack_batch([json.dumps({'timestamp': 1.0}), json.dumps({'timestamp': 2.0})])
+    batch_headers = {BATCH_HEADER: '2', 'content-type': TEXT_BATCH_CONTENT_TYPE}
+    assert [r[0] for r in decode_message(batch_headers, batch)] == [1.0, 2.0]
+
+@pytest.mark.parametrize('ack', ['client-individual', 'client'])
+def test_analyzes_broker_traffic(stomp_broker, ack):
+    """Test that the analyzer measures and acknowledges messages from a broker."""
+    producer = stomp.Connection([stomp_broker.address])
+    producer.connect('user', 'pass', wait=True)
+    consumer = stomp.Connection([stomp_broker.address], auto_decode=False)
+    analyzer = ConsumerAnalyzer(consumer, ['/queue/sdr', '/queue/publisher'], ack=ack,
+                                prefetch=5, batch_size=4)
+    consumer.connect('user', 'pass', wait=True)
+    analyzer.start()
+
+    payload = PayloadFactory('timestamp')
+    for sequence in (1, 2, 3, 5, 6, 7, 8, 9, 10, 11):
+        body, headers = payload.build(0, sequence, time.time())
+        producer.send('/queue/publisher', body, headers=headers)
+    producer.send('/queue/sdr', json.dumps({'timestamp': time.time(), 'type': 'summary'}))
+
+    deadline = time.monotonic() + 5
+    while sum(s['messages'] for s in analyzer.report()) < 11 and time.monotonic() < deadline:
+        analyzer.process_batch()
+    producer.disconnect()
+    consumer.disconnect()
+
+    report = {summary['destination']: summary for summary in analyzer.report()}
+    publisher_stats = report['/queue/publisher']
+    assert publisher_stats['messages'] == 10
+    assert (publisher_stats['gaps'], publisher_stats['missing']) == (1, 1)
+    assert 0 <= publisher_stats['latency']['p50'] < 1
+    assert report['/queue/sdr']['latency']['count'] == 1
+    # Acknowledged messages are gone: nothing is redelivered after the disconnect
+    assert not any(stomp_broker.stats()['queued'].values())
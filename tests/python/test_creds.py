@@ -3,6 +3,15 @@ import os
 import pytest
 from unittest.mock import patch
 
+import config
+
+@pytest.fixture(autouse=True)
+def fresh_config():
+    """Load the configuration again in every test."""
+    config.reset()
+    yield
+    config.reset()
+
 @pytest.fixture
 def mock_env():
     """Set up test environment variables."""
@@ -0,0 +1,68 @@
+﻿# tests/python/test_detection.py
+import pytest
+import numpy as np
+
+from detection import CfarDetector, Detection, DetectionTracker, ca_scale, os_scale
+
+def noise_floor(size=4096, seed=0):
+    return np.random.default_rng(seed).exponential(1.0, size)
+
+@pytest.mark.parametrize("method", ["ca", "os"])
+def test_false_alarm_rate_matches_pfa(method):
+    """Test that on pure noise about pfa of the bins cross the threshold."""
+    power = noise_floor(1 << 16)
+    detector = CfarDetector(method, pfa=1e-2)
+
+    rate = np.mean(power > detector.scale * detector.noise_estimate(power))
+
+    assert rate == pytest.approx(1e-2, rel=0.2)
+
+def test_ca_noise_estimate_averages_training_cells():
+    """Test that the cell-averaging estimate skips the guard cells around each bin."""
+    power = noise_floor(64)
+    detector = CfarDetector('ca', guard_cells=2, training_cells=4)
+
+    padded = np.pad(power, 6, mode='reflect')
+    window = padded[30:43]
+    expected = (window[:4].sum() + window[-4:].sum()) / 8
+    assert detector.noise_estimate(power)[30] == pytest.approx(expected)
+
+def test_regions_report_center_bandwidth_and_snr():
+    """Test that adjacent bins merge into one region centered on the signal."""
+    power = noise_floor()
+    power[1000:1010] += 100
+    power[3000] += 200
+    power[3002] += 200
+
+    detections = CfarDetector('os', pfa=1e-4).detect(power, 2.048e6, 100e6)
+
+    wide = [d for d in detections if d.start_bin == 1000]
+    assert len(wide) == 1 and wide[0].stop_bin == 1010
+    assert wide[0].bandwidth == pytest.approx(10 * 500.0)
+    assert wide[0].center_freq == pytest.approx(100e6 + (1004.5 - 2048) * 500.0, abs=100)
+    assert wide[0].snr_db > 15
+    merged = [d for d in detections if d.start_bin == 3000]
+    assert len(merged) == 1 and merged[0].stop_bin == 3003
+
+def test_scale_factors():
+    """Test the CA and OS threshold scales against their closed forms."""
+    assert ca_scale(32, 1e-3) == pytest.approx(32 * (1e-3 ** (-1 / 32) - 1))
+    scale = os_scale(32, 24, 1e-3)
+    cells = 32 - np.arange(24)
+    assert np.prod(cells / (cells + scale)) == pytest.approx(1e-3, rel=1e-6)
+
+def test_tracker_emits_confirmed_start_and_stop():
+    """Test that a signal starts after confirm detections and stops after hold misses."""
+    tracker = DetectionTracker(confirm=2, hold=2)
+    signal = Detection(100e6, 10e3, 20.0, 100e6, 1.0, 10, 20)
+    noise_spike = Detection(101e6, 500.0, 8.0, 101e6, 1.0, 50, 51)
+
+    assert tracker.update([signal, noise_spike], timestamp=0.0) == []
+    started = tracker.update([signal], timestamp=1.0)
+    assert [e['event'] for e in started] == ['start']
+    assert tracker.update([], timestamp=2.0) == []
+    stopped = tracker.update([], timestamp=3.0)
+
+    assert [e['event'] for e in stopped] == ['stop']
+    assert stopped[0]['signal_id'] == started[0]['signal_id']
+    assert stopped[0]['duration'] == 1.0
@@ -0,0 +1,67 @@
+﻿# tests/python/test_iq_recording.py
+import pytest
+import numpy as np
+
+from iq_recording import IQRecorder, IQReplaySource, load_metadata
+
+def test_recording_round_trip(tmp_path):
+    """Test that recorded frames and metadata are replayed unchanged."""
+    frames = (np.random.default_rng(0).standard_normal((3, 256, 2), dtype=np.float32)
+              .view(np.complex64)[..., 0])
+    with IQRecorder(str(tmp_path / "capture"), 2.048e6, 162.450e6, gain=28.0) as recorder:
+        for frame in frames:
+            recorder.write(frame)
+
+    meta = load_metadata(str(tmp_path / "capture.sigmf-meta"))
+    assert meta['global']['core:datatype'] == 'cf32_le'
+    assert meta['global']['core:sample_rate'] == 2.048e6
+    assert meta['global']['sdr:gain'] == 28.0
+    assert meta['global']['sdr:sample_count'] == 768
+    assert meta['captures'][0]['core:frequency'] == 162.450e6
+    assert meta['captures'][0]['core:datetime'].endswith('Z')
+
+    source = IQReplaySource(str(tmp_path / "capture.sigmf-data"), speed=0)
+    assert (source.sample_rate, source.center_freq, len(source)) == (2.048e6, 162.450e6, 768)
+    for frame in frames:
+        np.testing.assert_array_equal(source.read_samples(256), frame)
+    with pytest.raises(EOFError):
+        source.read_samples(256)
+
+def test_replay_loops_and_drops_partial_frame(tmp_path):
+    """Test that loop mode restarts from the beginning instead of returning a short frame."""
+    with IQRecorder(str(tmp_path / "capture"), 1e6, 100e6) as recorder:
+        recorder.write(np.arange(10, dtype=np.complex64))
+
+    source = IQReplaySource(str(tmp_path / "capture"), speed=0, loop=True)
+    reads = [source.read_samples(4) for _ in range(3)]
+
+    np.testing.assert_array_equal(reads[2], np.arange(4))
+
+def test_replay_is_paced(tmp_path, mocker):
+    """Test that replay at real time waits for each frame after the first."""
+    with IQRecorder(str(tmp_path / "capture"), 1e6, 100e6) as recorder:
+        recorder.write(np.zeros(3000, dtype=np.complex64))
+    mocker.patch('time.monotonic', return_value=50.0)
+    sleep = mocker.patch('time.sleep')
+
+    source = IQReplaySource(str(tmp_path / "capture"))
+    for _ in range(3):
+        source.read_samples(1000)
+
+    np.testing.assert_allclose([call.args[0] for call in sleep.call_args_list], [0.001, 0.002])
+
+def test_sdr_records_and_replays(tmp_path):
+    """Test that read_and_print_samples records every frame and stops at the end of a replay."""
+    import sdr
+    from console import ConsoleReporter
+
+    with IQRecorder(str(tmp_path / "source"), 2.048e6, 100e6) as recorder:
+        recorder.write(sdr.generate_simulated_samples(4096))
+    replay = IQReplaySource(str(tmp_path / "source"), speed=0)
+
+    with IQRecorder(str(tmp_path / "copy"), replay.sample_rate, replay.center_freq) as copy:
+        sdr.read_and_print_samples(replay, None, num_samples=1024, recorder=copy,
+                                   reporter=ConsoleReporter('quiet'))
+
+    np.testing.assert_array_equal(IQReplaySource(str(tmp_path / "copy")).samples,
+                                  replay.samples)
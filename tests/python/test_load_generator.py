@@ -0,0 +1,69 @@
+﻿# tests/python/test_load_generator.py
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from connection import BUFFERED
+from load_generator import BINARY_HEADER, LoadGenerator, PayloadFactory, latency_percentiles
+
+@pytest.mark.parametrize('shape', ['json', 'binary'])
+def test_payload_has_requested_size(shape):
+    """Test that json and binary payloads are close to the requested size."""
+    body, headers = PayloadFactory(shape, 4096).build(1, 7, 1700000000.5)
+
+    assert abs(len(body) - 4096) < 4096 * 0.1
+    assert (headers['producer'], headers['sequence']) == ('1', '7')
+    assert float(headers['send-time']) == 1700000000.5
+
+def test_payloads_carry_sequence_and_send_time():
+    """Test that every shape carries the sequence and send time in its body."""
+    send_time = 1700000000.25
+
+    text, _ = PayloadFactory('timestamp').build(0, 3, send_time)
+    data = json.loads(PayloadFactory('json', 512).build(0, 3, send_time)[0])['data']
+    binary, headers = PayloadFactory('binary', 64).build(2, 3, send_time)
+
+    assert text == '2023-11-14T22:13:20.250000Z'
+    assert (data['sequence'], data['send_time']) == (3, send_time)
+    assert BINARY_HEADER.unpack_from(binary) == (2, 3, send_time)
+    assert headers['content-length'] == '64'
+
+def test_sends_at_target_rate_over_connections():
+    """Test that each connection sends its share of the schedule with contiguous sequences."""
+    conns = []
+
+    def connect():
+        conns.append(MagicMock())
+        return conns[-1]
+
+    report = LoadGenerator(connect, '/queue/load', rate=200, connections=2, duration=0.25,
+                           shape='timestamp').run()
+
+    assert report['messages'] == 50 and report['errors'] == 0
+    assert report['achieved_rate'] == pytest.approx(200, rel=0.15)
+    for producer, conn in enumerate(conns):
+        headers = [call.kwargs['headers'] for call in conn.send.call_args_list]
+        assert {h['producer'] for h in headers} == {str(producer)}
+        assert [int(h['sequence']) for h in headers] == list(range(1, 26))
+        conn.disconnect.assert_called_once()
+
+def test_counts_send_errors():
+    """Test that exceptions and refused sends are errors and buffered sends are not sent."""
+    conn = MagicMock()
+    conn.send.side_effect = [False, Exception("broker gone"), BUFFERED] + [None] * 100
+
+    report = LoadGenerator(lambda: conn, '/queue/load', rate=100, duration=0.1).run()
+
+    assert report['errors'] == 2
+    assert report['buffered'] == 1
+    assert report['messages'] == 7
+    assert report['last_error'] == "broker gone"
+
+def test_latency_percentiles():
+    """Test that percentiles are computed in seconds and empty input gives zeros."""
+    result = latency_percentiles([0.001] * 99 + [0.1])
+
+    assert result['p50'] == pytest.approx(0.001)
+    assert result['max'] == 0.1
+    assert latency_percentiles([])['p99'] == 0.0
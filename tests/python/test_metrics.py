@@ -0,0 +1,115 @@
+﻿# tests/python/test_metrics.py
+import urllib.request
+from unittest.mock import MagicMock
+
+import pytest
+
+from async_publisher import AsyncPublisher, QUEUED
+from connection import BUFFERED
+from metrics import (MetricsRegistry, MetricsServer, NULL_REGISTRY, PipelineMetrics,
+                     CONTENT_TYPE)
+
+def test_renders_counters_and_gauges():
+    """Test that counters and gauges render with HELP, TYPE and escaped labels."""
+    registry = MetricsRegistry()
+    registry.counter('sdr_reads_total', "Reads").inc(3)
+    gauge = registry.gauge('sdr_depth', "Depth", queue='a"b')
+    gauge.set(5)
+    gauge.dec(2)
+    registry.gauge('sdr_window', "Window").set_function(lambda: 42)
+
+    text = registry.render()
+
+    assert "# HELP sdr_reads_total Reads\n# TYPE sdr_reads_total counter\n" in text
+    assert "sdr_reads_total 3\n" in text
+    assert 'sdr_depth{queue="a\\"b"} 3\n' in text
+    assert "sdr_window 42\n" in text
+
+def test_histogram_buckets_are_cumulative():
+    """Test that histogram buckets, sum and count follow the exposition format."""
+    registry = MetricsRegistry()
+    histogram = registry.histogram('sdr_stage_latency_seconds', "Latency", buckets=(0.1, 1.0),
+                                   stage='fft')
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert 'sdr_stage_latency_seconds_bucket{stage="fft",le="0.1"} 2' in lines
+    assert 'sdr_stage_latency_seconds_bucket{stage="fft",le="1.0"} 3' in lines
+    assert 'sdr_stage_latency_seconds_bucket{stage="fft",le="+Inf"} 4' in lines
+    assert 'sdr_stage_latency_seconds_sum{stage="fft"} 2.65' in lines
+    assert 'sdr_stage_latency_seconds_count{stage="fft"} 4' in lines
+    # One HELP/TYPE per family, however many label sets it has
+    registry.histogram('sdr_stage_latency_seconds', "Latency", stage='send')
+    assert registry.render().count("# TYPE sdr_stage_latency_seconds histogram") == 1
+
+def test_rejects_kind_conflicts():
+    """Test that a name cannot be registered as two kinds of metric."""
+    registry = MetricsRegistry()
+    registry.counter('sdr_x', "X")
+
+    with pytest.raises(ValueError):
+        registry.gauge('sdr_x', "X")
+
+def test_null_registry_ignores_updates():
+    """Test that pipeline metrics on the null registry accept every update and render nothing."""
+    metrics = PipelineMetrics(NULL_REGISTRY)
+
+    with metrics.fft.time():
+        pass
+    metrics.reads.inc()
+    metrics.queue_depth.set_function(lambda: 1)
+
+    assert metrics.record_send(None, "body")
+    assert not metrics.record_send(False, "body")
+    assert NULL_REGISTRY.render() == ""
+
+def test_serves_metrics_over_http():
+    """Test that the server returns the rendered registry at /metrics."""
+    registry = MetricsRegistry()
+    metrics = PipelineMetrics(registry)
+    metrics.record_send(None, b"12345")
+    metrics.record_send(None, "\u00b5s")
+    metrics.record_send(False, b"123")
+    assert metrics.record_send(BUFFERED, b"1234567")
+    server = MetricsServer(registry, port=0).start()
+    try:
+        host, port = server.address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as response:
+            body = response.read().decode()
+            content_type = response.headers['Content-Type']
+    finally:
+        server.stop()
+
+    assert content_type == CONTENT_TYPE
+    assert "sdr_messages_sent_total 2\n" in body
+    assert "sdr_publish_dropped_total 1\n" in body
+    assert "sdr_bytes_published_total 8\n" in body  # The text body is 3 bytes in UTF-8
+    assert "sdr_messages_buffered_total 1\n" in body
+
+def test_publisher_sends_are_recorded_when_sent():
+    """Test that messages queued by an AsyncPublisher are counted and timed when they are sent."""
+    registry = MetricsRegistry()
+    metrics = PipelineMetrics(registry)
+    conn = MagicMock()
+    conn.send.side_effect = [None, Exception("broker down")]
+    publisher = AsyncPublisher(conn, policy='drop-newest')
+    metrics.watch_publisher(publisher)
+
+    for body in ("\u00b5s", "lost"):
+        result = publisher.send('/queue/sdr', body)
+        assert result is QUEUED
+        assert metrics.record_send(result, body, latency=0.5)
+    publisher.close()
+    publisher.max_queue = 0
+    assert not metrics.record_send(publisher.send('/queue/sdr', "dropped"), "dropped")
+
+    text = registry.render()
+    assert "sdr_messages_sent_total 1\n" in text
+    assert "sdr_bytes_published_total 3\n" in text
+    assert "sdr_send_failures_total 1\n" in text
+    assert "sdr_publish_dropped_total 1\n" in text
+    # Only the frame the sender thread sent is timed, not the enqueues
+    assert 'sdr_stage_latency_seconds_count{stage="send"} 1\n' in text
+    assert 'sdr_stage_latency_seconds_bucket{stage="send",le="0.25"} 1\n' in text
@@ -0,0 +1,97 @@
+﻿# tests/python/test_multichannel.py
+import json
+import pytest
+import numpy as np
+from unittest.mock import MagicMock
+
+import config
+import sdr
+from iq_recording import IQRecorder
+from multichannel import ChannelConfig, ChannelSupervisor, SharedFrameSlots, load_channels
+
+def test_load_channels_applies_defaults(tmp_path):
+    """Test that channel files get default names and settings and reject unknown keys."""
+    path = tmp_path / "channels.json"
+    path.write_text(json.dumps([{'serial': '0001', 'center_freq': 100e6},
+                                {'name': 'noaa', 'destination': '/queue/noaa'}]))
+
+    channels = load_channels(str(path))
+
+    assert channels[0] == ChannelConfig('channel0', '0001', 100e6)
+    assert channels[1].name == 'noaa'
+    assert channels[1].sample_rate == 2.048e6
+    assert channels[1].destination == '/queue/noaa'
+
+    path.write_text(json.dumps([{'name': 'bad', 'frequency': 100e6}]))
+    with pytest.raises(ValueError):
+        load_channels(str(path))
+
+def test_shared_frame_slots_are_shared_by_name():
+    """Test that a block attached by name sees frames written through the creator."""
+    owner = SharedFrameSlots(4, 256)
+    attached = SharedFrameSlots(4, 256, owner.name)
+    try:
+        owner.frames[2] = np.arange(256)
+        np.testing.assert_array_equal(attached.frames[2], np.arange(256))
+    finally:
+        attached.close()
+        owner.close()
+        owner.unlink()
+
+def test_supervisor_processes_every_channel(tmp_path):
+    """Test that each channel's frames are processed in worker processes and published."""
+    channels = []
+    for i, center_freq in enumerate([100e6, 162.450e6]):
+        path = str(tmp_path / f"channel{i}")
+        with IQRecorder(path, 2.048e6, center_freq) as recorder:
+            recorder.write(sdr.generate_simulated_samples(8 * 1024))
+        channels.append(ChannelConfig(f"ch{i}", replay=path, center_freq=center_freq,
+                                      destination=f"/queue/sdr.ch{i}"))
+
+    supervisor = ChannelSupervisor(channels, sdr.SampleProcessor, dsp_workers=2, sim_speed=0)
+    published = []
+    supervisor.start()
+    try:
+        supervisor.run(published.append)
+    finally:
+        supervisor.stop()
+
+    stats = supervisor.stats()
+    for i in range(2):
+        assert stats[f"ch{i}"] == {'frames_acquired': 8, 'frames_processed': 8, 'overruns': 0}
+        samples = [m for m in published if m['channel'] == f"ch{i}"
+                   and m['message_type'] == "sample"]
+        assert len(samples) == 8
+        assert {m['destination'] for m in samples} == {f"/queue/sdr.ch{i}"}
+        assert samples[0]['center_freq'] == channels[i].center_freq
+
+def test_frame_size_defaults_to_configured_size():
+    """Test that channels without a frame size use the configured one (the FFT size)."""
+    config.configure(fft_size=2048)
+    try:
+        supervisor = ChannelSupervisor([ChannelConfig('a'), ChannelConfig('b', frame_size=512)],
+                                       sdr.SampleProcessor)
+    finally:
+        config.reset()
+
+    assert [channel.frame_size for channel in supervisor.channels] == [2048, 512]
+
+def test_rejects_block_size_below_frame_size():
+    """Test that per-channel sizes are checked before any process is started."""
+    channels = [ChannelConfig('a', frame_size=1024), ChannelConfig('b', frame_size=4096)]
+
+    with pytest.raises(ValueError, match="channel b: block size 2048"):
+        ChannelSupervisor(channels, sdr.SampleProcessor, {'block_size': 2048})
+    with pytest.raises(ValueError, match="channel a: frame size"):
+        ChannelSupervisor([ChannelConfig('a', frame_size=0)], sdr.SampleProcessor)
+
+def test_send_with_channel_header():
+    """Test that a channel name is sent as a header and in the JSON message."""
+    conn = MagicMock()
+
+    sdr.send_to_activemq(conn, {'read_number': 1}, destination='/queue/sdr.a', channel='a')
+
+    kwargs = conn.send.call_args.kwargs
+    assert kwargs['destination'] == '/queue/sdr.a'
+    assert kwargs['headers'] == {'channel': 'a'}
+    assert json.loads(kwargs['body'])['channel'] == 'a'
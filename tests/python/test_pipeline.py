@@ -0,0 +1,74 @@
+﻿# tests/python/test_pipeline.py
+import threading
+import numpy as np
+
+from pipeline import SampleRingBuffer, SamplePipeline
+
+def test_ring_buffer_preserves_order():
+    """Test that frames are read back in the order they were written."""
+    ring = SampleRingBuffer(capacity=4, frame_size=8)
+    for i in range(3):
+        assert ring.write(np.full(8, i, dtype=np.complex64))
+
+    for i in range(3):
+        frame = ring.read(timeout=0)
+        assert frame.dtype == np.complex64
+        assert np.all(frame == i)
+
+    assert ring.read(timeout=0) is None
+
+def test_ring_buffer_counts_overruns():
+    """Test that the oldest frames are overwritten and counted when the reader falls behind."""
+    ring = SampleRingBuffer(capacity=4, frame_size=8)
+    results = [ring.write(np.full(8, i, dtype=np.complex64)) for i in range(6)]
+
+    assert results == [True, True, True, True, False, False]
+    assert ring.overruns == 2
+    assert len(ring) == 4
+    # Frames 0 and 1 were dropped
+    assert np.all(ring.read(timeout=0) == 2)
+
+def test_ring_buffer_reads_into_preallocated_buffer():
+    """Test that read copies into the buffer it is given."""
+    ring = SampleRingBuffer(capacity=2, frame_size=8)
+    ring.write(np.arange(4, dtype=np.complex64))
+    out = np.zeros(8, dtype=np.complex64)
+
+    frame = ring.read(out=out, timeout=0)
+
+    assert len(frame) == 4
+    assert np.shares_memory(frame, out)
+
+def test_pipeline_runs_all_stages():
+    """Test that frames flow from the source through processing to publishing."""
+    frames = iter(range(5))
+    published = []
+    done = threading.Event()
+
+    def read_fn(size):
+        try:
+            return np.full(size, next(frames), dtype=np.complex64)
+        except StopIteration:
+            raise EOFError("source exhausted")
+
+    def publish_fn(item):
+        published.append(item)
+        if len(published) == 5:
+            done.set()
+
+    pipeline = SamplePipeline(
+        lambda samples: [float(samples[0].real)],
+        publish_fn,
+        read_fn=read_fn,
+        frame_size=16,
+        ring_capacity=8
+    )
+    pipeline.start()
+    assert done.wait(5)
+    pipeline.stop()
+
+    assert published == [0.0, 1.0, 2.0, 3.0, 4.0]
+    stats = pipeline.stats()
+    assert stats['frames_acquired'] == 5
+    assert stats['frames_processed'] == 5
+    assert stats['overruns'] == 0
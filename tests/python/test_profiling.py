@@ -0,0 +1,118 @@
+﻿# tests/python/test_profiling.py
+import os
+import signal
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from profiling import LoopProfiler, profiler_from_environ
+
+def test_profiles_requested_iterations(tmp_path):
+    """Test that tick profiles exactly the requested iterations and writes both reports."""
+    profiler = LoopProfiler(str(tmp_path), iterations=3)
+    profiler.request_profile()
+
+    iterations = 0
+    while profiler.pending:
+        profiler.tick()
+        sum(range(1000))
+        iterations += 1
+
+    assert iterations == 4  # The tick after the third iteration stops the profile
+    prof, text = sorted(profiler.files)
+    assert prof.endswith('.prof') and text.endswith('.txt')
+    assert os.path.basename(prof).startswith('sdr-cpu-')
+    assert "cumulative" in open(text).read()
+
+def test_memory_snapshot_diffs(tmp_path):
+    """Test that the first snapshot is a baseline and later ones write the growth."""
+    profiler = LoopProfiler(str(tmp_path), memory_interval=0)
+    try:
+        assert profiler.memory_snapshot() is None
+        retained = [np.ones(10000) for _ in range(10)]
+        path = profiler.memory_snapshot()
+    finally:
+        profiler.close()
+
+    report = open(path).read()
+    assert report.startswith("Traced memory:")
+    assert "test_profiling.py" in report
+    assert len(retained) == 10
+
+def test_memory_snapshots_are_rate_limited(tmp_path, mocker):
+    """Test that snapshots within memory_interval of the previous one are skipped."""
+    monotonic = mocker.patch('time.monotonic', return_value=100.0)
+    profiler = LoopProfiler(str(tmp_path), memory_interval=10.0)
+    try:
+        profiler.memory_snapshot()
+        monotonic.return_value = 105.0
+        assert profiler.memory_snapshot() is None
+        monotonic.return_value = 111.0
+        assert profiler.memory_snapshot() is not None
+    finally:
+        profiler.close()
+
+def test_toggling_memory_off_stops_tracing(tmp_path):
+    """Test that turning memory snapshots off stops tracemalloc and drops the baseline."""
+    profiler = LoopProfiler(str(tmp_path), memory_interval=0)
+    profiler.toggle_memory()
+    profiler.memory_snapshot()
+    assert tracemalloc.is_tracing()
+
+    profiler.toggle_memory()
+
+    assert not profiler.memory
+    assert not tracemalloc.is_tracing()
+    profiler.toggle_memory()
+    try:
+        assert profiler.memory_snapshot() is None  # A fresh baseline, not a diff
+    finally:
+        profiler.close()
+    assert not tracemalloc.is_tracing()
+
+def test_configured_from_environment(tmp_path):
+    """Test that the environment starts profiling when no flags are given."""
+    environ = {'SDR_PROFILE': '5', 'SDR_PROFILE_MEMORY': '1', 'SDR_PROFILE_DIR': str(tmp_path)}
+
+    profiler = profiler_from_environ(environ=environ)
+    assert (profiler.pending, profiler.memory, profiler.output_dir) == (5, True, str(tmp_path))
+
+    idle = profiler_from_environ(environ={})
+    assert (idle.pending, idle.memory, idle.iterations) == (0, False, 100)
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGUSR1'), reason="needs POSIX signals")
+def test_signals_trigger_profiling():
+    """Test that SIGUSR1 requests a profile and SIGUSR2 toggles memory snapshots."""
+    previous = signal.getsignal(signal.SIGUSR1), signal.getsignal(signal.SIGUSR2)
+    profiler = LoopProfiler(iterations=7)
+    try:
+        assert profiler.install_signal_handlers()
+        os.kill(os.getpid(), signal.SIGUSR1)
+        os.kill(os.getpid(), signal.SIGUSR2)
+    finally:
+        signal.signal(signal.SIGUSR1, previous[0])
+        signal.signal(signal.SIGUSR2, previous[1])
+
+    assert profiler.pending == 7
+    assert profiler.memory
+
+def test_sample_loop_is_profiled(tmp_path):
+    """Test that read_and_print_samples profiles its iterations and snapshots at summaries."""
+    import sdr
+    from console import ConsoleReporter
+    from iq_recording import IQRecorder, IQReplaySource
+
+    with IQRecorder(str(tmp_path / "source"), 2.048e6, 100e6) as recorder:
+        recorder.write(sdr.generate_simulated_samples(1024 * 30))
+    profiler = LoopProfiler(str(tmp_path / "profiles"), iterations=5, memory_interval=0)
+    profiler.request_profile()
+    profiler.memory = True
+
+    sdr.read_and_print_samples(IQReplaySource(str(tmp_path / "source"), speed=0), None,
+                               num_samples=1024, reporter=ConsoleReporter('quiet'),
+                               profiler=profiler)
+
+    names = sorted(os.path.basename(path) for path in profiler.files)
+    assert [name.split('-')[1] for name in names] == ['cpu', 'cpu', 'mem', 'mem']
+    assert "(process)" in open(sorted(profiler.files)[1]).read()
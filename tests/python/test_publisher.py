@@ -1,5 +1,8 @@
 ﻿# tests/python/test_publisher.py
 import datetime
+import os
+import subprocess
+import sys
 import time
 import pytest
 from unittest.mock import MagicMock, patch
@@ -81,3 +84,48 @@ def test_disconnect_on_exception(mock_stomp_connection, mock_creds, mocker):
 
     # Verify disconnect was called
     mock_stomp_connection.disconnect.assert_called_once()
+
+def test_async_publish(mock_stomp_connection, mock_creds, mocker):
+    """Test that --async-publish sends through the background publisher."""
+    mocker.patch('time.sleep', side_effect=[None, KeyboardInterrupt])
+
+    publisher.main(['--async-publish'])
+
+    assert mock_stomp_connection.send.call_count == 2
+    assert mock_stomp_connection.send.call_args.kwargs['destination'] == mock_creds.PUBLISHER_DEST
+    mock_stomp_connection.disconnect.assert_called_once()
+
+def test_load_generator_mode(mock_stomp_connection, mock_creds):
+    """Test that --rate sends numbered messages for the requested duration and reports."""
+    publisher.main(['--rate', '100', '--duration', '0.1', '--payload', 'binary',
+                    '--payload-size', '256'])
+
+    assert mock_stomp_connection.send.call_count == 10
+    headers = mock_stomp_connection.send.call_args.kwargs['headers']
+    assert headers['sequence'] == '10'
+    assert mock_stomp_connection.send.call_args.kwargs['destination'] == mock_creds.PUBLISHER_DEST
+    mock_stomp_connection.disconnect.assert_called_once()
+
+def test_load_generator_failure_stops_metrics_server(mock_creds, mocker):
+    """Test that the metrics endpoint is shut down when the load generator fails."""
+    mocker.patch('publisher.run_load_generator', side_effect=ConnectionError("no broker"))
+    server = mocker.patch('metrics.MetricsServer')
+    server.return_value.start.return_value.address = ('127.0.0.1', 9000)
+
+    with pytest.raises(ConnectionError):
+        publisher.main(['--rate', '100', '--metrics-port', '0'])
+
+    server.return_value.start.return_value.stop.assert_called_once()
+
+def test_optional_modules_are_imported_on_demand():
+    """Test that importing publisher loads neither the optional modules nor their choices."""
+    import async_publisher
+    import load_generator
+
+    code = ("import sys, publisher; print(sorted(m for m in ('async_publisher', "
+            "'load_generator', 'metrics') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            check=True, cwd=os.path.dirname(publisher.__file__))
+    assert output.stdout.strip() == '[]'
+    assert publisher.QUEUE_POLICIES == async_publisher.POLICIES
+    assert publisher.PAYLOAD_SHAPES == load_generator.PAYLOAD_SHAPES
@@ -0,0 +1,66 @@
+﻿# tests/python/test_rolling_stats.py
+import json
+import numpy as np
+import pytest
+
+from rolling_stats import QuantileSketch, RollingStats
+
+@pytest.fixture
+def reads():
+    """Generate power values for 25 reads with a drifting level."""
+    rng = np.random.default_rng(1)
+    return [np.abs(rng.normal(size=256) * (1 + i / 10)) ** 2 for i in range(25)]
+
+def test_matches_exact_statistics_over_window(reads):
+    """Test that the incremental statistics match numpy over the last N reads."""
+    stats = RollingStats(window_reads=10, frame_size=256)
+    for values in reads:
+        stats.update(values)
+
+    window = np.concatenate(reads[-10:]).astype(np.float32)
+    summary = stats.summary()
+
+    assert summary['total_samples'] == len(window)
+    # Summaries are published as JSON
+    assert json.loads(json.dumps(summary)) == summary
+    assert summary['overall_mean_power'] == pytest.approx(np.mean(window, dtype=np.float64), rel=1e-6)
+    assert summary['overall_std_dev'] == pytest.approx(np.std(window, dtype=np.float64), rel=1e-6)
+    assert summary['overall_max_power'] == pytest.approx(np.max(window))
+    assert summary['overall_min_power'] == pytest.approx(np.min(window))
+    assert summary['overall_median_power'] == pytest.approx(np.median(window), rel=0.05)
+
+def test_values_returns_window_in_order(reads):
+    """Test that the float32 window holds the most recent reads, oldest first."""
+    stats = RollingStats(window_reads=4, frame_size=256)
+    for values in reads[:6]:
+        stats.update(values)
+
+    np.testing.assert_allclose(stats.values(), np.concatenate(reads[2:6]).astype(np.float32))
+
+def test_refresh_keeps_statistics(reads, mocker):
+    """Test that periodic re-aggregation agrees with the incremental values."""
+    mocker.patch.object(RollingStats, 'REFRESH_INTERVAL', 7)
+    stats = RollingStats(window_reads=5, frame_size=256)
+    for values in reads:
+        stats.update(values)
+
+    window = np.concatenate(reads[-5:]).astype(np.float32)
+    assert stats.mean == pytest.approx(np.mean(window, dtype=np.float64), rel=1e-6)
+    assert stats.variance == pytest.approx(np.var(window, dtype=np.float64), rel=1e-6)
+
+def test_empty_summary():
+    """Test that an empty window summarizes to zeros."""
+    summary = RollingStats(window_reads=3, frame_size=8).summary()
+
+    assert summary['total_samples'] == 0
+    assert summary['overall_snr'] == 0.0
+
+def test_quantile_sketch_relative_error():
+    """Test that sketch quantiles stay within the relative accuracy."""
+    rng = np.random.default_rng(2)
+    values = rng.lognormal(size=10000)
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    counts = sketch.bucket_counts(values)
+
+    for q in (0.1, 0.5, 0.9):
+        assert sketch.quantile(counts, q) == pytest.approx(np.quantile(values, q), rel=0.03)
@@ -0,0 +1,62 @@
+﻿# tests/python/test_scanner.py
+import pytest
+import numpy as np
+
+from scanner import SweepScanner
+from simulator import SignalSimulator, SimulatedSource
+
+class RecordingSource:
+    """Tunable source returning impulses (a flat spectrum) and logging every call."""
+
+    def __init__(self):
+        self.center_freq = 0.0
+        self.calls = []
+
+    def read_samples(self, num_samples):
+        self.calls.append((self.center_freq, num_samples))
+        samples = np.zeros(num_samples, dtype=np.complex64)
+        samples[::256] = 1
+        return samples
+
+def test_sweep_stitches_tones_at_absolute_frequencies():
+    """Test that tones in different hops land in the panorama at their absolute frequencies."""
+    simulator = SignalSimulator(2.048e6, noise_power=0.01).add_tone(1e6).add_tone(-2.5e6)
+    source = SimulatedSource(simulator, speed=0, center_freq=100e6)
+    scanner = SweepScanner(source, 96e6, 104e6, averages=2)
+
+    result = scanner.sweep()
+
+    assert result.hops == len(scanner.centers) == 6
+    assert result.freqs[0] == 96e6
+    assert result.freqs[-1] < 104e6 <= result.freqs[-1] + scanner.bin_width
+    strongest = np.sort(result.freqs[np.argsort(result.power)[-2:]])
+    np.testing.assert_array_equal(strongest, [97.5e6, 101e6])
+    assert result.hops_per_second > 0
+
+def test_settle_samples_are_discarded_after_each_retune():
+    """Test that each hop discards the settling samples before reading its FFT frames."""
+    source = RecordingSource()
+    scanner = SweepScanner(source, 100e6, 104e6, fft_size=256, settle_samples=512, averages=3)
+
+    scanner.sweep()
+
+    assert len(source.calls) == 2 * len(scanner.centers)
+    for hop, center in enumerate(scanner.centers):
+        assert source.calls[2 * hop] == (center, 512)
+        assert source.calls[2 * hop + 1] == (center, 3 * 256)
+
+def test_overlapping_hops_are_averaged():
+    """Test that overlapping segments are averaged so a flat spectrum stays flat."""
+    scanner = SweepScanner(RecordingSource(), 100e6, 110e6, fft_size=256, usable_fraction=0.5,
+                           overlap=0.5, settle_samples=0, window=None)
+
+    result = scanner.sweep()
+
+    assert scanner.keep_bins == 128 and scanner.step_bins == 64
+    np.testing.assert_allclose(np.diff(scanner.centers), 64 * scanner.bin_width)
+    np.testing.assert_allclose(result.power, 1.0)
+
+def test_invalid_range_is_rejected():
+    """Test that an empty frequency range is rejected."""
+    with pytest.raises(ValueError):
+        SweepScanner(RecordingSource(), 104e6, 100e6)
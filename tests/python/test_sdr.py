@@ -5,7 +5,10 @@ import numpy as np
 import json
 
 # Import the module to test
+import config
 import sdr
+from scanner import SweepResult
+from waterfall import decode_tile, tile_db
 
 @pytest.fixture
 def mock_stomp_connection(mocker):
@@ -136,3 +139,221 @@ def test_disconnect_on_keyboard_interrupt(mock_stomp_connection, mock_creds, moc
 
     # Verify disconnect was called
     mock_stomp_connection.disconnect.assert_called_once()
+
+def test_send_binary_spectrum(mocker):
+    """Test that binary encodings send a decodable frame with content headers."""
+    from spectrum_frames import CONTENT_TYPE, decode_spectrum_frame
+
+    conn = MagicMock()
+    spectrum = np.linspace(-50, 10, 1024)
+
+    assert sdr.send_to_activemq(conn, {'read_number': 1}, "sample", spectrum, encoding="float32")
+
+    args, kwargs = conn.send.call_args
+    headers = kwargs['headers']
+    assert headers['content-type'] == CONTENT_TYPE
+    assert headers['content-length'] == str(len(kwargs['body']))
+
+    frame = decode_spectrum_frame(kwargs['body'])
+    assert frame['metadata']['data'] == {'read_number': 1}
+    np.testing.assert_allclose(frame['spectrum'], spectrum, rtol=1e-6)
+
+def test_processor_averages_and_reduces_bins():
+    """Test that averaging publishes one reduced spectrum per K reads."""
+    processor = sdr.SampleProcessor(162.450e6, 2.048e6, 1024, simulated=True,
+                                    average_segments=4, output_bins=128, pooling="max")
+    np.random.seed(5)
+
+    messages = [processor.process(sdr.generate_simulated_samples(1024)) for _ in range(8)]
+
+    samples_sent = [m for batch in messages for m in batch if m['message_type'] == "sample"]
+    assert len(samples_sent) == 2
+    assert len(samples_sent[0]['spectrum_data']) == 128
+    assert samples_sent[0]['message_data']['frequency_domain']['averaged_segments'] == 4
+
+def test_processor_publishes_selected_channels():
+    """Test that a channelized read publishes the power of the requested channels."""
+    processor = sdr.SampleProcessor(162.4e6, 2.048e6, 1024, simulated=True, channels=64,
+                                    channel_freqs=[162.432e6, 162.4e6])
+    samples = np.exp(2j * np.pi * 32e3 * np.arange(4096) / 2.048e6)
+
+    messages = processor.process(samples[:1024]) + processor.process(samples[1024:2048])
+    channel_messages = [m for m in messages if m['message_type'] == "channels"]
+
+    assert len(channel_messages) == 2
+    channels = channel_messages[-1]['message_data']['channels']
+    assert [c['freq_mhz'] for c in channels] == [162.4, 162.432]
+    assert channels[1]['mean_power'] == pytest.approx(1.0, rel=1e-2)
+    assert channels[0]['mean_power'] < 1e-3
+    assert len(channel_messages[-1]['spectrum_data']) == 64
+
+def test_processor_publishes_only_detection_events():
+    """Test that events-only mode publishes detection events instead of spectra."""
+    processor = sdr.SampleProcessor(100e6, 2.048e6, 1024, window='hann', detector='os',
+                                    detection_events=True)
+    rng = np.random.default_rng(0)
+    tone = 4 * np.exp(2j * np.pi * 256e3 * np.arange(1024) / 2.048e6)
+
+    messages = []
+    for read in range(20):
+        noise = (rng.standard_normal(1024) + 1j * rng.standard_normal(1024)) * 0.1
+        messages += processor.process(noise + (tone if read < 10 else 0))
+
+    assert {m['message_type'] for m in messages} == {"detection"}
+    events = [(m['message_data']['event'], round(m['message_data']['center_freq'] / 1e3))
+              for m in messages]
+    assert events == [('start', 100256), ('stop', 100256)]
+
+def test_processor_publishes_deltas():
+    """Test that delta publishing sends a keyframe, then deltas, and summaries without spectra."""
+    processor = sdr.SampleProcessor(100e6, 2.048e6, 256, publish_mode="delta",
+                                    change_tolerance=3.0)
+    tone = np.exp(2j * np.pi * 64e3 * np.arange(256) / 2.048e6)
+
+    messages = []
+    for _ in range(10):
+        messages += processor.process(tone)
+
+    samples = [m for m in messages if m['message_type'] == "sample"]
+    updates = [m['message_data']['spectrum_update']['kind'] for m in samples]
+    assert updates == ['keyframe'] + ['delta'] * 9
+    assert samples[0]['spectrum_data'] is not None
+    assert all(m['spectrum_data'] is None for m in samples[1:])
+    summary = [m for m in messages if m['message_type'] == "summary"][0]
+    assert summary['spectrum_data'] is None
+
+def test_block_mode_publishes_per_frame_arrays():
+    """Test that a block is analyzed as frames and published as one message with per-frame stats."""
+    processor = sdr.SampleProcessor(100e6, 2.048e6, 1024, block_size=16384)
+    block = np.exp(2j * np.pi * 128e3 * np.arange(16384) / 2.048e6)
+    block[4096:5120] *= 2
+
+    messages = processor.process(block)
+
+    assert len(messages) == 1
+    data = messages[0]['message_data']
+    assert data['sample_count'] == 16384
+    assert data['frames']['count'] == 16
+    np.testing.assert_allclose(data['frames']['mean_power'], [1] * 4 + [4] + [1] * 11)
+    assert data['frames']['peak_freq_mhz'] == [0.128] * 16
+    assert len(messages[0]['spectrum_data']) == 1024
+
+def test_processor_publishes_waterfall_tiles(mocker):
+    """Test that tiles of the last waterfall rows are published every interval to their queue."""
+    mocker.patch('sdr.creds.SDR_DEST', '/queue/sdr')
+    processor = sdr.SampleProcessor(100e6, 2.048e6, 256, waterfall_rows=4, waterfall_interval=2)
+    conn = MagicMock()
+
+    tiles = []
+    for read in range(8):
+        for message in processor.process(np.full(256, read + 1, dtype=complex)):
+            if message['message_type'] == "waterfall":
+                tiles.append(message)
+                sdr.publish_message(conn, message, sdr.ConsoleReporter('quiet'))
+
+    assert [tile['rows'] for tile in tiles] == [2, 4, 4, 4]
+    assert conn.send.call_count == 4
+    kwargs = conn.send.call_args.kwargs
+    assert kwargs['destination'] == '/queue/sdr.waterfall'
+    assert kwargs['headers']['content-type'] == 'application/x-sdr-waterfall'
+    last = decode_tile(kwargs['body'])
+    # DC bin of each read: 10 * log10((256 * amplitude) ** 2) for amplitudes 5..8
+    np.testing.assert_allclose(tile_db(last)[:, 128], 20 * np.log10(256 * np.arange(5, 9)),
+                               atol=0.25)
+
+def test_panorama_message_describes_the_sweep():
+    """Test that a panorama is published with its middle bin as center and its span as rate."""
+    scanner = MagicMock(start_freq=100e6, stop_freq=104e6, bin_width=2e3)
+    freqs = 100e6 + np.arange(2000) * 2e3
+    result = SweepResult(freqs, np.zeros(2000), np.ones(2000), 3, 0.5, 6.0, 101e6, 1.0)
+
+    message = sdr.panorama_message(scanner, result, 7, simulated=True)
+
+    assert message['message_type'] == "panorama"
+    assert message['center_freq'] == 102e6
+    assert message['sample_rate'] == 4e6
+    assert message['message_data']['sweep_number'] == 7
+    assert message['message_data']['hops_per_s'] == 6.0
+
+def test_records_stage_metrics(mocker):
+    """Test that processing and sending update the pipeline metrics when enabled."""
+    from metrics import MetricsRegistry, PipelineMetrics
+
+    registry = MetricsRegistry()
+    mocker.patch.object(sdr, 'METRICS', PipelineMetrics(registry))
+    processor = sdr.SampleProcessor(162.450e6, 2.048e6, 1024, simulated=True)
+    conn = MagicMock()
+
+    for message in processor.process(sdr.generate_simulated_samples(1024)):
+        sdr.send_to_activemq(conn, **message)
+
+    text = registry.render()
+    assert "sdr_reads_total 1\n" in text
+    assert "sdr_messages_sent_total 1\n" in text
+    assert "sdr_rolling_window_values 1024\n" in text
+    for stage in ("fft", "stats", "serialize", "send"):
+        assert f'sdr_stage_latency_seconds_count{{stage="{stage}"}} 1\n' in text
+    body = conn.send.call_args.kwargs['body']
+    assert f"sdr_bytes_published_total {len(body)}\n" in text
+
+def test_block_mode_rejects_short_blocks():
+    """Test that blocks shorter than the FFT size are rejected and short reads publish nothing."""
+    with pytest.raises(ValueError):
+        sdr.SampleProcessor(162.450e6, 2.048e6, 1024, simulated=True, block_size=500)
+
+    processor = sdr.SampleProcessor(162.450e6, 2.048e6, 1024, simulated=True, block_size=4096)
+    # A read shorter than one FFT frame (replays raise EOFError instead of returning one)
+    assert processor.process(np.ones(500, dtype=complex)) == []
+
+def test_frame_size_smaller_than_fft_size_is_rejected(mocker, capsys):
+    """Test that main stops before connecting when --frame-size is below --fft-size."""
+    setup = mocker.patch('sdr.setup_activemq')
+    try:
+        sdr.main(['--fft-size', '1024', '--frame-size', '500'])
+    finally:
+        config.reset()
+
+    setup.assert_not_called()
+    assert "smaller than the FFT size" in capsys.readouterr().out
+
+def test_frame_size_sets_block_mode(mocker):
+    """Test that --fft-size and a larger --frame-size read in blocks of FFT frames."""
+    mocker.patch('sdr.PYRTLSDR_AVAILABLE', False)
+    mocker.patch('sdr.setup_activemq')
+    mocker.patch('sdr.disconnect_activemq')
+    read = mocker.patch('sdr.read_and_print_samples')
+    try:
+        sdr.main(['--fft-size', '256', '--frame-size', '4096', '--output', 'quiet'])
+    finally:
+        config.reset()
+
+    assert read.call_args.kwargs['num_samples'] == 256
+    assert read.call_args.kwargs['block_size'] == 4096
+
+def test_channel_workers_get_resolved_waterfall_dest(mocker):
+    """Test that --sdr-dest reaches the DSP worker processes through the processor options."""
+    mocker.patch('sdr.setup_activemq')
+    mocker.patch('sdr.disconnect_activemq')
+    mocker.patch('multichannel.load_channels', return_value=[])
+    mocker.patch('sdr.run_channel_supervisor')
+    supervisor = mocker.patch('multichannel.ChannelSupervisor')
+    try:
+        sdr.main(['--channels', 'channels.json', '--waterfall', '8', '--sdr-dest', '/topic/x'])
+    finally:
+        config.reset()
+
+    assert supervisor.call_args.args[2]['waterfall_dest'] == '/topic/x.waterfall'
+
+def test_invalid_channels_are_reported(mocker, capsys):
+    """Test that main reports channel sizes the supervisor rejects instead of failing."""
+    mocker.patch('sdr.setup_activemq')
+    disconnect = mocker.patch('sdr.disconnect_activemq')
+    mocker.patch('multichannel.load_channels', return_value=[])
+    mocker.patch('multichannel.ChannelSupervisor', side_effect=ValueError("block size"))
+    try:
+        sdr.main(['--channels', 'channels.json', '--block-size', '2048'])
+    finally:
+        config.reset()
+
+    disconnect.assert_called_once()
+    assert "Invalid channels in channels.json: block size" in capsys.readouterr().out
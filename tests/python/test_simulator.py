@@ -0,0 +1,60 @@
+﻿# tests/python/test_simulator.py
+import pytest
+import numpy as np
+
+from simulator import SignalSimulator, SimulatedSource, default_simulator
+
+def test_same_seed_reproduces_samples():
+    """Test that simulators with the same seed produce identical complex64 samples."""
+    first = default_simulator(seed=7).generate(4096)
+    second = default_simulator(seed=7).generate(4096)
+
+    assert first.dtype == np.complex64
+    np.testing.assert_array_equal(first, second)
+    assert not np.array_equal(first, default_simulator(seed=8).generate(4096))
+
+def test_frames_continue_the_signal():
+    """Test that a batch of frames matches the same samples generated one frame at a time."""
+    batch = SignalSimulator(seed=1, noise_power=0).add_fm(1e5).add_am(-2e5).generate_frames(4, 256)
+    stepped = SignalSimulator(seed=1, noise_power=0).add_fm(1e5).add_am(-2e5)
+
+    assert batch.shape == (4, 256)
+    for frame in batch:
+        np.testing.assert_allclose(frame, stepped.generate(256), atol=1e-5)
+
+def test_tone_appears_at_its_offset():
+    """Test that a tone lands in the FFT bin of its offset above a noise floor of the set power."""
+    sample_rate = 1.024e6
+    samples = SignalSimulator(sample_rate, seed=3).add_tone(128e3, amplitude=2.0).generate(1024)
+
+    spectrum = np.fft.fftshift(np.abs(np.fft.fft(samples)) ** 2)
+    freqs = np.fft.fftshift(np.fft.fftfreq(1024, 1 / sample_rate))
+
+    assert freqs[np.argmax(spectrum)] == 128e3
+    noise = SignalSimulator(seed=3, noise_power=2.0).generate(8192)
+    assert np.mean(np.abs(noise) ** 2) == pytest.approx(2.0, rel=0.05)
+
+def test_burst_is_keyed_on_and_off():
+    """Test that a burst carrier is only present during its duty cycle."""
+    simulator = SignalSimulator(1e6, seed=0, noise_power=0).add_burst(1e4, period=1e-3,
+                                                                      duty_cycle=0.25)
+    magnitude = np.abs(simulator.generate(2000))
+
+    np.testing.assert_allclose(magnitude[:250], 1.0, atol=1e-5)
+    np.testing.assert_allclose(magnitude[250:1000], 0.0, atol=1e-6)
+    np.testing.assert_allclose(magnitude[1000:1250], 1.0, atol=1e-5)
+
+def test_source_paces_at_real_time(mocker):
+    """Test that the simulated source sleeps until each frame's deadline, and not when unpaced."""
+    mocker.patch('time.monotonic', return_value=100.0)
+    sleep = mocker.patch('time.sleep')
+
+    source = SimulatedSource(SignalSimulator(1e6), speed=2.0)
+    for _ in range(3):
+        source.read_samples(1000)
+    delays = [call.args[0] for call in sleep.call_args_list]
+    np.testing.assert_allclose(delays, [0.0005, 0.001])
+
+    sleep.reset_mock()
+    SimulatedSource(SignalSimulator(1e6), speed=0).read_samples(1000)
+    sleep.assert_not_called()
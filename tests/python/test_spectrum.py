@@ -0,0 +1,135 @@
+﻿# tests/python/test_spectrum.py
+import numpy as np
+import pytest
+
+from spectrum import (BlockAnalyzer, SpectrumAnalyzer, WelchAverager, get_analyzer, reduce_bins,
+                      stft_frames)
+
+def tone(freq, size=1024, sample_rate=2.048e6):
+    """Build a complex tone at the given frequency offset."""
+    t = np.arange(size) / sample_rate
+    return np.exp(2j * np.pi * freq * t)
+
+def test_matches_numpy_reference():
+    """Test that the spectrum matches fft + fftshift + 10*log10(|X|^2)."""
+    np.random.seed(0)
+    samples = np.random.normal(size=1024) + 1j * np.random.normal(size=1024)
+
+    result = SpectrumAnalyzer(1024, 2.048e6).analyze(samples)
+
+    expected_power = np.abs(np.fft.fftshift(np.fft.fft(samples))) ** 2
+    np.testing.assert_allclose(result.power, expected_power, rtol=1e-9)
+    np.testing.assert_allclose(result.spectrum_db, 10 * np.log10(expected_power + 1e-10), rtol=1e-9)
+
+def test_peak_is_positive_frequency_tone():
+    """Test that the peak bin and frequency locate a positive-frequency tone."""
+    sample_rate = 2.048e6
+    samples = tone(100e3, sample_rate=sample_rate)
+
+    result = SpectrumAnalyzer(1024, sample_rate).analyze(samples)
+
+    assert result.peak_freq == pytest.approx(100e3)
+    assert result.peak_bin == 512 + 50
+    assert result.peak_power == pytest.approx(1024 ** 2)
+
+def test_window_is_applied():
+    """Test that a window suppresses leakage of an off-bin tone."""
+    samples = tone(100.5e3)
+
+    rect = SpectrumAnalyzer(1024, 2.048e6).analyze(samples).spectrum_db.copy()
+    hann = SpectrumAnalyzer(1024, 2.048e6, window='hann').analyze(samples).spectrum_db
+
+    # Far from the tone the windowed spectrum has much lower leakage
+    assert hann[0] < rect[0] - 20
+
+def test_rejects_wrong_frame_size():
+    """Test that frames of the wrong length are rejected."""
+    with pytest.raises(ValueError):
+        SpectrumAnalyzer(1024, 2.048e6).analyze(np.zeros(512, dtype=complex))
+
+def test_get_analyzer_is_cached():
+    """Test that analyzers are reused for the same parameters."""
+    assert get_analyzer(256, 1e6) is get_analyzer(256, 1e6)
+    assert get_analyzer(256, 1e6) is not get_analyzer(256, 1e6, 'hann')
+
+def test_welch_averages_k_segments():
+    """Test that a PSD is produced once K segments have been accumulated."""
+    averager = WelchAverager(256, 1e6, num_segments=4, window='hann', overlap=0.0)
+    rng = np.random.default_rng(4)
+
+    results = [averager.add(rng.normal(size=256) + 1j * rng.normal(size=256)) for _ in range(8)]
+
+    assert [len(r) for r in results] == [0, 0, 0, 1, 0, 0, 0, 1]
+    # White noise of variance 2 has a flat expected power of 2 * N per bin
+    assert np.mean(results[3][0].power) == pytest.approx(2 * 256, rel=0.1)
+
+def test_welch_overlap_spans_frames():
+    """Test that overlapping segments span frame boundaries."""
+    averager = WelchAverager(256, 1e6, num_segments=7, window=None, overlap=0.5)
+    samples = tone(50e3, size=1024, sample_rate=1e6)
+
+    # 1024 samples hold 7 half-overlapping 256-sample segments
+    results = averager.add(samples)
+
+    assert len(results) == 1
+    assert results[0].peak_freq == pytest.approx(50e3, abs=1e6 / 256)
+
+def test_welch_uses_shared_fft_backend(mocker):
+    """Test that Welch averaging uses scipy.fft with the given workers when it is installed."""
+    backend = mocker.MagicMock()
+    backend.fft.side_effect = lambda x, axis, workers, overwrite_x: np.fft.fft(x, axis=axis)
+    mocker.patch('spectrum.SCIPY_FFT_AVAILABLE', True)
+    mocker.patch('spectrum.scipy_fft', backend, create=True)
+    averager = WelchAverager(256, 1e6, num_segments=2, window=None, overlap=0.0, workers=4)
+
+    results = averager.add(tone(50e3, size=512, sample_rate=1e6))
+
+    assert backend.fft.call_args.kwargs['workers'] == 4
+    assert results[0].peak_freq == pytest.approx(50e3, abs=1e6 / 256)
+
+def test_reduce_bins():
+    """Test mean and max pooling of a spectrum."""
+    power = np.arange(8, dtype=float)
+
+    np.testing.assert_array_equal(reduce_bins(power, 4, 'mean'), [0.5, 2.5, 4.5, 6.5])
+    np.testing.assert_array_equal(reduce_bins(power, 2, 'max'), [3, 7])
+    with pytest.raises(ValueError):
+        reduce_bins(power, 3)
+
+def test_stft_frames_are_views():
+    """Test that blocks are split into (overlapping) frames without copying."""
+    samples = np.arange(4096, dtype=np.complex64)
+
+    frames = stft_frames(samples, 1024)
+    overlapped = stft_frames(samples, 1024, overlap=0.5)
+
+    assert frames.shape == (4, 1024)
+    assert overlapped.shape == (7, 1024)
+    assert overlapped[1, 0] == 512
+    assert np.shares_memory(frames, samples) and np.shares_memory(overlapped, samples)
+
+def test_block_analyzer_matches_frame_by_frame():
+    """Test that the batched STFT gives the same power and peaks as one analysis per frame."""
+    rng = np.random.default_rng(2)
+    block = tone(300e3, 8192) + 0.1 * (rng.normal(size=8192) + 1j * rng.normal(size=8192))
+    analyzer = BlockAnalyzer(1024, 2.048e6, window='hann', overlap=0.5)
+
+    result = analyzer.analyze(block)
+
+    single = SpectrumAnalyzer(1024, 2.048e6, window='hann')
+    for i, frame in enumerate(stft_frames(block, 1024, 0.5)):
+        expected = single.analyze(frame)
+        np.testing.assert_allclose(result.power[i], expected.power, rtol=1e-6)
+        assert result.peak_freq[i] == expected.peak_freq
+    average = analyzer.average(result)
+    np.testing.assert_allclose(average.power, result.power.mean(axis=0))
+    assert average.peak_freq == 300e3
+
+def test_block_analyzer_short_block_has_no_average():
+    """Test that a block shorter than one frame gives no frames and no averaged spectrum."""
+    analyzer = BlockAnalyzer(1024, 2.048e6)
+
+    result = analyzer.analyze(tone(300e3, 500))
+
+    assert result.power.shape == (0, 1024)
+    assert analyzer.average(result) is None
@@ -0,0 +1,83 @@
+﻿# tests/python/test_spectrum_delta.py
+import json
+
+import numpy as np
+import pytest
+
+from spectrum_delta import SpectrumDeltaDecoder, SpectrumDeltaEncoder
+from spectrum_frames import decode_spectrum_frame, encode_spectrum_frame
+
+@pytest.fixture
+def spectra():
+    """Build a sequence of slowly varying 512-bin dB spectra with one changing signal."""
+    rng = np.random.default_rng(5)
+    base = rng.uniform(-60, -50, 512)
+    frames = []
+    for i in range(20):
+        frame = base + rng.uniform(-0.4, 0.4, 512)
+        frame[100:104] += 3 * i
+        frames.append(frame)
+    return frames
+
+def test_changes_mode_skips_small_changes(spectra):
+    """Test that spectra within tolerance are skipped and a keyframe is forced at the interval."""
+    encoder = SpectrumDeltaEncoder('changes', tolerance_db=1.0, keyframe_interval=5)
+    quiet = [spectra[0] + 0.1 * i for i in range(8)]
+
+    updates = [encoder.encode(frame) for frame in quiet]
+
+    kinds = [update and update['kind'] for update in updates]
+    assert kinds == ['keyframe', None, None, None, None, 'keyframe', None, None]
+    assert encoder.skipped == 6
+
+def test_delta_round_trip_within_tolerance(spectra):
+    """Test that decoded deltas stay within the tolerance and only list the changed bins."""
+    encoder = SpectrumDeltaEncoder('delta', tolerance_db=1.0, keyframe_interval=100)
+    decoder = SpectrumDeltaDecoder()
+
+    for i, frame in enumerate(spectra[:8]):
+        update = encoder.encode(frame)
+        if i == 0:
+            assert update['kind'] == 'keyframe'
+        else:
+            assert update['kind'] == 'delta'
+            assert update['indices'] == [100, 101, 102, 103]
+        decoded = decoder.decode(update, frame if update['kind'] == 'keyframe' else None)
+        np.testing.assert_allclose(decoded, frame, atol=1.0 + 0.125)
+
+def test_large_changes_become_keyframes(spectra):
+    """Test that a delta is replaced by a keyframe when too many bins or too much changed."""
+    encoder = SpectrumDeltaEncoder('delta', tolerance_db=1.0, quantum_db=0.25)
+    encoder.encode(spectra[0])
+
+    assert encoder.encode(spectra[0] + 5)['kind'] == 'keyframe'
+    jump = spectra[0] + 5
+    jump[10] += 40
+    assert encoder.encode(jump)['kind'] == 'keyframe'
+    assert encoder.keyframe_id == 3
+
+def test_decoder_needs_the_keyframe(spectra):
+    """Test that a delta against a missed keyframe is not decoded."""
+    encoder = SpectrumDeltaEncoder('delta')
+    first = encoder.encode(spectra[0])
+    delta = encoder.encode(spectra[3])
+    decoder = SpectrumDeltaDecoder()
+
+    assert decoder.decode(delta) is None
+    decoder.decode(first, spectra[0])
+    assert decoder.decode(delta) is not None
+
+def test_decode_json_and_binary_messages(spectra):
+    """Test that decode_message reads updates from JSON messages and binary frames."""
+    encoder = SpectrumDeltaEncoder('delta')
+    keyframe = encoder.encode(spectra[0])
+    delta = encoder.encode(spectra[2])
+    json_message = json.loads(json.dumps({'data': {'spectrum_update': keyframe},
+                                          'spectrum_db': spectra[0].tolist()}))
+    body = encode_spectrum_frame(None, 1e8, 2e6, 0.0, 'float32',
+                                 {'type': 'sample', 'data': {'spectrum_update': delta}})
+    decoder = SpectrumDeltaDecoder()
+
+    np.testing.assert_allclose(decoder.decode_message(json_message), spectra[0])
+    np.testing.assert_allclose(decoder.decode_message(decode_spectrum_frame(body)), spectra[2],
+                               atol=1.125)
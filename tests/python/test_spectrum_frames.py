@@ -0,0 +1,53 @@
+﻿# tests/python/test_spectrum_frames.py
+import numpy as np
+import pytest
+
+from spectrum_frames import decode_spectrum_frame, encode_spectrum_frame, spectrum_db
+
+@pytest.fixture
+def spectrum():
+    """Build a 1024-bin dB spectrum."""
+    rng = np.random.default_rng(3)
+    return 10 * np.log10(rng.exponential(size=1024) + 1e-10)
+
+def test_float32_round_trip(spectrum):
+    """Test that float32 frames decode to the original header and spectrum."""
+    metadata = {'type': 'sample', 'data': {'read_number': 7}, 'simulated': True}
+    body = encode_spectrum_frame(spectrum, 162.45e6, 2.048e6, 1609459200.0, 'float32', metadata)
+
+    frame = decode_spectrum_frame(body)
+
+    assert frame['encoding'] == 'float32'
+    assert frame['fft_size'] == 1024
+    assert frame['center_freq'] == 162.45e6
+    assert frame['sample_rate'] == 2.048e6
+    assert frame['timestamp'] == 1609459200.0
+    assert frame['metadata'] == metadata
+    np.testing.assert_allclose(spectrum_db(frame), spectrum, rtol=1e-6)
+    assert len(body) < 1024 * 4 + 200
+
+def test_decode_does_not_copy(spectrum):
+    """Test that the decoded spectrum is a view into the message body."""
+    body = bytearray(encode_spectrum_frame(spectrum, 1e6, 1e6, 0.0, 'float16'))
+
+    frame = decode_spectrum_frame(body)
+
+    assert np.shares_memory(frame['spectrum'], np.frombuffer(body, dtype=np.uint8))
+    np.testing.assert_allclose(spectrum_db(frame), spectrum, atol=0.05)
+
+def test_uint8_quantization_error(spectrum):
+    """Test that 8-bit frames dequantize within half a step."""
+    body = encode_spectrum_frame(spectrum, 1e6, 1e6, 0.0, 'uint8')
+
+    frame = decode_spectrum_frame(body)
+    step = (spectrum.max() - spectrum.min()) / 255
+
+    assert frame['spectrum'].dtype == np.uint8
+    np.testing.assert_allclose(spectrum_db(frame), spectrum, atol=step / 2 + 1e-4)
+
+def test_rejects_unknown_encoding(spectrum):
+    """Test that unknown encodings and malformed frames are rejected."""
+    with pytest.raises(ValueError):
+        encode_spectrum_frame(spectrum, 1e6, 1e6, 0.0, 'int4')
+    with pytest.raises(ValueError):
+        decode_spectrum_frame(b'JSON' + bytes(60))
@@ -0,0 +1,168 @@
+﻿# tests/python/test_stomp_server.py
+import asyncio
+import json
+import queue
+import socket
+import time
+import stomp
+
+import sdr
+from connection import ConnectionManager
+from stomp_server import read_frame
+
+class Collector(stomp.ConnectionListener):
+    """Collects received MESSAGE frames."""
+
+    def __init__(self):
+        self.messages = queue.Queue()
+
+    def on_message(self, frame):
+        self.messages.put(frame)
+
+    def get(self, count, timeout=2.0):
+        return [self.messages.get(timeout=timeout) for _ in range(count)]
+
+def connect(broker):
+    collector = Collector()
+    conn = stomp.Connection([broker.address])
+    conn.set_listener('collector', collector)
+    conn.connect('user', 'pass', wait=True)
+    return conn, collector
+
+def wait_for_receipt(conn, receipt, send):
+    listener = stomp.listener.WaitingListener(receipt)
+    conn.set_listener(receipt, listener)
+    send(headers={'receipt': receipt})
+    listener.wait_on_receipt()
+    conn.remove_listener(receipt)
+
+def subscribe(conn, destination, sub_id, ack='auto', **extra):
+    wait_for_receipt(conn, f"subscribed-{sub_id}",
+                     lambda headers=None: conn.subscribe(destination, sub_id, ack,
+                                                         headers=dict(headers, **extra)))
+
+def test_queue_round_robin_and_backlog(stomp_broker):
+    """Test that queued messages wait for a subscriber and are then shared round-robin."""
+    producer, _ = connect(stomp_broker)
+    first, first_messages = connect(stomp_broker)
+    second, second_messages = connect(stomp_broker)
+
+    wait_for_receipt(producer, 'sent', lambda headers: producer.send('/queue/a', 'early',
+                                                                     headers=headers))
+    subscribe(first, '/queue/a', 1)
+    assert first_messages.get(1)[0].body == 'early'
+
+    subscribe(second, '/queue/a', 2)
+    for i in range(4):
+        producer.send('/queue/a', str(i))
+
+    shares = [[frame.body for frame in messages.get(2)]
+              for messages in (first_messages, second_messages)]
+    assert sorted(shares) == [['0', '2'], ['1', '3']]
+    for conn in (producer, first, second):
+        conn.disconnect()
+
+def test_topic_fans_out_to_current_subscribers(stomp_broker):
+    """Test that topics copy messages to every subscriber and drop them with none."""
+    producer, _ = connect(stomp_broker)
+    wait_for_receipt(producer, 'dropped', lambda headers: producer.send('/topic/t', 'nobody',
+                                                                       headers=headers))
+    first, first_messages = connect(stomp_broker)
+    second, second_messages = connect(stomp_broker)
+    subscribe(first, '/topic/t', 1)
+    subscribe(second, '/topic/t', 2)
+
+    producer.send('/topic/t', 'hello', headers={'channel': '3'})
+
+    for messages in (first_messages, second_messages):
+        frame = messages.get(1)[0]
+        assert frame.body == 'hello'
+        assert frame.headers['channel'] == '3'
+        assert frame.headers['destination'] == '/topic/t'
+    assert stomp_broker.stats()['messages_delivered']['/topic/t'] == 2
+    for conn in (producer, first, second):
+        conn.disconnect()
+
+def test_prefetch_ack_and_redelivery(stomp_broker):
+    """Test that client acks limit in-flight messages and unacked ones are redelivered."""
+    producer, _ = connect(stomp_broker)
+    consumer, messages = connect(stomp_broker)
+    subscribe(consumer, '/queue/work', 1, ack='client-individual',
+              **{'activemq.prefetchSize': '2'})
+
+    for i in range(3):
+        producer.send('/queue/work', str(i))
+    received = messages.get(2)
+    assert [frame.body for frame in received] == ['0', '1']
+    assert messages.messages.empty()
+
+    consumer.ack(received[0].headers['ack'], '1')
+    assert messages.get(1)[0].body == '2'
+    consumer.disconnect()
+
+    other, other_messages = connect(stomp_broker)
+    subscribe(other, '/queue/work', 1)
+    assert sorted(frame.body for frame in other_messages.get(2)) == ['1', '2']
+    for conn in (producer, other):
+        conn.disconnect()
+
+def test_sdr_messages_end_to_end(stomp_broker):
+    """Test that sdr.py messages published through ConnectionManager reach a subscriber."""
+    consumer, messages = connect(stomp_broker)
+    subscribe(consumer, sdr.creds.SDR_DEST, 1)
+    manager = ConnectionManager([stomp_broker.address], 'user', 'pass')
+    assert manager.connect(max_attempts=1)
+
+    processor = sdr.SampleProcessor(162.450e6, 2.048e6, 1024, simulated=True)
+    message = processor.process(sdr.generate_simulated_samples(1024))[0]
+    assert sdr.send_to_activemq(manager, **message)
+
+    body = json.loads(messages.get(1)[0].body)
+    assert body['type'] == 'sample'
+    assert len(body['spectrum_db']) == 1024
+    manager.disconnect()
+    consumer.disconnect()
+
+def test_negotiates_heart_beats(stomp_broker):
+    """Test that CONNECTED answers the client's heart-beat header and the server sends EOLs."""
+    with socket.create_connection(stomp_broker.address, timeout=2) as sock:
+        sock.sendall(b'CONNECT\naccept-version:1.2\nheart-beat:500,50\n\n\0')
+        data = b''
+        while b'\0' not in data:
+            data += sock.recv(4096)
+        connected, received = data.split(b'\0', 1)
+        start = time.monotonic()
+        while received.count(b'\n') < 3:
+            received += sock.recv(4096)
+
+    assert b'heart-beat:50,500\n' in connected
+    assert received.strip(b'\n') == b''
+    assert time.monotonic() - start < 1.0
+
+def read_until_nul(sock):
+    data = b''
+    while b'\0' not in data:
+        data += sock.recv(4096)
+    return data
+
+def test_large_frames_without_content_length(stomp_broker):
+    """Test that bodies without content-length may exceed asyncio's 64 KiB line limit."""
+    body = b'x' * (256 * 1024)
+    with socket.create_connection(stomp_broker.address, timeout=2) as sock:
+        sock.sendall(b'CONNECT\naccept-version:1.2\n\n\0')
+        read_until_nul(sock)
+        sock.sendall(b'SEND\ndestination:/queue/big\nreceipt:r1\n\n' + body + b'\0')
+        assert read_until_nul(sock).startswith(b'RECEIPT\n')
+
+    assert stomp_broker.stats()['bytes_received'] == {'/queue/big': len(body)}
+
+def test_frame_over_the_limit_ends_the_session():
+    """Test that a frame longer than the stream limit ends the session instead of raising."""
+    async def read(data):
+        reader = asyncio.StreamReader(limit=16)
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await read_frame(reader)
+
+    assert asyncio.run(read(b'SEND\ndestination:/q\n\n' + b'x' * 64 + b'\0')) is None
+    assert asyncio.run(read(b'SEND\ndestination:/q\n\nshort\0')).body == b'short'
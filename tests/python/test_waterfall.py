@@ -0,0 +1,44 @@
+﻿# tests/python/test_waterfall.py
+import numpy as np
+import pytest
+
+from waterfall import Waterfall, decode_tile, encode_tile, quantize_rows, tile_db
+
+def test_ring_keeps_latest_rows_in_order():
+    """Test that the ring overwrites the oldest rows and returns the newest oldest-first."""
+    waterfall = Waterfall(4, capacity=3)
+    for i in range(5):
+        waterfall.add(np.full(4, i), timestamp=100.0 + i)
+
+    rows, timestamps = waterfall.latest(10)
+
+    assert len(waterfall) == 3
+    np.testing.assert_array_equal(rows[:, 0], [2, 3, 4])
+    np.testing.assert_array_equal(timestamps, [102.0, 103.0, 104.0])
+    np.testing.assert_array_equal(waterfall.latest(2)[0][:, 0], [3, 4])
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_tile_round_trip(compress):
+    """Test that a tile decodes to its header, timestamps and rows within one code step."""
+    rng = np.random.default_rng(1)
+    rows = rng.uniform(-10, 70, (16, 512)).astype(np.float32)
+    timestamps = 1609459200.0 + np.arange(16) * 0.5
+
+    body = encode_tile(rows, timestamps, 162.45e6, 2.048e6, -20.0, 80.0, compress)
+    tile = decode_tile(body)
+
+    assert tile['rows'] == 16 and tile['bins'] == 512
+    assert tile['center_freq'] == 162.45e6 and tile['sample_rate'] == 2.048e6
+    assert tile['compressed'] == compress
+    np.testing.assert_array_equal(tile['timestamps'], timestamps)
+    np.testing.assert_allclose(tile_db(tile), rows, atol=100 / 255 / 2 + 1e-4)
+    if not compress:
+        assert len(body) == 40 + 16 * 8 + 16 * 512
+
+def test_quantization_clips_to_range():
+    """Test that values outside the dB range map to the end codes."""
+    codes = quantize_rows(np.array([-50.0, -20.0, 40.0, 80.0, 200.0]), -20.0, 80.0)
+
+    np.testing.assert_array_equal(codes, [0, 0, 153, 255, 255])
+    with pytest.raises(ValueError):
+        decode_tile(b'not a tile' * 10)